@@ -0,0 +1,310 @@
+"""Measures the per-test overhead of pytest-opentelemetry on synthetic test suites.
+
+Each scenario generates a throwaway test tree, runs it once with the plugin disabled
+(`-p no:pytest_opentelemetry`) and once with it enabled, and reports the difference
+in session wall time per test and in the growth of the process's peak memory.
+
+    python -m benchmarks.overhead --tests 10000 --scenario trivial --scenario fixtures
+    python -m benchmarks.overhead --tests 100000 --xdist 4 -- --otel-detail=test
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+TESTS_PER_MODULE = 100
+
+# Installed into every generated tree, this records the session's wall time (which
+# excludes interpreter startup and plugin loading) and the peak RSS at the start and
+# end of the session.  With xdist, the controller records the whole distributed run,
+# and each worker sends it the growth of its own peak RSS.
+MEASURING_CONFTEST = '''
+import json
+import os
+import resource
+import sys
+import time
+
+import pytest
+
+_started = {}
+_workers_memory_growth_kb = []
+
+
+def _max_rss_kb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+def pytest_sessionstart(session):
+    _started['time'] = time.perf_counter()
+    _started['max_rss_kb'] = _max_rss_kb()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    growth = getattr(node, 'workeroutput', {}).get('memory_growth_kb')
+    if growth is not None:
+        _workers_memory_growth_kb.append(growth)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if hasattr(session.config, 'workerinput'):
+        session.config.workeroutput['memory_growth_kb'] = (
+            _max_rss_kb() - _started['max_rss_kb']
+        )
+        return
+    with open(os.environ['BENCHMARK_OUTPUT'], 'w', encoding='utf-8') as output:
+        json.dump(
+            {
+                'seconds': time.perf_counter() - _started['time'],
+                'max_rss_kb_start': _started['max_rss_kb'],
+                'max_rss_kb_end': _max_rss_kb(),
+                'tests': session.testscollected,
+                'workers': len(_workers_memory_growth_kb),
+                'workers_memory_growth_kb': sum(_workers_memory_growth_kb),
+            },
+            output,
+        )
+'''
+
+
+def _write(path: str, source: str) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(source)
+
+
+def _modules(directory: str, tests: int, render: Callable[[int, int], str]) -> None:
+    for index, start in enumerate(range(0, tests, TESTS_PER_MODULE)):
+        count = min(TESTS_PER_MODULE, tests - start)
+        _write(
+            os.path.join(directory, f'test_module_{index:05d}.py'), render(index, count)
+        )
+
+
+def generate_trivial(directory: str, tests: int) -> None:
+    """Plain tests that do nothing, so that everything measured is overhead"""
+
+    def render(index: int, count: int) -> str:
+        return ''.join(f'def test_{i}():\n    pass\n\n\n' for i in range(count))
+
+    _modules(directory, tests, render)
+
+
+def generate_fixtures(directory: str, tests: int, depth: int = 10) -> None:
+    """Tests that each depend on a deep chain of fixtures across every scope"""
+    chain = ['@pytest.fixture(scope="session")\ndef fixture_session():\n    yield 0\n']
+    chain.append(
+        '@pytest.fixture(scope="module")\n'
+        'def fixture_module(fixture_session):\n'
+        '    yield fixture_session + 1\n'
+    )
+    previous = 'fixture_module'
+    for level in range(depth):
+        chain.append(
+            f'@pytest.fixture\ndef fixture_{level}({previous}):\n'
+            f'    yield {previous} + 1\n'
+        )
+        previous = f'fixture_{level}'
+    _write(
+        os.path.join(directory, 'conftest.py'),
+        MEASURING_CONFTEST + '\n\n' + '\n\n'.join(chain),
+    )
+
+    def render(index: int, count: int) -> str:
+        return ''.join(
+            f'def test_{i}({previous}):\n    assert {previous} == {depth + 1}\n\n\n'
+            for i in range(count)
+        )
+
+    _modules(directory, tests, render)
+
+
+def generate_parametrized(directory: str, tests: int) -> None:
+    """Heavily parametrized tests, including parametrized fixtures"""
+
+    def render(index: int, count: int) -> str:
+        # each module produces count tests: count // 2 values x 2 fixture params, and
+        # one more without the fixture when count is odd
+        values, unpaired = divmod(count, 2)
+        source = textwrap.dedent(
+            '''
+            import pytest
+
+            @pytest.fixture(params=['a', 'b'])
+            def letter(request):
+                return request.param
+            '''
+        )
+        if values:
+            source += textwrap.dedent(
+                f'''
+                @pytest.mark.parametrize('number', range({values}))
+                def test_parametrized(number, letter):
+                    pass
+                '''
+            )
+        if unpaired:
+            source += textwrap.dedent(
+                '''
+                @pytest.mark.parametrize('number', [0])
+                def test_unpaired(number):
+                    pass
+                '''
+            )
+        return source
+
+    _modules(directory, tests, render)
+
+
+SCENARIOS: Dict[str, Callable[[str, int], None]] = {
+    'trivial': generate_trivial,
+    'fixtures': generate_fixtures,
+    'parametrized': generate_parametrized,
+}
+
+
+def generate(scenario: str, directory: str, tests: int) -> None:
+    """Generates the named scenario's test tree into the given directory"""
+    _write(os.path.join(directory, 'pytest.ini'), '[pytest]\n')
+    _write(os.path.join(directory, 'conftest.py'), MEASURING_CONFTEST)
+    SCENARIOS[scenario](directory, tests)
+
+
+@dataclass
+class Measurement:
+    seconds: float
+    max_rss_kb_start: int
+    max_rss_kb_end: int
+    tests: int
+    # The growth of each xdist worker's peak RSS, added up
+    workers: int = 0
+    workers_memory_growth_kb: int = 0
+
+    @property
+    def memory_growth_kb(self) -> int:
+        return self.max_rss_kb_end - self.max_rss_kb_start
+
+
+def measure(directory: str, arguments: Sequence[str]) -> Measurement:
+    """Runs pytest on the generated tree in a fresh process and returns its
+    self-reported measurements"""
+    output = os.path.join(directory, 'benchmark.json')
+    subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', *arguments],
+        cwd=directory,
+        env={**os.environ, 'BENCHMARK_OUTPUT': output},
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    with open(output, encoding='utf-8') as file:
+        return Measurement(**json.load(file))
+
+
+@dataclass
+class Result:
+    scenario: str
+    xdist: int
+    baseline: Measurement
+    instrumented: Measurement
+
+    @property
+    def overhead_us_per_test(self) -> float:
+        seconds = self.instrumented.seconds - self.baseline.seconds
+        return seconds / max(self.instrumented.tests, 1) * 1_000_000
+
+    @property
+    def memory_growth_kb(self) -> int:
+        """How much more the peak RSS of the process running pytest (the controller,
+        with xdist) grew with the plugin"""
+        return self.instrumented.memory_growth_kb - self.baseline.memory_growth_kb
+
+    @property
+    def workers_memory_growth_kb(self) -> int:
+        return (
+            self.instrumented.workers_memory_growth_kb
+            - self.baseline.workers_memory_growth_kb
+        )
+
+
+def run(
+    scenario: str,
+    tests: int,
+    xdist: int = 0,
+    repeat: int = 3,
+    plugin_arguments: Sequence[str] = (),
+) -> Result:
+    """Benchmarks one scenario, keeping the fastest of `repeat` runs of each side"""
+    common: List[str] = ['-n', str(xdist)] if xdist else ['-p', 'no:xdist']
+    with tempfile.TemporaryDirectory() as directory:
+        generate(scenario, directory, tests)
+        baseline = min(
+            (
+                measure(directory, [*common, '-p', 'no:pytest_opentelemetry'])
+                for _ in range(repeat)
+            ),
+            key=lambda m: m.seconds,
+        )
+        instrumented = min(
+            (measure(directory, [*common, *plugin_arguments]) for _ in range(repeat)),
+            key=lambda m: m.seconds,
+        )
+    return Result(scenario, xdist, baseline, instrumented)
+
+
+def report(results: Sequence[Result]) -> str:
+    lines = [
+        f'{"scenario":<14}{"xdist":>6}{"tests":>9}{"baseline s":>12}'
+        f'{"plugin s":>12}{"us/test":>10}{"rss +KB":>10}{"workers +KB":>13}'
+    ]
+    for result in results:
+        lines.append(
+            f'{result.scenario:<14}{result.xdist:>6}{result.instrumented.tests:>9}'
+            f'{result.baseline.seconds:>12.3f}{result.instrumented.seconds:>12.3f}'
+            f'{result.overhead_us_per_test:>10.1f}{result.memory_growth_kb:>10}'
+            f'{result.workers_memory_growth_kb if result.xdist else "-":>13}'
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--scenario',
+        action='append',
+        choices=sorted(SCENARIOS),
+        help='Which synthetic suites to run (default: all of them)',
+    )
+    parser.add_argument('--tests', type=int, action='append')
+    parser.add_argument(
+        '--xdist',
+        type=int,
+        action='append',
+        help='Number of xdist workers, 0 to disable xdist (default: 0)',
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        'plugin_arguments',
+        nargs='*',
+        help='Extra arguments for the instrumented runs, after a --',
+    )
+    arguments = parser.parse_args(argv)
+
+    results = [
+        run(scenario, tests, xdist, arguments.repeat, arguments.plugin_arguments)
+        for scenario in arguments.scenario or sorted(SCENARIOS)
+        for tests in arguments.tests or [10_000]
+        for xdist in arguments.xdist or [0]
+    ]
+    print(report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measures what pytest-opentelemetry adds to the startup of every pytest invocation.
+
+Each invocation runs in a fresh process on a one-test suite, with the plugin disabled
+(`-p no:pytest_opentelemetry`) and enabled, keeping the fastest of several runs.
+
+    python -m benchmarks.startup --repeat 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+INVOCATIONS: Dict[str, List[str]] = {
+    'help': ['--help'],
+    'collect-only': ['--collect-only', '-q'],
+    'run': ['-q'],
+}
+
+
+def elapsed(directory: str, arguments: Sequence[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'pytest', '-p', 'no:cacheprovider', *arguments],
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def run(repeat: int = 5) -> List[Tuple[str, float, float]]:
+    """Returns the name, baseline seconds, and instrumented seconds of each kind of
+    invocation"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'pytest.ini'), 'w', encoding='utf-8') as ini:
+            ini.write('[pytest]\n')
+        with open(os.path.join(directory, 'test_one.py'), 'w', encoding='utf-8') as f:
+            f.write('def test_one():\n    pass\n')
+
+        for name, arguments in INVOCATIONS.items():
+            disabled = [*arguments, '-p', 'no:pytest_opentelemetry']
+            baseline = min(elapsed(directory, disabled) for _ in range(repeat))
+            instrumented = min(elapsed(directory, arguments) for _ in range(repeat))
+            results.append((name, baseline, instrumented))
+    return results
+
+
+def report(results: Sequence[Tuple[str, float, float]]) -> str:
+    lines = [f'{"invocation":<14}{"baseline ms":>13}{"plugin ms":>11}{"+ms":>8}']
+    for name, baseline, instrumented in results:
+        lines.append(
+            f'{name:<14}{baseline * 1000:>13.1f}{instrumented * 1000:>11.1f}'
+            f'{(instrumented - baseline) * 1000:>8.1f}'
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args(argv)
+    print(report(run(arguments.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,9 @@
-from importlib.metadata import version
+def __getattr__(name: str) -> str:
+    # Every pytest invocation imports this package through its entry point, and
+    # looking up our version scans all of sys.path, so only do that when asked
+    if name == '__version__':
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import version
 
-__version__ = version("pytest_opentelemetry")
+        return version("pytest_opentelemetry")
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
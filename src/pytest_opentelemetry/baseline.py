@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session
+from _pytest.reports import TestReport
+from _pytest.terminal import TerminalReporter
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+
+from .processors import add_span_processor, remove_span_processor
+
+if TYPE_CHECKING:
+    from .instrumentation import PerTestOpenTelemetryPlugin
+
+WORKEROUTPUT_KEY = 'pytest_opentelemetry.baseline'
+
+# A duration is only a regression when it is this many standard deviations above the
+# baseline's mean, and also slower by at least these relative and absolute amounts,
+# so that tiny or very consistent durations don't raise false alarms
+Z_SCORE = 3.0
+RELATIVE = 0.25
+ABSOLUTE = 0.05
+
+# The number of runs in the baseline needed to estimate its variance
+MIN_RUNS = 3
+
+# How many of the regressed tests and fixtures to name on the session span
+SPAN_LIMIT = 100
+
+# The number of runs, the mean, and the sum of the squared differences from the mean
+# of a duration, updated run by run with Welford's algorithm
+Stats = Dict[str, float]
+
+
+def updated(stats: Optional[Stats], value: float) -> Stats:
+    """The baseline of a duration with one more run added to it"""
+    if stats is None:
+        return {'runs': 1, 'mean': value, 'm2': 0.0}
+    runs = stats['runs'] + 1
+    delta = value - stats['mean']
+    mean = stats['mean'] + delta / runs
+    return {'runs': runs, 'mean': mean, 'm2': stats['m2'] + delta * (value - mean)}
+
+
+def stddev(stats: Stats) -> float:
+    return math.sqrt(stats['m2'] / (stats['runs'] - 1)) if stats['runs'] > 1 else 0.0
+
+
+class Regression(NamedTuple):
+    kind: str
+    name: str
+    seconds: float
+    mean: float
+    stddev: float
+
+    @property
+    def z_score(self) -> float:
+        if not self.stddev:
+            return math.inf
+        return (self.seconds - self.mean) / self.stddev
+
+    def describe(self) -> str:
+        change = (self.seconds - self.mean) / self.mean if self.mean else math.inf
+        return (
+            f'{self.seconds:.3f}s vs {self.mean:.3f}s ± {self.stddev:.3f}s '
+            f'({change:+.0%}, z={self.z_score:.1f})  {self.kind} {self.name}'
+        )
+
+
+def regressions(
+    kind: str, baseline: Dict[str, Stats], durations: Dict[str, float]
+) -> List[Regression]:
+    found = []
+    for name, seconds in durations.items():
+        stats = baseline.get(name)
+        if stats is None or stats['runs'] < MIN_RUNS:
+            continue
+
+        regression = Regression(kind, name, seconds, stats['mean'], stddev(stats))
+        if (
+            regression.z_score >= Z_SCORE
+            and seconds >= regression.mean * (1 + RELATIVE)
+            and seconds - regression.mean >= ABSOLUTE
+        ):
+            found.append(regression)
+    return sorted(found, key=lambda regression: regression.z_score, reverse=True)
+
+
+def load(path: str) -> Dict[str, Dict[str, Stats]]:
+    if not os.path.exists(path):
+        return {'tests': {}, 'fixtures': {}}
+    with open(path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    return {'tests': baseline['tests'], 'fixtures': baseline['fixtures']}
+
+
+def save(path: str, baseline: Dict[str, Dict[str, Stats]]) -> None:
+    # Written to a temporary file first, so an interrupted write can't lose the
+    # baseline
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+class FixtureSetupSpanProcessor(SpanProcessor):
+    """Totals the number and duration of the setups of each fixture, named by the
+    fixture and its scope, from their spans as they end"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._fixtures: Dict[str, List[float]] = {}
+
+    def on_end(self, span: ReadableSpan) -> None:
+        attributes = span.attributes or {}
+        if attributes.get('pytest.span_type') != 'fixture':
+            return
+        if not span.name.endswith(' setup'):
+            return
+        fixture = str(attributes['code.function'])
+        scope = str(attributes['pytest.fixture_scope'])
+        seconds = ((span.end_time or 0) - (span.start_time or 0)) / 1e9
+        self.add(f'{fixture} ({scope})', 1, seconds)
+
+    def add(self, name: str, setups: int, seconds: float) -> None:
+        with self._lock:
+            totals = self._fixtures.setdefault(name, [0, 0.0])
+            totals[0] += setups
+            totals[1] += seconds
+
+    def fixtures(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {name: list(totals) for name, totals in self._fixtures.items()}
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class BaselinePlugin:
+    """Compares the durations of each test and the average setup of each fixture with
+    a baseline of previous runs, for --otel-baseline, and with --otel-baseline-save,
+    adds this run to the baseline.  The fixtures are timed by their setup spans, so
+    they are only compared with --otel-detail=fixture.  Under xdist, the workers send
+    the totals of the fixtures they set up to the controller, which does the
+    comparison."""
+
+    def __init__(
+        self,
+        config: Config,
+        plugin: 'PerTestOpenTelemetryPlugin',
+        path: str,
+        save: bool,
+        fail: bool,
+    ) -> None:
+        self.plugin = plugin
+        self.path = path
+        self.save = save
+        self.fail = fail
+        self.is_worker = hasattr(config, 'workerinput')
+        self.running: Dict[str, float] = {}
+        self.tests: Dict[str, float] = {}
+        self.found: List[Regression] = []
+        self.span_processor = FixtureSetupSpanProcessor()
+        add_span_processor(self.span_processor)
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        duration = self.running.pop(report.nodeid, 0.0) + report.duration
+        if report.when == 'teardown':
+            self.tests[report.nodeid] = duration
+        else:
+            self.running[report.nodeid] = duration
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        for name, setups, seconds in getattr(node, 'workeroutput', {}).get(
+            WORKEROUTPUT_KEY, []
+        ):
+            self.span_processor.add(name, setups, seconds)
+
+    def fixture_durations(self) -> Dict[str, float]:
+        return {
+            name: total / setups
+            for name, (setups, total) in self.span_processor.fixtures().items()
+        }
+
+    # This must run before the OpenTelemetryPlugin ends the session span
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session: Session) -> None:
+        if self.is_worker:  # pragma: no cover
+            workeroutput = getattr(session.config, 'workeroutput')
+            workeroutput[WORKEROUTPUT_KEY] = [
+                (name, int(setups), seconds)
+                for name, (setups, seconds) in self.span_processor.fixtures().items()
+            ]
+            return
+
+        baseline = load(self.path)
+        fixtures = self.fixture_durations()
+        self.found = regressions('test', baseline['tests'], self.tests) + regressions(
+            'fixture', baseline['fixtures'], fixtures
+        )
+
+        if session_span := getattr(self.plugin, 'session_span', None):
+            session_span.set_attribute('pytest.baseline.regressions', len(self.found))
+            if self.found:
+                session_span.set_attribute(
+                    'pytest.baseline.regressed',
+                    [f'{r.kind} {r.name}' for r in self.found[:SPAN_LIMIT]],
+                )
+
+        if self.save:
+            for section, durations in (('tests', self.tests), ('fixtures', fixtures)):
+                for name, seconds in durations.items():
+                    baseline[section][name] = updated(
+                        baseline[section].get(name), seconds
+                    )
+            save(self.path, baseline)
+
+        if self.fail and self.found and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
+        if self.is_worker or not self.found:
+            return
+
+        terminalreporter.write_sep(
+            '=', f'{len(self.found)} duration regressions against {self.path}'
+        )
+        for regression in self.found:
+            terminalreporter.write_line(regression.describe())
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        remove_span_processor(self.span_processor)
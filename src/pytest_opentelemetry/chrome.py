@@ -0,0 +1,138 @@
+import json
+import os
+from typing import Any, BinaryIO, Dict, List, Sequence
+
+from _pytest.config import Config
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import StatusCode
+
+from .files import merge_parts, part_paths
+from .plugin import is_xdist_controller
+from .processors import add_span_processor, remove_span_processor
+
+# All of the tracks are in one process, so they're shown together
+PID = 1
+
+
+def track_of(config: Config) -> int:
+    """The track of this process: 0 for the controller (or the only process), and
+    1 and up for the xdist workers gw0 and up"""
+    worker_id = getattr(config, 'workerinput', {}).get('workerid')
+    return int(worker_id[2:]) + 1 if worker_id else 0
+
+
+def track_name(config: Config) -> str:
+    if worker_id := getattr(config, 'workerinput', {}).get('workerid'):
+        return str(worker_id)
+    return 'controller' if is_xdist_controller(config) else 'pytest'
+
+
+def chrome_event(span: ReadableSpan, track: int) -> Dict[str, Any]:
+    """A complete ("X") event of the Chrome Trace Event format, with the times in
+    microseconds"""
+    attributes = dict(span.attributes or {})
+    if span.status.status_code is StatusCode.ERROR:
+        attributes['status'] = span.status.description or 'ERROR'
+    start = span.start_time or 0
+    return {
+        'name': span.name,
+        'cat': str(attributes.get('pytest.span_type', 'span')),
+        'ph': 'X',
+        'ts': start / 1000,
+        'dur': ((span.end_time or start) - start) / 1000,
+        'pid': PID,
+        'tid': track,
+        'args': attributes,
+    }
+
+
+def metadata_events(track: int, name: str) -> List[Dict[str, Any]]:
+    return [
+        {'name': 'process_name', 'ph': 'M', 'pid': PID, 'args': {'name': 'pytest'}},
+        {
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': PID,
+            'tid': track,
+            'args': {'name': name},
+        },
+        {
+            'name': 'thread_sort_index',
+            'ph': 'M',
+            'pid': PID,
+            'tid': track,
+            'args': {'sort_index': track},
+        },
+    ]
+
+
+def json_array(parts: Sequence[str], merged: BinaryIO) -> None:
+    """Combines the events written by each process of a run into one JSON array,
+    which is the simplest form of the Chrome Trace Event format"""
+    separator = b'[\n'
+    for part in parts:
+        with open(part, 'rb') as source:
+            for line in source:
+                merged.write(separator + line.rstrip(b'\n'))
+                separator = b',\n'
+    merged.write(b'[]\n' if separator == b'[\n' else b'\n]\n')
+
+
+class ChromeTraceSpanExporter(SpanExporter):
+    """Writes each span as a line with one Chrome Trace Event, on this process's
+    track"""
+
+    def __init__(self, path: str, track: int, name: str) -> None:
+        self.track = track
+        self.file = open(path, 'w', encoding='utf-8')
+        self._write(metadata_events(track, name))
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        self.file.write(
+            ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events)
+        )
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self._write([chrome_event(span, self.track) for span in spans])
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self.file.flush()
+        return True
+
+    def shutdown(self) -> None:
+        self.file.close()
+
+
+class ChromeTracePlugin:
+    """Writes the spans of the run to --otel-chrome-trace, for viewing in Perfetto
+    or chrome://tracing.  Each process writes its own part of the file, with its
+    own track, and the process that isn't an xdist worker merges them into one file
+    at the end of the run."""
+
+    def __init__(self, config: Config, path: str) -> None:
+        self.path = path
+        self.merges = not hasattr(config, 'workerinput')
+        if self.merges:
+            for stale in part_paths(path):
+                os.remove(stale)
+
+        track = track_of(config)
+        self.span_processor = BatchSpanProcessor(
+            ChromeTraceSpanExporter(
+                f'{path}.{track_name(config)}.part', track, track_name(config)
+            ),
+            max_queue_size=8192,
+        )
+        add_span_processor(self.span_processor)
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        remove_span_processor(self.span_processor)
+        self.span_processor.shutdown()
+        if self.merges:
+            merge_parts(self.path, json_array)
@@ -0,0 +1,153 @@
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+import pytest
+from _pytest.fixtures import FixtureDef, SubRequest
+from _pytest.main import Session
+from _pytest.nodes import Item, Node
+from opentelemetry import trace
+
+# A fixture's setup that is shared by the tests in a scope: the fixture, the node ID
+# of the class, module, or package (or '' for the session), and its parameter
+Key = Tuple[FixtureDef, str, Optional[int]]
+
+# The nodes whose tests share the setup of a fixture with each scope
+NODE_CLASSES: Dict[str, Type[Node]] = {
+    'class': pytest.Class,
+    'module': pytest.Module,
+    'package': pytest.Package,
+}
+
+
+class Setup(NamedTuple):
+    seconds: float
+    span: Optional[trace.SpanContext]
+
+
+def scope_nodeid(item: Item, scope: str) -> str:
+    """The node ID of the class, module, or package whose tests share the setup of a
+    fixture with `scope`, following the same rules as pytest: class-scoped fixtures
+    of tests outside of a class are set up for each test, and package-scoped
+    fixtures of tests outside of a package are set up once for the session."""
+    if scope == 'session':
+        return ''
+    if node := item.getparent(NODE_CLASSES[scope]):
+        return node.nodeid
+    return item.nodeid if scope == 'class' else ''
+
+
+def setup_key(item: Item, fixturedef: FixtureDef) -> Key:
+    callspec = getattr(item, 'callspec', None)
+    return (
+        fixturedef,
+        scope_nodeid(item, fixturedef.scope),
+        callspec.indices.get(fixturedef.argname) if callspec else None,
+    )
+
+
+def shared_fixtures(item: Item) -> Dict[str, Key]:
+    """The fixtures with a scope wider than the function that a test uses, and the
+    setups of them that it shares with the other tests in that scope"""
+    fixtureinfo = getattr(item, '_fixtureinfo', None)
+    if fixtureinfo is None:
+        return {}
+
+    shared = {}
+    for argname, fixturedefs in fixtureinfo.name2fixturedefs.items():
+        fixturedef = fixturedefs[-1]
+        if fixturedef.scope != 'function':
+            shared[argname] = setup_key(item, fixturedef)
+    return shared
+
+
+class AmortizedCostPlugin:
+    """Divides the setup of each fixture with a wider scope than the function evenly
+    among the tests that share it, for --otel-amortized-costs.  Each test's span
+    records its own cost, without the setups of any shared fixtures that happened to
+    run during it, and its share of all of the shared fixtures it uses, and links to
+    the spans of their setups.
+
+    The number of tests sharing each setup is counted from the collected tests, and
+    setups are forgotten once all of those tests have run."""
+
+    def __init__(self) -> None:
+        self.users: Dict[Key, int] = {}
+        self.remaining: Dict[Key, int] = {}
+        self.setups: Dict[Key, Setup] = {}
+        self.item: Optional[Item] = None
+        self.shared_setup_seconds = 0.0
+        self.nested: List[float] = []
+
+    def pytest_collection_finish(self, session: Session) -> None:
+        for item in session.items:
+            for key in shared_fixtures(item).values():
+                self.users[key] = self.users.get(key, 0) + 1
+        self.remaining = dict(self.users)
+
+    # This must run inside of the ItemSpansPlugin's test span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
+        self.item = item
+        self.shared_setup_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.item = None
+        elapsed = time.perf_counter() - start
+
+        test_span = trace.get_current_span()
+        shared = 0.0
+        for argname, key in shared_fixtures(item).items():
+            if setup := self.setups.get(key):
+                shared += setup.seconds / self.users.get(key, 1)
+                if setup.span:
+                    test_span.add_link(setup.span, {'pytest.fixture': argname})
+            self.release(key)
+
+        own = elapsed - self.shared_setup_seconds
+        test_span.set_attributes(
+            {
+                'pytest.cost.own_seconds': own,
+                'pytest.cost.shared_seconds': shared,
+                'pytest.cost.amortized_seconds': own + shared,
+            }
+        )
+
+    def release(self, key: Key) -> None:
+        remaining = self.remaining.get(key, 1) - 1
+        if remaining > 0:
+            self.remaining[key] = remaining
+            return
+        self.remaining.pop(key, None)
+        self.setups.pop(key, None)
+
+    # This must run inside of the FixtureSpansPlugin's setup span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> Iterator[None]:
+        if fixturedef.scope == 'function' or self.item is None:
+            yield
+            return
+
+        span = trace.get_current_span()
+        attributes: Dict[str, Any] = getattr(span, 'attributes', None) or {}
+        is_setup_span = attributes.get('pytest.span_type') == 'fixture'
+
+        # The setups of any shared fixtures that this one requests are their own
+        self.nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            nested = self.nested.pop()
+        if self.nested:
+            self.nested[-1] += seconds
+        else:
+            self.shared_setup_seconds += seconds
+
+        self.setups[setup_key(self.item, fixturedef)] = Setup(
+            seconds - nested, span.get_span_context() if is_setup_span else None
+        )
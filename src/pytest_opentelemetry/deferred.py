@@ -0,0 +1,344 @@
+import functools
+import time
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import pytest
+from _pytest.fixtures import FixtureDef, SubRequest
+from _pytest.main import Session
+from _pytest.nodes import Item, Node
+from _pytest.reports import TestReport
+from _pytest.runner import CallInfo
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.context.context import Context
+from opentelemetry.trace import Status, StatusCode
+
+from .exceptions import ExceptionPayloads
+from .instrumentation import DETAIL_LEVELS, tracer
+
+if TYPE_CHECKING:
+    from .instrumentation import PerTestOpenTelemetryPlugin
+
+# The spans are built in batches of about this many records, between tests
+BATCH_SIZE = 1024
+
+# The kinds of records, and the suffixes of their span names
+TEST, SETUP, CALL, TEARDOWN, FIXTURE_SETUP, FIXTURE_TEARDOWN = range(6)
+SUFFIXES = ('', '::setup', '::call', '::teardown', ' setup', ' teardown')
+
+# The statuses of records, in order of precedence
+UNSET, OK, ERROR = range(3)
+STATUS_CODES = (StatusCode.UNSET, StatusCode.OK, StatusCode.ERROR)
+
+
+class SpanBuffer:
+    """Records spans as rows of preallocated arrays, holding only the kind of span,
+    the index of its test or fixture, the index of its parent, its start and end on
+    the monotonic clock, and its status.  Starting and ending a record costs little
+    more than reading the clock.  The spans are only built by flush().
+
+    Records are appended as they start, so a parent always comes before its
+    children."""
+
+    def __init__(self, capacity: int = BATCH_SIZE) -> None:
+        self.kinds = array('B', bytes(capacity))
+        self.nodes = array('q', bytes(8 * capacity))
+        self.parents = array('q', bytes(8 * capacity))
+        self.starts = array('q', bytes(8 * capacity))
+        self.ends = array('q', bytes(8 * capacity))
+        self.statuses = array('B', bytes(capacity))
+        self.size = 0
+
+        self.open: List[int] = []
+        # The attributes of the exception event and the status description of each
+        # failed test
+        self.failures: Dict[int, Tuple[Dict[str, str], str]] = {}
+        self.node_indexes: Dict[Hashable, int] = {}
+        self.node_names: List[str] = []
+        self.node_attributes: List[Any] = []
+
+        # The monotonic clock is converted to the wall clock when the spans are built
+        self.epoch = time.time_ns() - time.perf_counter_ns()
+
+    def node(self, key: Hashable, name: str, attributes: Any) -> int:
+        """The index of a test or fixture, whose attributes are only computed when
+        the spans are built, from attributes() if it is callable"""
+        try:
+            return self.node_indexes[key]
+        except KeyError:
+            index = self.node_indexes[key] = len(self.node_names)
+            self.node_names.append(name)
+            self.node_attributes.append(attributes)
+            return index
+
+    def begin(self, kind: int, node: int) -> int:
+        index = self.size
+        if index == len(self.kinds):
+            self._grow()
+        self.kinds[index] = kind
+        self.nodes[index] = node
+        self.parents[index] = self.open[-1] if self.open else -1
+        self.statuses[index] = UNSET
+        self.size = index + 1
+        self.open.append(index)
+        self.starts[index] = time.perf_counter_ns()
+        return index
+
+    def end(self, index: int) -> None:
+        self.ends[index] = time.perf_counter_ns()
+        self.open.remove(index)
+
+    def set_status(self, index: int, status: int) -> None:
+        self.statuses[index] = max(self.statuses[index], status)
+
+    def _grow(self) -> None:
+        for column in (
+            self.kinds,
+            self.nodes,
+            self.parents,
+            self.starts,
+            self.ends,
+            self.statuses,
+        ):
+            column.extend(column)
+
+    def discard_from(self, index: int) -> None:
+        """Discards a record and all of the records after it, like those of a test
+        and everything within it"""
+        self.size = index
+
+    def flush(self, context: Optional[Context] = None) -> None:
+        """Builds the spans of all of the records, which must have all ended, and
+        clears the buffer.  The spans are all started in order, and then ended in the
+        order they ended, so that span processors see them as they would have if they
+        were recorded as they happened."""
+        spans: List[trace.Span] = []
+        for index in range(self.size):
+            node = self.nodes[index]
+            if callable(self.node_attributes[node]):
+                self.node_attributes[node] = self.node_attributes[node]()
+            parent_index = self.parents[index]
+            span = tracer.start_span(
+                self.node_names[node] + SUFFIXES[self.kinds[index]],
+                context=(
+                    trace.set_span_in_context(spans[parent_index])
+                    if parent_index >= 0
+                    else context
+                ),
+                attributes=self.node_attributes[node],
+                start_time=self.epoch + self.starts[index],
+            )
+            if failure := self.failures.get(index):
+                attributes, description = failure
+                span.add_event(
+                    'exception', attributes, timestamp=self.epoch + self.ends[index]
+                )
+                span.set_status(Status(StatusCode.ERROR, description))
+            elif status := self.statuses[index]:
+                span.set_status(STATUS_CODES[status])
+            spans.append(span)
+
+        # Children end no later than their parents, so they come first in a tie
+        for index in sorted(
+            range(self.size), key=lambda index: (self.ends[index], -index)
+        ):
+            spans[index].end(end_time=self.epoch + self.ends[index])
+
+        self.size = 0
+        self.failures.clear()
+        self.node_indexes.clear()
+        self.node_names.clear()
+        self.node_attributes.clear()
+
+
+class DeferredSpansPlugin:
+    """Base for the plugins that record the spans of each level of --otel-detail
+    into a shared SpanBuffer, for --otel-deferred"""
+
+    def __init__(
+        self, plugin: 'PerTestOpenTelemetryPlugin', buffer: SpanBuffer
+    ) -> None:
+        self.plugin = plugin
+        self.buffer = buffer
+
+    def item_node(self, item: Item) -> int:
+        return self.buffer.node(
+            item,
+            item.nodeid,
+            lambda: self.plugin._compute_item_attributes(item),
+        )
+
+
+class DeferredItemSpansPlugin(DeferredSpansPlugin):
+    """Records each test, and builds the spans between tests once the buffer has a
+    batch of them.  Tests that passed in less than the --otel-min-duration are
+    discarded before their spans are ever built."""
+
+    def __init__(
+        self,
+        plugin: 'PerTestOpenTelemetryPlugin',
+        buffer: SpanBuffer,
+        min_duration_ms: Optional[float],
+    ) -> None:
+        super().__init__(plugin, buffer)
+        self.min_duration_ns = (
+            None if min_duration_ms is None else int(min_duration_ms * 1_000_000)
+        )
+
+    # This must be outside of the TailSamplingPlugin, so that the spans of earlier
+    # tests aren't held back with the spans of this one
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
+        buffer = self.buffer
+        self.test = test = buffer.begin(TEST, self.item_node(item))
+        self.failed = False
+
+        # Spans from the code under test have no test span to be parented to, so
+        # they are parented to the test run instead
+        item_parent = self.plugin.item_parent
+        token = otel_context.attach(item_parent) if item_parent else None
+        try:
+            yield
+        finally:
+            if token:
+                otel_context.detach(token)
+            buffer.end(test)
+
+        if (
+            self.min_duration_ns is not None
+            and not self.failed
+            and buffer.ends[test] - buffer.starts[test] < self.min_duration_ns
+        ):
+            buffer.discard_from(test)
+
+        if buffer.size >= BATCH_SIZE and not buffer.open:
+            self.flush()
+
+    def pytest_exception_interact(
+        self, node: Node, call: CallInfo[Any], report: TestReport
+    ) -> None:
+        # Errors in collection happen outside of any test
+        if not self.buffer.open:
+            return
+
+        excinfo = call.excinfo
+        assert excinfo
+        attributes = self.plugin.exception_payloads.attributes(
+            excinfo.value, report.longrepr
+        )
+        self.buffer.failures[self.test] = (
+            attributes,
+            ExceptionPayloads.description(excinfo.value, attributes),
+        )
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        # The xdist controller gets the reports of the tests its workers ran
+        if not self.buffer.open:
+            return
+
+        self.failed |= report.failed
+        if report.when == 'call':
+            self.buffer.set_status(self.test, ERROR if report.failed else OK)
+
+    def flush(self) -> None:
+        self.buffer.flush(self.plugin.item_parent)
+
+    # The spans of the tests must be built before the OpenTelemetryPlugin ends the
+    # session span.  When a run is stopped within a test, like with pytest.exit(),
+    # pytest only tears down its fixtures after all of the other plugins have finished
+    # the session, so the spans of those teardowns are built after it.
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_sessionfinish(self, session: Session) -> Iterator[None]:
+        self.flush()
+        yield
+        if self.buffer.size:
+            self.flush()
+            self.plugin.try_force_flush()
+
+
+class DeferredPhaseSpansPlugin(DeferredSpansPlugin):
+    """Records the setup, call, and teardown phases of each test"""
+
+    def record(self, kind: int, item: Item) -> Iterator[None]:
+        buffer = self.buffer
+        index = buffer.begin(kind, self.item_node(item))
+        try:
+            yield
+        finally:
+            buffer.end(index)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item: Item) -> Iterator[None]:
+        yield from self.record(SETUP, item)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: Item) -> Iterator[None]:
+        yield from self.record(CALL, item)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item: Item) -> Iterator[None]:
+        yield from self.record(TEARDOWN, item)
+
+
+class DeferredFixtureSpansPlugin(DeferredSpansPlugin):
+    """Records the setup and teardown of each fixture, timing the teardowns the same
+    way as the FixtureSpansPlugin, but without a span for each of their finalizers"""
+
+    def __init__(
+        self, plugin: 'PerTestOpenTelemetryPlugin', buffer: SpanBuffer
+    ) -> None:
+        super().__init__(plugin, buffer)
+        self.teardowns: Dict[FixtureDef, int] = {}
+
+    def fixture_node(self, fixturedef: FixtureDef, request: SubRequest) -> int:
+        name = self.plugin._name_from_fixturedef(fixturedef, request)
+        return self.buffer.node(
+            (fixturedef, name),
+            name,
+            lambda: self.plugin._attributes_from_fixturedef(fixturedef),
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> Iterator[None]:
+        buffer = self.buffer
+        index = buffer.begin(FIXTURE_SETUP, self.fixture_node(fixturedef, request))
+        try:
+            yield
+        finally:
+            buffer.end(index)
+
+        fixturedef.addfinalizer(
+            functools.partial(self.start_teardown, fixturedef, request)
+        )
+
+    def start_teardown(self, fixturedef: FixtureDef, request: SubRequest) -> None:
+        self.teardowns[fixturedef] = self.buffer.begin(
+            FIXTURE_TEARDOWN, self.fixture_node(fixturedef, request)
+        )
+
+    def pytest_fixture_post_finalizer(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> None:
+        index = self.teardowns.pop(fixturedef, None)
+        if index is not None:
+            self.buffer.end(index)
+
+
+def deferred_span_plugins(
+    plugin: 'PerTestOpenTelemetryPlugin',
+    detail: int,
+    min_duration_ms: Optional[float],
+) -> List[DeferredSpansPlugin]:
+    """The plugins that record each level of detail up to `detail` into one buffer"""
+    buffer = SpanBuffer()
+    plugins: List[Tuple[str, DeferredSpansPlugin]] = [
+        ('test', DeferredItemSpansPlugin(plugin, buffer, min_duration_ms)),
+        ('phase', DeferredPhaseSpansPlugin(plugin, buffer)),
+        ('fixture', DeferredFixtureSpansPlugin(plugin, buffer)),
+    ]
+    return [
+        deferred for level, deferred in plugins if detail >= DETAIL_LEVELS.index(level)
+    ]
@@ -0,0 +1,100 @@
+import hashlib
+from types import TracebackType
+from typing import Dict, Optional, Set
+
+from opentelemetry.semconv.trace import SpanAttributes
+
+# The defaults for --otel-exception-span-bytes and --otel-exception-run-bytes
+SPAN_BYTES = 32 * 1024
+RUN_BYTES = 8 * 1024 * 1024
+
+# Even once the budget for the run is used up, this much of each message is kept, so
+# that every failure says something about what went wrong
+MINIMUM_MESSAGE_BYTES = 256
+
+TRUNCATED = '\n[truncated]'
+
+
+def truncate(text: str, limit: int) -> str:
+    """Cuts text down to at most `limit` bytes of UTF-8, marking where it was cut"""
+    encoded = text.encode('utf-8')
+    if len(encoded) <= limit:
+        return text
+    cut = max(limit - len(TRUNCATED), 0)
+    return encoded[:cut].decode('utf-8', 'ignore') + TRUNCATED
+
+
+def fingerprint(exception: BaseException) -> str:
+    """Identifies failures that happened the same way: the same type of exception,
+    raised from the same line.  Frames that pytest hides from tracebacks, like that
+    of pytest.fail(), don't count, so that every call to pytest.fail() isn't the
+    same failure.  This only walks the traceback, without formatting it."""
+    raised_at: Optional[TracebackType] = None
+    traceback = exception.__traceback__
+    while traceback is not None:
+        if not traceback.tb_frame.f_locals.get('__tracebackhide__'):
+            raised_at = traceback
+        traceback = traceback.tb_next
+
+    digest = hashlib.blake2b(type(exception).__qualname__.encode(), digest_size=8)
+    if raised_at is not None:
+        code = raised_at.tb_frame.f_code
+        digest.update(
+            f'{code.co_filename}:{raised_at.tb_lineno}:{code.co_name}'.encode()
+        )
+    return digest.hexdigest()
+
+
+class ExceptionPayloads:
+    """Builds the attributes of the exception events of failing spans within a
+    budget of bytes per span and per run (of each process, with xdist).  Only the
+    first failure with each fingerprint gets the formatted stack trace, and the
+    others refer to it by the fingerprint.  Once the budget for the run is used up,
+    the stack traces aren't even formatted."""
+
+    def __init__(self, span_bytes: int = SPAN_BYTES, run_bytes: int = RUN_BYTES):
+        self.span_bytes = span_bytes
+        self.run_bytes = run_bytes
+        self.used = 0
+        self.fingerprints: Set[str] = set()
+
+    def attributes(self, exception: BaseException, longrepr: object) -> Dict[str, str]:
+        """The attributes of an exception event, where the stack trace is
+        str(longrepr), as pytest reports it"""
+        # The message can have at most half of the span's budget, leaving the rest
+        # for the stack trace
+        remaining = self.run_bytes - self.used
+        message = truncate(
+            str(exception),
+            min(self.span_bytes // 2, max(remaining, MINIMUM_MESSAGE_BYTES)),
+        )
+        self.used += len(message.encode('utf-8'))
+
+        identity = fingerprint(exception)
+        attributes: Dict[str, str] = {
+            SpanAttributes.EXCEPTION_TYPE: type(exception).__qualname__,
+            SpanAttributes.EXCEPTION_MESSAGE: message,
+            SpanAttributes.EXCEPTION_ESCAPED: 'False',
+            'pytest.exception.fingerprint': identity,
+        }
+
+        room = min(
+            self.span_bytes - len(message.encode('utf-8')),
+            self.run_bytes - self.used,
+        )
+        if identity in self.fingerprints:
+            attributes['pytest.exception.stacktrace_omitted'] = 'duplicate'
+        elif room <= 0:
+            attributes['pytest.exception.stacktrace_omitted'] = 'budget'
+        else:
+            self.fingerprints.add(identity)
+            stacktrace = truncate(str(longrepr), room)
+            self.used += len(stacktrace.encode('utf-8'))
+            attributes[SpanAttributes.EXCEPTION_STACKTRACE] = stacktrace
+        return attributes
+
+    @staticmethod
+    def description(exception: BaseException, attributes: Dict[str, str]) -> str:
+        """The description of a failing span's status: the exception's class, and
+        its message as it is in the attributes of the exception event"""
+        return f'{type(exception)}: {attributes[SpanAttributes.EXCEPTION_MESSAGE]}'
@@ -0,0 +1,139 @@
+import base64
+import glob
+import gzip
+import json
+import os
+import shutil
+from io import BufferedIOBase
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Sequence
+
+import pytest
+from _pytest.config import Config
+from google.protobuf.json_format import MessageToDict
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from .plugin import is_xdist_controller
+from .processors import add_span_processor, remove_span_processor
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+def open_for_writing(path: str, compressed_like: str) -> BufferedIOBase:
+    """Opens a binary file for writing, compressed according to the extension of
+    `compressed_like`: .gz for gzip, .zst or .zstd for zstandard, and uncompressed
+    for anything else."""
+    if compressed_like.endswith('.gz'):
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compressed_like.endswith(('.zst', '.zstd')):
+        if zstandard is None:
+            raise pytest.UsageError(
+                f'Writing {compressed_like} requires the zstandard package'
+            )
+        return zstandard.open(path, 'wb')  # pragma: no cover
+    return open(path, 'wb')
+
+
+def part_paths(path: str) -> List[str]:
+    return sorted(glob.glob(f'{glob.escape(path)}.*.part'))
+
+
+def copy_parts(parts: Sequence[str], merged: BinaryIO) -> None:
+    """Each part is a complete gzip or zstandard stream, and both formats allow
+    streams to be concatenated, so the compressed bytes are copied without
+    recompressing them."""
+    for part in parts:
+        with open(part, 'rb') as source:
+            shutil.copyfileobj(source, merged)
+
+
+def merge_parts(
+    path: str, combine: Callable[[Sequence[str], BinaryIO], None] = copy_parts
+) -> None:
+    """Combines the files written by each process of a run into one file, and
+    removes them"""
+    parts = part_paths(path)
+    with open(path, 'wb') as merged:
+        combine(parts, merged)
+    for part in parts:
+        os.remove(part)
+
+
+def _hex_ids(value: Dict[str, Any], fields: Iterable[str]) -> None:
+    # OTLP/JSON encodes trace and span IDs in hex, unlike protobuf's standard JSON
+    # mapping of bytes fields, which uses base64
+    for field in fields:
+        if field in value:
+            value[field] = base64.b64decode(value[field]).hex()
+
+
+def otlp_json(spans: Sequence[ReadableSpan]) -> str:
+    """Encodes spans as a single line of OTLP/JSON, suitable for the OpenTelemetry
+    Collector's otlpjsonfile receiver"""
+    message = MessageToDict(encode_spans(spans), use_integers_for_enums=True)
+    for resource_spans in message.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                _hex_ids(span, ('traceId', 'spanId', 'parentSpanId'))
+                for link in span.get('links', []):
+                    _hex_ids(link, ('traceId', 'spanId'))
+    return json.dumps(message, separators=(',', ':'))
+
+
+class OTLPJSONLinesSpanExporter(SpanExporter):
+    """Writes each batch of spans as a line of OTLP/JSON to a (possibly compressed)
+    file"""
+
+    def __init__(self, path: str, compressed_like: str) -> None:
+        self.file = open_for_writing(path, compressed_like)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self.file.write(otlp_json(spans).encode('utf-8') + b'\n')
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self.file.flush()
+        return True
+
+    def shutdown(self) -> None:
+        self.file.close()
+
+
+class FileExportPlugin:
+    """Streams finished spans to --export-traces-file from a background thread.
+    Under xdist, each process writes its own part of the file, and the controller
+    merges them into one file at the end of the run."""
+
+    def __init__(self, config: Config, path: str) -> None:
+        self.path = path
+        self.merges = is_xdist_controller(config)
+        if worker_id := getattr(config, 'workerinput', {}).get('workerid'):
+            destination = f'{path}.{worker_id}.part'
+        elif self.merges:
+            for stale in part_paths(path):
+                os.remove(stale)
+            destination = f'{path}.controller.part'
+        else:
+            destination = path
+
+        # The batch processor's queue bounds how many finished spans are held in
+        # memory, so an exporter that can't keep up drops spans rather than growing
+        self.span_processor = BatchSpanProcessor(
+            OTLPJSONLinesSpanExporter(destination, compressed_like=path),
+            max_queue_size=8192,
+        )
+        add_span_processor(self.span_processor)
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        remove_span_processor(self.span_processor)
+        self.span_processor.shutdown()
+        if self.merges:
+            merge_parts(self.path)
@@ -0,0 +1,97 @@
+import gc
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session
+from _pytest.reports import TestReport
+from opentelemetry import trace
+from opentelemetry.context.context import Context
+
+from .instrumentation import tracer
+
+if TYPE_CHECKING:
+    from .instrumentation import PerTestOpenTelemetryPlugin
+
+
+class Collection(NamedTuple):
+    """A garbage collection that took at least the --otel-gc-threshold"""
+
+    start_time: int
+    end_time: int
+    generation: int
+    collected: int
+    uncollectable: int
+    parent: trace.Span
+
+
+class GarbageCollectionPlugin:
+    """Records the garbage collections that take at least the --otel-gc-threshold as
+    spans, under the span that was current when they happened, so that the time spent
+    collecting is attributed to the test or fixture that paid for it.
+
+    Garbage collection can happen at any allocation, including while the
+    OpenTelemetry SDK holds one of its locks, so the gc callback only notes the
+    collection.  The spans are made after each phase of each test."""
+
+    def __init__(self, plugin: 'PerTestOpenTelemetryPlugin', threshold_ms: float):
+        self.plugin = plugin
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+        self.collections: List[Collection] = []
+        self.started: Optional[int] = None
+        gc.callbacks.append(self.callback)
+
+    def callback(self, phase: str, info: Dict[str, Any]) -> None:
+        now = time.time_ns()
+        if phase == 'start':
+            self.started = now
+            return
+
+        if self.started is None or now - self.started < self.threshold_ns:
+            return
+
+        self.collections.append(
+            Collection(
+                self.started,
+                now,
+                info['generation'],
+                info['collected'],
+                info['uncollectable'],
+                trace.get_current_span(),
+            )
+        )
+        self.started = None
+
+    def record(self) -> None:
+        collections, self.collections = self.collections, []
+        for collection in collections:
+            parent = collection.parent
+            context: Optional[Context]
+            if parent.get_span_context().is_valid:
+                context = trace.set_span_in_context(parent)
+            else:
+                context = self.plugin.item_parent
+
+            tracer.start_span(
+                f'gc generation {collection.generation}',
+                context=context,
+                attributes={
+                    'pytest.span_type': 'gc',
+                    'pytest.gc.generation': collection.generation,
+                    'pytest.gc.collected': collection.collected,
+                    'pytest.gc.uncollectable': collection.uncollectable,
+                },
+                start_time=collection.start_time,
+            ).end(end_time=collection.end_time)
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        self.record()
+
+    # This must run before the OpenTelemetryPlugin ends the session span
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session: Session) -> None:
+        self.record()
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        gc.callbacks.remove(self.callback)
@@ -0,0 +1,97 @@
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session
+from _pytest.reports import TestReport
+
+# The weight given to the newest duration of a test when it is blended into its
+# history, so that a test that gets slower (or faster) is noticed within a few runs,
+# without one unusual run replacing what we know about it
+WEIGHT = 0.3
+
+# How many finished tests to hold before writing them to the history
+BATCH_SIZE = 1000
+
+
+class DurationHistory:
+    """The durations of tests from previous runs, stored in a SQLite database as an
+    exponentially-weighted moving average per test"""
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS durations ('
+                '  nodeid TEXT PRIMARY KEY,'
+                '  seconds REAL NOT NULL,'
+                '  runs INTEGER NOT NULL'
+                ')'
+            )
+
+    def record(self, durations: Iterable[Tuple[str, float]]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO durations (nodeid, seconds, runs) VALUES (?, ?, 1) '
+                'ON CONFLICT (nodeid) DO UPDATE SET '
+                '  seconds = seconds + ? * (excluded.seconds - seconds),'
+                '  runs = runs + 1',
+                ((nodeid, seconds, WEIGHT) for nodeid, seconds in durations),
+            )
+
+    def durations(self) -> Dict[str, float]:
+        return dict(self.connection.execute('SELECT nodeid, seconds FROM durations'))
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def estimate(durations: Dict[str, float], nodeids: Iterable[str]) -> Dict[str, float]:
+    """Estimates the duration of each test from its history.  Tests without any
+    history are assumed to take as long as the average test, or when there's no
+    history at all, to take the same time as each other."""
+    average = sum(durations.values()) / len(durations) if durations else 1.0
+    return {nodeid: durations.get(nodeid, average) for nodeid in nodeids}
+
+
+class HistoryPlugin:
+    """Records the duration of each test (its setup, call, and teardown) to the
+    --otel-history, and under xdist, schedules the tests longest-first using it.
+    Under xdist, only the controller records, from the reports of every worker."""
+
+    def __init__(self, path: str) -> None:
+        self.history = DurationHistory(path)
+        self.running: Dict[str, float] = {}
+        self.finished: List[Tuple[str, float]] = []
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        duration = self.running.pop(report.nodeid, 0.0) + report.duration
+        if report.when != 'teardown':
+            self.running[report.nodeid] = duration
+            return
+
+        self.finished.append((report.nodeid, duration))
+        if len(self.finished) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.history.record(self.finished)
+        self.finished.clear()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(
+        self, config: Config, log: object
+    ) -> Optional[object]:
+        if config.getoption('dist') != 'load':
+            return None
+
+        from .scheduling import LongestFirstScheduling
+
+        return LongestFirstScheduling(config, log, self.history.durations())
+
+    def pytest_sessionfinish(self, session: Session) -> None:
+        self.flush()
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        self.history.close()
@@ -1,37 +1,58 @@
+import functools
 import os
-from typing import Any, Dict, Iterator, Optional, Union
+from contextvars import Token
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import pytest
 from _pytest.config import Config
 from _pytest.fixtures import FixtureDef, FixtureRequest, SubRequest
 from _pytest.main import Session
-from _pytest.nodes import Item, Node
-from _pytest.reports import TestReport
+from _pytest.nodes import Collector, Item, Node
+from _pytest.reports import CollectReport, TestReport
 from _pytest.runner import CallInfo
-from opentelemetry import propagate, trace
+from opentelemetry import context as otel_context
+from opentelemetry import trace
 from opentelemetry.context.context import Context
-from opentelemetry.sdk.resources import OTELResourceDetector
 from opentelemetry.semconv.trace import SpanAttributes
 from opentelemetry.trace import Status, StatusCode
-from opentelemetry_container_distro import (
-    OpenTelemetryContainerConfigurator,
-    OpenTelemetryContainerDistro,
-)
 
-from .resource import CodebaseResourceDetector
+from .exceptions import RUN_BYTES, SPAN_BYTES, ExceptionPayloads
+
+# The SDK, its configuration, and the exporters are imported by pytest_configure, and
+# only for the features that are enabled, since they are slow to import.
+# pylint: disable=import-outside-toplevel
 
 tracer = trace.get_tracer('pytest-opentelemetry')
 
+Attributes = Dict[str, Union[str, int]]
+
+# The levels of --otel-detail, from the least to the most detailed.  Each level
+# includes the spans of all of the levels before it.
+DETAIL_LEVELS = ('session', 'test', 'phase', 'fixture')
+
 
 class PerTestOpenTelemetryPlugin:
     """base logic for all otel pytest integration"""
 
     @property
-    def item_parent(self) -> Union[str, None]:
+    def item_parent(self) -> Optional[Context]:
         return self.trace_parent
 
     @classmethod
     def get_trace_parent(cls, config: Config) -> Optional[Context]:
+        from opentelemetry import propagate
+
         if trace_parent := config.getvalue('--trace-parent'):
             return propagate.extract({'traceparent': trace_parent})
 
@@ -52,23 +73,212 @@ class PerTestOpenTelemetryPlugin:
             return False
 
     def pytest_configure(self, config: Config) -> None:
+        from opentelemetry.sdk.resources import OTELResourceDetector
+        from opentelemetry_container_distro import (
+            OpenTelemetryContainerConfigurator,
+            OpenTelemetryContainerDistro,
+        )
+
+        from .resource import CodebaseResourceDetector
+
+        # These record onto the spans of tests and fixtures while they run, which
+        # don't exist yet when the spans are deferred
+        if config.getoption('--otel-deferred', False):
+            for option in (
+                '--otel-resource-usage',
+                '--otel-profile',
+                '--otel-amortized-costs',
+            ):
+                if config.getoption(option, None) not in (None, False):
+                    raise pytest.UsageError(
+                        f'{option} can not be used with --otel-deferred'
+                    )
+
+        # An xdist worker is only sent some of the tests, a few at a time, so it can't
+        # know how many of the tests that share a setup it will run
+        if config.getoption('--otel-amortized-costs', False):
+            from .plugin import is_xdist_controller
+
+            if is_xdist_controller(config):
+                raise pytest.UsageError(
+                    '--otel-amortized-costs can not be used with pytest-xdist'
+                )
+
         self.trace_parent = self.get_trace_parent(config)
 
         # This can't be tested both ways in one process
         if config.getoption('--export-traces'):  # pragma: no cover
             OpenTelemetryContainerDistro().configure()
+            if config.getoption('--otel-metrics', False):
+                os.environ.setdefault('OTEL_METRICS_EXPORTER', 'otlp_proto_grpc')
 
         configurator = OpenTelemetryContainerConfigurator()
-        configurator.resource_detectors.append(CodebaseResourceDetector(config))
+        self.codebase_detector = CodebaseResourceDetector(config)
+        configurator.resource_detectors.append(self.codebase_detector)
         configurator.resource_detectors.append(OTELResourceDetector())
         configurator.configure()
 
+        if config.getoption('--otel-metrics', False):
+            from .metrics import MetricsPlugin
+
+            config.pluginmanager.register(MetricsPlugin(config))
+
+        profile = config.getoption('--otel-profile', None)
+        if profile is not None:
+            from .profiling import ProfilingPlugin
+
+            config.pluginmanager.register(ProfilingPlugin(profile))
+
+        threshold = config.getoption('--otel-gc-threshold', None)
+        if threshold is not None:
+            from .garbage import GarbageCollectionPlugin
+
+            config.pluginmanager.register(GarbageCollectionPlugin(self, threshold))
+
+        # Under xdist, the controller records the history from every worker's reports
+        history = config.getoption('--otel-history', None)
+        if history and not hasattr(config, 'workerinput'):
+            from .history import HistoryPlugin
+
+            config.pluginmanager.register(HistoryPlugin(history))
+
+        scope_report = config.getoption('--otel-scope-report', False)
+        scope_report_json = config.getoption('--otel-scope-report-json', None)
+        if scope_report or scope_report_json:
+            from .scopes import ScopeAnalysisPlugin
+
+            config.pluginmanager.register(
+                ScopeAnalysisPlugin(config, self, scope_report, scope_report_json)
+            )
+
+        if path := config.getoption('--export-traces-file', None):
+            from .files import FileExportPlugin
+
+            config.pluginmanager.register(FileExportPlugin(config, path))
+
+        if path := config.getoption('--otel-chrome-trace', None):
+            from .chrome import ChromeTracePlugin
+
+            config.pluginmanager.register(ChromeTracePlugin(config, path))
+
+        self.exception_payloads = ExceptionPayloads(
+            config.getoption('--otel-exception-span-bytes', SPAN_BYTES),
+            config.getoption('--otel-exception-run-bytes', RUN_BYTES),
+        )
+
+        # The span attributes for tests and fixtures are computed once and shared by
+        # all of their spans.  Tests are released from the cache as they finish, and
+        # fixtures when the session finishes.
+        self.item_attributes: Dict[Item, Attributes] = {}
+        self.fixturedef_attributes: Dict[FixtureDef, Attributes] = {}
+
+        # The sampler is registered before the span plugins, so that with
+        # --otel-deferred, the spans of earlier tests are built outside of it
+        sampler = None
+        min_duration = config.getoption('--otel-min-duration', None)
+        if min_duration is not None:
+            from .sampling import TailSamplingPlugin, TailSamplingSpanProcessor
+
+            if sampler := TailSamplingSpanProcessor.install():
+                plugin = TailSamplingPlugin(sampler, min_duration)
+                config.pluginmanager.register(plugin)
+        self.sampler = sampler
+
+        # The summary's span processor is added after the sampler, outside of it, so
+        # that it sees the spans of every test, not only the ones that are exported
+        if limit := config.getoption('--otel-summary', 0):
+            from .summary import SummaryPlugin
+
+            config.pluginmanager.register(SummaryPlugin(config, limit))
+
+        # Likewise, the baseline times the setups of fixtures from all of their spans
+        if baseline := config.getoption('--otel-baseline', None):
+            from .baseline import BaselinePlugin
+
+            config.pluginmanager.register(
+                BaselinePlugin(
+                    config,
+                    self,
+                    baseline,
+                    save=config.getoption('--otel-baseline-save'),
+                    fail=config.getoption('--otel-baseline-fail'),
+                )
+            )
+
+        self.register_span_plugins(config)
+
+    def register_span_plugins(self, config: Config) -> None:
+        """Registers the hookwrappers for each level of detail up to --otel-detail.
+        The levels below that are never registered with pytest at all, so they cost
+        nothing per test, rather than just producing fewer spans."""
+        detail = DETAIL_LEVELS.index(config.getoption('--otel-detail', 'fixture'))
+        if detail >= DETAIL_LEVELS.index('test'):
+            config.pluginmanager.register(CollectionSpansPlugin(self))
+
+        if config.getoption('--otel-deferred', False):
+            from .deferred import deferred_span_plugins
+
+            min_duration = config.getoption('--otel-min-duration', None)
+            for deferred in deferred_span_plugins(self, detail, min_duration):
+                config.pluginmanager.register(deferred)
+        else:
+            for level, plugin_class in (
+                ('test', ItemSpansPlugin),
+                ('phase', PhaseSpansPlugin),
+                ('fixture', FixtureSpansPlugin),
+            ):
+                if detail >= DETAIL_LEVELS.index(level):
+                    config.pluginmanager.register(plugin_class(self))
+
+        amortize = config.getoption('--otel-amortized-costs', False)
+        if amortize and detail >= DETAIL_LEVELS.index('test'):
+            from .costs import AmortizedCostPlugin
+
+            config.pluginmanager.register(AmortizedCostPlugin())
+
+        if config.getoption('--otel-resource-usage', False):
+            from .usage import CallUsagePlugin, FixtureUsagePlugin
+
+            for level, usage_class in (
+                ('phase', CallUsagePlugin),
+                ('fixture', FixtureUsagePlugin),
+            ):
+                if detail >= DETAIL_LEVELS.index(level):
+                    config.pluginmanager.register(usage_class())
+
+    def pytest_collection_modifyitems(
+        self, session: Session, config: Config, items: List[Item]
+    ) -> None:
+        # The watchdog is only started for --otel-watchdog, or for tests with its
+        # marker.  The xdist controller doesn't collect anything, so it never needs it.
+        seconds = config.getoption('--otel-watchdog', None)
+        if seconds or any(item.get_closest_marker('otel_watchdog') for item in items):
+            from .watchdog import WatchdogPlugin
+
+            watchdog = WatchdogPlugin(self, seconds, self.sampler)
+            config.pluginmanager.register(watchdog)
+            watchdog.start(config, items)
+
     def pytest_sessionfinish(self, session: Session) -> None:
+        self.fixturedef_attributes.clear()
         self.try_force_flush()
 
-    def _attributes_from_item(self, item: Item) -> Dict[str, Union[str, int]]:
+    def _attributes_from_item(self, item: Item) -> Attributes:
+        try:
+            return self.item_attributes[item]
+        except KeyError:
+            attributes = self.item_attributes[item] = self._compute_item_attributes(
+                item
+            )
+            return attributes
+
+    def _release_item(self, item: Item) -> None:
+        self.item_attributes.pop(item, None)
+
+    @staticmethod
+    def _compute_item_attributes(item: Item) -> Attributes:
         filepath, line_number, _ = item.location
-        attributes: Dict[str, Union[str, int]] = {
+        attributes: Attributes = {
             SpanAttributes.CODE_FILEPATH: filepath,
             SpanAttributes.CODE_FUNCTION: item.name,
             "pytest.nodeid": item.nodeid,
@@ -79,26 +289,17 @@ class PerTestOpenTelemetryPlugin:
             attributes[SpanAttributes.CODE_LINENO] = line_number
         return attributes
 
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
-        with tracer.start_as_current_span(
-            item.nodeid,
-            attributes=self._attributes_from_item(item),
-            context=self.item_parent,
-        ):
-            yield
-
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_runtest_setup(self, item: Item) -> Iterator[None]:
-        with tracer.start_as_current_span(
-            f'{item.nodeid}::setup',
-            attributes=self._attributes_from_item(item),
-        ):
-            yield
+    def _attributes_from_fixturedef(self, fixturedef: FixtureDef) -> Attributes:
+        try:
+            return self.fixturedef_attributes[fixturedef]
+        except KeyError:
+            attributes = self.fixturedef_attributes[
+                fixturedef
+            ] = self._compute_fixturedef_attributes(fixturedef)
+            return attributes
 
-    def _attributes_from_fixturedef(
-        self, fixturedef: FixtureDef
-    ) -> Dict[str, Union[str, int]]:
+    @staticmethod
+    def _compute_fixturedef_attributes(fixturedef: FixtureDef) -> Attributes:
         return {
             SpanAttributes.CODE_FILEPATH: fixturedef.func.__code__.co_filename,
             SpanAttributes.CODE_FUNCTION: fixturedef.argname,
@@ -118,116 +319,6 @@ class PerTestOpenTelemetryPlugin:
             return f"{fixturedef.argname}[{parameter}]"
         return fixturedef.argname
 
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_fixture_setup(
-        self, fixturedef: FixtureDef, request: FixtureRequest
-    ) -> Iterator[None]:
-        with tracer.start_as_current_span(
-            name=f'{self._name_from_fixturedef(fixturedef, request)} setup',
-            attributes=self._attributes_from_fixturedef(fixturedef),
-        ):
-            yield
-
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_runtest_call(self, item: Item) -> Iterator[None]:
-        with tracer.start_as_current_span(
-            name=f'{item.nodeid}::call',
-            attributes=self._attributes_from_item(item),
-        ):
-            yield
-
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_runtest_teardown(self, item: Item) -> Iterator[None]:
-        with tracer.start_as_current_span(
-            name=f'{item.nodeid}::teardown',
-            attributes=self._attributes_from_item(item),
-        ):
-            # Since there is no pytest_fixture_teardown hook, we have to be a
-            # little clever to capture the spans for each fixture's teardown.
-            # The pytest_fixture_post_finalizer hook is called at the end of a
-            # fixture's teardown, but we don't know when the fixture actually
-            # began tearing down.
-            #
-            # Instead start a span here for the first fixture to be torn down,
-            # but give it a temporary name, since we don't know which fixture it
-            # will be. Then, in pytest_fixture_post_finalizer, when we do know
-            # which fixture is being torn down, update the name and attributes
-            # to the actual fixture, end the span, and create the span for the
-            # next fixture in line to be torn down.
-            self._fixture_teardown_span = tracer.start_span("fixture teardown")
-            yield
-
-        # The last call to pytest_fixture_post_finalizer will create
-        # a span that is unneeded, so delete it.
-        del self._fixture_teardown_span
-
-    @pytest.hookimpl(hookwrapper=True)
-    def pytest_fixture_post_finalizer(
-        self, fixturedef: FixtureDef, request: SubRequest
-    ) -> Iterator[None]:
-        """When the span for a fixture teardown is created by
-        pytest_runtest_teardown or a previous pytest_fixture_post_finalizer, we
-        need to update the name and attributes now that we know which fixture it
-        was for."""
-
-        # If the fixture has already been torn down, then it will have no cached
-        # result, so we can skip this one.
-        if fixturedef.cached_result is None:
-            yield
-        # Passing `-x` option to pytest can cause it to exit early so it may not
-        # have this span attribute.
-        elif not hasattr(self, "_fixture_teardown_span"):  # pragma: no cover
-            yield
-        else:
-            # If we've gotten here, we have a real fixture about to be torn down.
-            name = f'{self._name_from_fixturedef(fixturedef, request)} teardown'
-            self._fixture_teardown_span.update_name(name)
-            attributes = self._attributes_from_fixturedef(fixturedef)
-            self._fixture_teardown_span.set_attributes(attributes)
-            yield
-            self._fixture_teardown_span.end()
-
-        # Create the span for the next fixture to be torn down. When there are
-        # no more fixtures remaining, this will be an empty, useless span, so it
-        # needs to be deleted by pytest_runtest_teardown.
-        self._fixture_teardown_span = tracer.start_span("fixture teardown")
-
-    @staticmethod
-    def pytest_exception_interact(
-        node: Node,
-        call: CallInfo[Any],
-        report: TestReport,
-    ) -> None:
-        excinfo = call.excinfo
-        assert excinfo
-        assert isinstance(excinfo.value, BaseException)
-
-        test_span = trace.get_current_span()
-
-        test_span.record_exception(
-            # Interface says Exception, but BaseException seems to work fine
-            # This is needed because pytest's Failed exception inherits from
-            # BaseException, not Exception
-            exception=excinfo.value,  # type: ignore[arg-type]
-            attributes={
-                SpanAttributes.EXCEPTION_STACKTRACE: str(report.longrepr),
-            },
-        )
-        test_span.set_status(
-            Status(
-                status_code=StatusCode.ERROR,
-                description=f"{excinfo.type}: {excinfo.value}",
-            )
-        )
-
-    def pytest_runtest_logreport(self, report: TestReport) -> None:
-        if report.when != 'call':
-            return
-
-        has_error = report.outcome == 'failed'
-        status_code = StatusCode.ERROR if has_error else StatusCode.OK
-        trace.get_current_span().set_status(status_code)
-
 
 class OpenTelemetryPlugin(PerTestOpenTelemetryPlugin):
     """A pytest plugin which produces OpenTelemetry spans around test sessions and
@@ -245,7 +336,7 @@ class OpenTelemetryPlugin(PerTestOpenTelemetryPlugin):
         self._session_name = name
 
     @property
-    def item_parent(self) -> Union[str, None]:
+    def item_parent(self) -> Optional[Context]:
         context = trace.set_span_in_context(self.session_span)
         return context
 
@@ -268,14 +359,11 @@ class OpenTelemetryPlugin(PerTestOpenTelemetryPlugin):
         super().pytest_sessionfinish(session)
 
     def pytest_runtest_logreport(self, report: TestReport) -> None:
-        super().pytest_runtest_logreport(report)
         self.has_error |= report.when == 'call' and report.outcome == 'failed'
 
 
-try:
-    from xdist.workermanage import WorkerController  # pylint: disable=unused-import
-except ImportError:  # pragma: no cover
-    WorkerController = None
+if TYPE_CHECKING:  # xdist.workermanage is slow to import, and only needed for types
+    from xdist.workermanage import WorkerController
 
 
 class XdistOpenTelemetryPlugin(OpenTelemetryPlugin):
@@ -283,6 +371,8 @@ class XdistOpenTelemetryPlugin(OpenTelemetryPlugin):
 
     @classmethod
     def get_trace_parent(cls, config: Config) -> Optional[Context]:
+        from opentelemetry import propagate
+
         if workerinput := getattr(config, 'workerinput', None):
             return propagate.extract(workerinput)
 
@@ -295,9 +385,276 @@ class XdistOpenTelemetryPlugin(OpenTelemetryPlugin):
             f'test worker {worker_id}' if worker_id else self.session_name
         )
 
-    def pytest_configure_node(self, node: WorkerController) -> None:  # pragma: no cover
+        from .plugin import is_xdist_controller
+        from .utilization import ControllerUtilizationPlugin, WorkerUtilizationPlugin
+
+        spool = config.getoption('--otel-spool', False)
+        if worker_id:  # pragma: no cover
+            config.pluginmanager.register(WorkerUtilizationPlugin(self))
+            if spool:
+                from .spool import WORKERINPUT_KEY, WorkerSpoolPlugin
+
+                path = getattr(config, 'workerinput')[WORKERINPUT_KEY]
+                config.pluginmanager.register(WorkerSpoolPlugin(self, path))
+        elif is_xdist_controller(config):
+            report = config.getoption('--otel-xdist-report', False)
+            config.pluginmanager.register(ControllerUtilizationPlugin(self, report))
+            if spool:
+                from .spool import ControllerSpoolPlugin
+
+                config.pluginmanager.register(ControllerSpoolPlugin())
+
+    def pytest_configure_node(
+        self, node: 'WorkerController'
+    ) -> None:  # pragma: no cover
+        from opentelemetry import propagate
+
+        from .resource import WORKERINPUT_KEY
+
         with trace.use_span(self.session_span, end_on_exit=False):
             propagate.inject(node.workerinput)
+        node.workerinput[WORKERINPUT_KEY] = self.codebase_detector.attributes
 
     def pytest_xdist_node_collection_finished(node, ids):  # pragma: no cover
         super().try_force_flush()
+
+
+class SpanDetailPlugin:
+    """Base for the plugins registered by PerTestOpenTelemetryPlugin for each level
+    of --otel-detail"""
+
+    def __init__(self, plugin: PerTestOpenTelemetryPlugin) -> None:
+        self.plugin = plugin
+
+
+class CollectionSpansPlugin(SpanDetailPlugin):
+    """Produces a span for the collection of the tests, with a span for collecting
+    each file, and for importing each test module"""
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection(self, session: Session) -> Iterator[None]:
+        from .plugin import is_xdist_controller
+
+        # The xdist controller doesn't collect anything itself, each worker does
+        if is_xdist_controller(session.config):
+            yield
+            return
+
+        with tracer.start_as_current_span(
+            'collection',
+            attributes={'pytest.span_type': 'collection'},
+            context=self.plugin.item_parent,
+        ) as span:
+            yield
+            span.set_attribute('pytest.collected', len(session.items))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_make_collect_report(
+        self, collector: Collector
+    ) -> Generator[None, Any, None]:
+        if not isinstance(collector, pytest.File):
+            yield
+            return
+
+        attributes: Attributes = {
+            SpanAttributes.CODE_FILEPATH: collector.nodeid,
+            'pytest.nodeid': collector.nodeid,
+            'pytest.span_type': 'collect',
+        }
+        with tracer.start_as_current_span(
+            f'{collector.nodeid} collect', attributes=attributes
+        ) as span:
+            # Doctests in text files are collected by subclasses of Module too
+            if isinstance(collector, pytest.Module) and collector.path.suffix == '.py':
+                self.time_import(collector)
+
+            outcome = yield
+            report: CollectReport = outcome.get_result()
+            span.set_attribute('pytest.collected', len(report.result))
+            if report.failed:
+                span.set_status(Status(StatusCode.ERROR, str(report.longrepr)))
+
+    @staticmethod
+    def time_import(module: pytest.Module) -> None:
+        """Puts the import of a test module within its own span, by wrapping the
+        first call to get the module object, which pytest makes while collecting
+        from it.  Any errors are still left for the collection to report, and a
+        module skipping itself isn't an error."""
+        getobj = module._getobj
+
+        def timed_getobj() -> Any:
+            # Only the first import is timed, as pytest may try again after an error
+            delattr(module, '_getobj')
+            with tracer.start_as_current_span(
+                f'{module.nodeid} import',
+                attributes={
+                    SpanAttributes.CODE_FILEPATH: module.nodeid,
+                    'pytest.nodeid': module.nodeid,
+                    'pytest.span_type': 'import',
+                },
+                record_exception=False,
+                set_status_on_exception=False,
+            ) as span:
+                try:
+                    return getobj()
+                except Exception as error:
+                    span.set_status(Status(StatusCode.ERROR, type(error).__name__))
+                    raise
+
+        setattr(module, '_getobj', timed_getobj)
+
+
+class ItemSpansPlugin(SpanDetailPlugin):
+    """Produces a span for each test, from the start of its setup through the end of
+    its teardown"""
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
+        with tracer.start_as_current_span(
+            item.nodeid,
+            attributes=self.plugin._attributes_from_item(item),
+            context=self.plugin.item_parent,
+        ):
+            yield
+
+        self.plugin._release_item(item)
+
+    def pytest_exception_interact(
+        self,
+        node: Node,
+        call: CallInfo[Any],
+        report: TestReport,
+    ) -> None:
+        excinfo = call.excinfo
+        assert excinfo
+        assert isinstance(excinfo.value, BaseException)
+
+        # Rather than record_exception, which would format the traceback again, and
+        # in full, the event gets pytest's report of it, within a budget
+        attributes = self.plugin.exception_payloads.attributes(
+            excinfo.value, report.longrepr
+        )
+        test_span = trace.get_current_span()
+        test_span.add_event('exception', attributes)
+        test_span.set_status(
+            Status(
+                status_code=StatusCode.ERROR,
+                description=ExceptionPayloads.description(excinfo.value, attributes),
+            )
+        )
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        if report.when != 'call':
+            return
+
+        has_error = report.outcome == 'failed'
+        status_code = StatusCode.ERROR if has_error else StatusCode.OK
+        trace.get_current_span().set_status(status_code)
+
+
+class PhaseSpansPlugin(SpanDetailPlugin):
+    """Produces spans for the setup, call, and teardown phases of each test"""
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item: Item) -> Iterator[None]:
+        with tracer.start_as_current_span(
+            f'{item.nodeid}::setup',
+            attributes=self.plugin._attributes_from_item(item),
+        ):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: Item) -> Iterator[None]:
+        with tracer.start_as_current_span(
+            name=f'{item.nodeid}::call',
+            attributes=self.plugin._attributes_from_item(item),
+        ):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item: Item) -> Iterator[None]:
+        with tracer.start_as_current_span(
+            name=f'{item.nodeid}::teardown',
+            attributes=self.plugin._attributes_from_item(item),
+        ):
+            yield
+
+
+def finalizer_name(finalizer: Callable[[], object]) -> str:
+    """The qualified name of a fixture's finalizer, or for the rest of a generator
+    fixture after its yield, of the fixture's function"""
+    function = getattr(finalizer, 'func', finalizer)
+    if getattr(function, '__name__', None) == '_teardown_yield_fixture':
+        function = getattr(finalizer, 'args', (function,))[0]
+    return getattr(function, '__qualname__', repr(function))
+
+
+class FixtureSpansPlugin(SpanDetailPlugin):
+    """Produces spans for the setup and teardown of each fixture, and for each of the
+    finalizers it added while it was set up"""
+
+    def __init__(self, plugin: PerTestOpenTelemetryPlugin) -> None:
+        super().__init__(plugin)
+        self._teardowns: Dict[FixtureDef, Tuple[trace.Span, 'Token[Context]']] = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> Iterator[None]:
+        # pytest keeps the finalizers in a private list, and without it (in other
+        # versions of pytest) the fixture's teardown only has the one span
+        finalizers = getattr(fixturedef, '_finalizers', None)
+        if not isinstance(finalizers, list):
+            finalizers = []
+        before = len(finalizers)
+
+        name = self.plugin._name_from_fixturedef(fixturedef, request)
+        with tracer.start_as_current_span(
+            name=f'{name} setup',
+            attributes=self.plugin._attributes_from_fixturedef(fixturedef),
+        ):
+            yield
+
+        # The finalizers added during the setup, including the rest of a generator
+        # fixture after its yield, belong to this fixture, and are wrapped in place
+        finalizers[before:] = [
+            functools.partial(self._finalize, name, finalizer)
+            for finalizer in finalizers[before:]
+        ]
+
+        # There is no hook for the start of a fixture's teardown, but its finalizers
+        # run last-in, first-out, so one added now runs just before the fixture's own
+        # teardown, after any fixtures that depend on it have been torn down
+        fixturedef.addfinalizer(
+            functools.partial(self._start_teardown, fixturedef, request)
+        )
+
+    def _start_teardown(self, fixturedef: FixtureDef, request: SubRequest) -> None:
+        span = tracer.start_span(
+            name=f'{self.plugin._name_from_fixturedef(fixturedef, request)} teardown',
+            attributes=self.plugin._attributes_from_fixturedef(fixturedef),
+        )
+        token = otel_context.attach(trace.set_span_in_context(span))
+        self._teardowns[fixturedef] = (span, token)
+
+    @staticmethod
+    def _finalize(name: str, finalizer: Callable[[], object]) -> None:
+        with tracer.start_as_current_span(
+            name=f'{name} finalizer',
+            attributes={
+                SpanAttributes.CODE_FUNCTION: finalizer_name(finalizer),
+                'pytest.span_type': 'finalizer',
+            },
+        ):
+            finalizer()
+
+    def pytest_fixture_post_finalizer(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> None:
+        """Called after all of a fixture's finalizers have run"""
+        # A fixture that was already torn down (by older versions of pytest), or
+        # whose teardown wasn't started, has no span
+        if teardown := self._teardowns.pop(fixturedef, None):
+            span, token = teardown
+            otel_context.detach(token)
+            span.end()
@@ -0,0 +1,88 @@
+import time
+from typing import Iterator
+
+import pytest
+from _pytest.config import Config
+from _pytest.fixtures import FixtureDef, FixtureRequest
+from _pytest.reports import TestReport
+from opentelemetry.metrics import get_meter_provider
+
+# Durations of tests and fixtures range from microseconds to minutes, so these cover
+# more range than the SDK's default buckets, which are meant for milliseconds
+DURATION_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+class MetricsPlugin:
+    """Records the durations of test phases and fixture setups in OpenTelemetry
+    histograms, which are aggregated in-process and exported periodically.  This is
+    much cheaper than spans when only the distributions are needed.
+
+    Under xdist, the controller records the test phases from the reports it receives
+    from every worker, while each worker records the fixtures it sets up."""
+
+    def __init__(self, config: Config) -> None:
+        self.records_tests = not hasattr(config, 'workerinput')
+
+        meter = get_meter_provider().get_meter('pytest-opentelemetry')
+        self.test_duration = meter.create_histogram(
+            'pytest.test.duration',
+            unit='s',
+            description='The duration of each phase of each test',
+            explicit_bucket_boundaries_advisory=DURATION_BUCKETS,
+        )
+        self.fixture_duration = meter.create_histogram(
+            'pytest.fixture.duration',
+            unit='s',
+            description='The duration of the setup of each fixture',
+            explicit_bucket_boundaries_advisory=DURATION_BUCKETS,
+        )
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        if not self.records_tests:
+            return
+
+        self.test_duration.record(
+            report.duration,
+            {
+                'pytest.module': report.nodeid.partition('::')[0],
+                'pytest.phase': report.when or '',
+                'pytest.outcome': report.outcome,
+            },
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: FixtureRequest
+    ) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.fixture_duration.record(
+            time.perf_counter() - start,
+            {
+                'pytest.fixture': fixturedef.argname,
+                'pytest.fixture_scope': fixturedef.scope,
+            },
+        )
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        provider = get_meter_provider()
+
+        # Not all providers (e.g. the API's default provider) implement force flush
+        if hasattr(provider, 'force_flush'):
+            provider.force_flush()
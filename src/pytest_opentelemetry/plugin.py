@@ -1,7 +1,22 @@
+from argparse import ArgumentTypeError
+from typing import Tuple
+
 from _pytest.config import Config
 from _pytest.config.argparsing import Parser
 
 
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parses --otel-shard=K/N into the (1-based) shard and the number of shards"""
+    shard, _, shards = value.partition('/')
+    try:
+        parsed = int(shard), int(shards)
+    except ValueError:
+        raise ArgumentTypeError(f'expected K/N, like 1/4, not {value!r}') from None
+    if not 1 <= parsed[0] <= parsed[1]:
+        raise ArgumentTypeError(f'expected 1 <= K <= N, not {value!r}')
+    return parsed
+
+
 def pytest_addoption(parser: Parser) -> None:
     group = parser.getgroup('pytest-opentelemetry', 'OpenTelemetry for test runs')
     group.addoption(
@@ -14,6 +29,217 @@ def pytest_addoption(parser: Parser) -> None:
             'variable to specify an alternative endpoint.'
         ),
     )
+    group.addoption(
+        "--export-traces-file",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help=(
+            'Writes OpenTelemetry traces to a file as OTLP/JSON lines, without '
+            'needing a collector.  Files ending in .gz are compressed with gzip, and '
+            'files ending in .zst with zstandard (which must be installed).  With '
+            'xdist, each worker writes its own part, and they are merged into this '
+            'file at the end of the run.'
+        ),
+    )
+    group.addoption(
+        "--otel-chrome-trace",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help=(
+            'Writes the spans to a file in the Chrome Trace Event format, to view the '
+            'run on a timeline in https://ui.perfetto.dev or chrome://tracing '
+            'without any other services.  With xdist, each worker has its own track.'
+        ),
+    )
+    group.addoption(
+        "--otel-resource-usage",
+        action="store_true",
+        default=False,
+        help=(
+            'Records the CPU time, maximum RSS, and garbage collections of each test '
+            'call and fixture setup on their spans.'
+        ),
+    )
+    group.addoption(
+        "--otel-profile",
+        action="store",
+        type=float,
+        default=None,
+        metavar="MILLISECONDS",
+        help=(
+            'Samples the stack of each test while it runs, and attaches the most '
+            'common stacks to the spans of the tests that took at least this many '
+            'milliseconds.  Requires the SIGPROF timer, which is not on Windows.'
+        ),
+    )
+    group.addoption(
+        "--otel-watchdog",
+        action="store",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help=(
+            'When a test is still running after this many seconds, exports a '
+            'partial span of it right away, with the stacks of all threads, so that '
+            'tests that hang until the run is killed can be diagnosed.  Individual '
+            'tests can set their own deadline with the otel_watchdog(seconds) '
+            'marker.'
+        ),
+    )
+    group.addoption(
+        "--otel-amortized-costs",
+        action="store_true",
+        default=False,
+        help=(
+            'Records on each test\'s span its own cost, without the setups of '
+            'shared (class, module, package, or session) fixtures that ran during '
+            'it, and its even share of the setups of the shared fixtures it uses, '
+            'with links to the spans of those setups.  Not available with '
+            'pytest-xdist.'
+        ),
+    )
+    group.addoption(
+        "--otel-gc-threshold",
+        action="store",
+        type=float,
+        default=None,
+        metavar="MILLISECONDS",
+        help=(
+            'Records a span for each garbage collection that takes at least this '
+            'many milliseconds, under the test or fixture that was running.'
+        ),
+    )
+    group.addoption(
+        "--otel-metrics",
+        action="store_true",
+        default=False,
+        help=(
+            'Records the durations of test phases and fixture setups as '
+            'OpenTelemetry histogram metrics.  With --export-traces, these are '
+            'exported via OTLP alongside the traces.  Combine with '
+            '--otel-detail=session to record only metrics.'
+        ),
+    )
+    group.addoption(
+        "--otel-summary",
+        action="store",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            'Reports the N slowest test calls and fixtures at the end of the run, '
+            'aggregated from the spans as they finish.  No exporter is needed.'
+        ),
+    )
+    group.addoption(
+        "--otel-xdist-report",
+        action="store_true",
+        default=False,
+        help=(
+            'With pytest-xdist, reports how long each worker spent running tests and '
+            'waiting between them, and how far apart the workers finished.'
+        ),
+    )
+    group.addoption(
+        "--otel-spool",
+        action="store_true",
+        default=False,
+        help=(
+            'With pytest-xdist, each worker also writes its spans to a memory-mapped '
+            'spool file as they start and end.  If a worker crashes or is killed, '
+            'the controller exports the spans from its spool, and marks the test '
+            'that was running as crashed.'
+        ),
+    )
+    group.addoption(
+        "--otel-history",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help=(
+            'Records the duration of each test to a SQLite database at PATH, '
+            'blending it with the durations from previous runs.  With '
+            'pytest-xdist and --dist=load, the tests are handed out to the '
+            'workers longest-first according to that history.'
+        ),
+    )
+    group.addoption(
+        "--otel-shard",
+        action="store",
+        type=parse_shard,
+        default=None,
+        metavar="K/N",
+        help=(
+            'Runs only the K-th of N shards of the tests, splitting whole modules '
+            'between the shards so that they take about the same time according to '
+            'the --otel-history.  Without a history, the shards have about the same '
+            'number of tests.'
+        ),
+    )
+    group.addoption(
+        "--otel-baseline",
+        action="store",
+        default=None,
+        metavar="FILE",
+        help=(
+            'Compares the duration of each test and the average setup of each '
+            'fixture with the baseline of previous runs in FILE (JSON), and reports '
+            'those that are significantly slower.'
+        ),
+    )
+    group.addoption(
+        "--otel-baseline-save",
+        action="store_true",
+        default=False,
+        help='Adds the durations of this run to the --otel-baseline.',
+    )
+    group.addoption(
+        "--otel-baseline-fail",
+        action="store_true",
+        default=False,
+        help='Fails the run if any test or fixture is slower than the --otel-baseline.',
+    )
+    group.addoption(
+        "--otel-scope-report",
+        action="store_true",
+        default=False,
+        help=(
+            'Reports how much setup time each fixture would save with a wider scope '
+            '(module or session), from how many of its setups would be shared.'
+        ),
+    )
+    group.addoption(
+        "--otel-scope-report-json",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help='Writes the same analysis as --otel-scope-report to PATH as JSON.',
+    )
+    group.addoption(
+        "--otel-exception-span-bytes",
+        action="store",
+        type=int,
+        default=32 * 1024,
+        metavar="BYTES",
+        help=(
+            'The most bytes of exception message and stack trace to record on the '
+            'span of each failure (default: 32KiB).'
+        ),
+    )
+    group.addoption(
+        "--otel-exception-run-bytes",
+        action="store",
+        type=int,
+        default=8 * 1024 * 1024,
+        metavar="BYTES",
+        help=(
+            'The most bytes of exception messages and stack traces to record in the '
+            'whole run, or in each xdist worker (default: 8MiB).  Failures that '
+            'happen the same way only record their stack trace once.'
+        ),
+    )
     group.addoption(
         "--trace-parent",
         action="store",
@@ -32,10 +258,92 @@ def pytest_addoption(parser: Parser) -> None:
         default=False,
         help="Creates a separate trace per test instead of a trace for the test run",
     )
+    group.addoption(
+        "--otel-detail",
+        action="store",
+        default="fixture",
+        choices=("session", "test", "phase", "fixture"),
+        help=(
+            'How much detail to record in spans: "session" for only the test run, '
+            '"test" to add a span per test, "phase" to add spans for the setup, '
+            'call, and teardown of each test, and "fixture" (the default) to add '
+            'spans for the setup and teardown of each fixture.  Lower levels have '
+            'less overhead on large test suites.'
+        ),
+    )
+    group.addoption(
+        "--otel-deferred",
+        action="store_true",
+        default=False,
+        help=(
+            'Records the tests, phases, and fixtures in compact buffers, and '
+            'only builds their spans in batches between tests, which has much less '
+            'overhead per test.  Spans from the code under test are parented to the '
+            'test run, and --otel-resource-usage and --otel-profile are unavailable.'
+        ),
+    )
+    group.addoption(
+        "--otel-min-duration",
+        action="store",
+        type=float,
+        default=None,
+        metavar="MILLISECONDS",
+        help=(
+            'Only export the spans of tests that failed or took at least this many '
+            'milliseconds.  The spans of fast, passing tests (including their phases, '
+            'fixtures, and any spans from the code under test) are dropped.'
+        ),
+    )
+
+
+def is_instrumented(config: Config) -> bool:
+    """Whether this invocation will run any tests worth instrumenting.  Informational
+    invocations like --help and --fixtures (and --collect-only, unless traces are
+    being exported) skip importing OpenTelemetry entirely."""
+    for informational in ('help', 'showfixtures', 'show_fixtures_per_test', 'markers'):
+        if config.getoption(informational, False):
+            return False
+    if config.getoption('collectonly', False):
+        return bool(
+            config.getoption('--export-traces')
+            or config.getoption('--export-traces-file')
+            or config.getoption('--otel-chrome-trace')
+        )
+    return True
+
+
+def is_xdist_controller(config: Config) -> bool:
+    """Whether this process will distribute tests to xdist workers, following the
+    same rules xdist uses to decide whether to start its distributed session"""
+    return (
+        not hasattr(config, 'workerinput')
+        and not config.getoption('collectonly')
+        and config.getoption('dist', 'no') != 'no'
+        and bool(config.getoption('tx', None))
+    )
 
 
 def pytest_configure(config: Config) -> None:
     # pylint: disable=import-outside-toplevel
+
+    config.addinivalue_line(
+        'markers',
+        'otel_watchdog(seconds): export a partial span of this test, with the '
+        'stacks of all threads, if it is still running after this many seconds '
+        '(0 to never)',
+    )
+
+    # Sharding changes which tests run, so it applies even when nothing is instrumented
+    if shard := config.getoption('--otel-shard', None):
+        from pytest_opentelemetry.sharding import ShardingPlugin
+
+        index, count = shard
+        history = config.getoption('--otel-history', None)
+        config.pluginmanager.register(ShardingPlugin(index, count, history))
+
+    if not is_instrumented(config):
+        return
+
     from pytest_opentelemetry.instrumentation import (
         OpenTelemetryPlugin,
         PerTestOpenTelemetryPlugin,
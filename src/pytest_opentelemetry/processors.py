@@ -0,0 +1,35 @@
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import SpanProcessor, SynchronousMultiSpanProcessor
+
+# The SDK's TracerProvider can add span processors but not remove them, and tracers
+# hold on to the provider's multi-span processor directly.  When a pytest session
+# adds its own span processors (or when many sessions run in the same process, as
+# they do with pytester), we swap them in and out of that multi-span processor.
+
+
+def active_span_processor() -> Optional[SynchronousMultiSpanProcessor]:
+    """Returns the multi-span processor of the global TracerProvider, or None if the
+    provider isn't from the SDK"""
+    provider = trace.get_tracer_provider()
+    multi = getattr(provider, '_active_span_processor', None)
+    if not isinstance(multi, SynchronousMultiSpanProcessor):
+        return None
+    return multi
+
+
+def add_span_processor(span_processor: SpanProcessor) -> bool:
+    if not (multi := active_span_processor()):
+        return False
+    multi.add_span_processor(span_processor)
+    return True
+
+
+def remove_span_processor(span_processor: SpanProcessor) -> None:
+    if not (multi := active_span_processor()):  # pragma: no cover
+        return
+    with multi._lock:
+        multi._span_processors = tuple(
+            p for p in multi._span_processors if p is not span_processor
+        )
@@ -0,0 +1,108 @@
+import signal
+import threading
+import time
+from types import CodeType, FrameType
+from typing import Dict, Iterator, Optional, Tuple
+
+import pytest
+from _pytest import runner
+from _pytest.nodes import Item
+from opentelemetry import trace
+
+# How often to sample the stack, in seconds of CPU time
+INTERVAL = 0.005
+
+# How many of the most common stacks to attach to a span
+STACKS = 50
+
+Stack = Tuple[Tuple[CodeType, int], ...]
+
+
+def collapse(stacks: Dict[Stack, int], limit: int = STACKS) -> str:
+    """Formats the most common stacks in the "collapsed" format used by flame graph
+    tools: each line is the frames of one stack from the outermost to the innermost,
+    separated by semicolons, followed by the number of samples of that stack"""
+    common = sorted(stacks.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return '\n'.join(
+        ';'.join(f'{code.co_name} ({code.co_filename}:{line})' for code, line in stack)
+        + f' {count}'
+        for stack, count in common
+    )
+
+
+class StackSampler:
+    """Samples the stack of the main thread each time the process has used another
+    INTERVAL of CPU time, using the SIGPROF timer.  Sampling only keeps references
+    to code objects, which live as long as their functions anyway, and they are only
+    formatted for the tests that are worth reporting."""
+
+    def __init__(self) -> None:
+        self.stacks: Dict[Stack, int] = {}
+        self.samples = 0
+        self.outermost: Optional[CodeType] = None
+
+    @staticmethod
+    def available() -> bool:
+        return (
+            hasattr(signal, 'setitimer')
+            and threading.current_thread() is threading.main_thread()
+        )
+
+    def start(self, outermost: Optional[CodeType] = None) -> None:
+        """Starts sampling, recording only the frames from the innermost call of the
+        `outermost` code inward"""
+        self.stacks = {}
+        self.samples = 0
+        self.outermost = outermost
+        self.previous = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, INTERVAL, INTERVAL)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous or signal.SIG_DFL)
+        self.outermost = None
+
+    def sample(self, signum: int, frame: Optional[FrameType]) -> None:
+        stack = []
+        while frame is not None:
+            stack.append((frame.f_code, frame.f_lineno))
+            if frame.f_code is self.outermost:
+                break
+            frame = frame.f_back
+        key = tuple(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+
+class ProfilingPlugin:
+    """Samples the stacks of each test's call, for --otel-profile, and attaches the
+    most common stacks to the spans of the calls that took at least the threshold"""
+
+    def __init__(self, threshold_ms: float) -> None:
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+        self.sampler = StackSampler()
+
+    # This must run inside of the PhaseSpansPlugin's call span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_runtest_call(self, item: Item) -> Iterator[None]:
+        if not self.sampler.available():  # pragma: no cover
+            yield
+            return
+
+        # Only the frames within pytest's hook that runs the test are interesting,
+        # not those of the rest of pytest's machinery
+        self.sampler.start(outermost=runner.pytest_runtest_call.__code__)
+        start = time.perf_counter_ns()
+        yield
+        self.sampler.stop()
+
+        if time.perf_counter_ns() - start < self.threshold_ns:
+            return
+
+        trace.get_current_span().set_attributes(
+            {
+                'pytest.profile.samples': self.sampler.samples,
+                'pytest.profile.interval_seconds': INTERVAL,
+                'pytest.profile.collapsed_stacks': collapse(self.sampler.stacks),
+            }
+        )
@@ -1,5 +1,7 @@
+import os
+import re
 import subprocess
-from typing import Dict, Union
+from typing import Dict, Optional, Union
 
 from opentelemetry.sdk.resources import Resource, ResourceDetector
 from opentelemetry.semconv.resource import ResourceAttributes
@@ -7,6 +9,76 @@ from pytest import Config
 
 Attributes = Dict[str, Union[str, bool, int, float]]
 
+# The key in xdist's workerinput where the controller shares its codebase attributes
+WORKERINPUT_KEY = 'pytest_opentelemetry.codebase'
+
+OBJECT_NAME = re.compile(r'[0-9a-f]{40}([0-9a-f]{24})?')
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding='utf-8') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def find_git_directory(start: str) -> Optional[str]:
+    """Finds the git directory for `start` or its nearest parent, following the
+    `.git` files that linked worktrees and submodules use to point elsewhere"""
+    directory = os.path.abspath(start)
+    while True:
+        dot_git = os.path.join(directory, '.git')
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            contents = _read(dot_git) or ''
+            if not contents.startswith('gitdir: '):
+                return None
+            return os.path.join(directory, contents[len('gitdir: ') :])
+
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def read_git_revision(git_directory: str) -> Optional[str]:
+    """Resolves HEAD to an object name by reading the repository's files directly,
+    returning None for anything that would need git itself to resolve"""
+    # Linked worktrees have their own HEAD, but share refs with the main repository
+    common_directory = git_directory
+    if (common := _read(os.path.join(git_directory, 'commondir'))) is not None:
+        common_directory = os.path.join(git_directory, common)
+
+    head = _read(os.path.join(git_directory, 'HEAD')) or ''
+    for _ in range(5):  # symbolic refs may point to other symbolic refs
+        if OBJECT_NAME.fullmatch(head):
+            return head
+        if not head.startswith('ref: '):
+            return None
+
+        ref = head[len('ref: ') :]
+        for directory in (git_directory, common_directory):
+            if (loose := _read(os.path.join(directory, ref))) is not None:
+                head = loose
+                break
+        else:
+            return _read_packed_ref(common_directory, ref)
+
+    return None
+
+
+def _read_packed_ref(git_directory: str, ref: str) -> Optional[str]:
+    packed = _read(os.path.join(git_directory, 'packed-refs')) or ''
+    for line in packed.splitlines():
+        if line.startswith(('#', '^')):
+            continue
+        name, _, packed_ref = line.partition(' ')
+        if packed_ref == ref and OBJECT_NAME.fullmatch(name):
+            return name
+    return None
+
 
 class CodebaseResourceDetector(ResourceDetector):
     """Detects OpenTelemetry Resource attributes for an operating system process,
@@ -14,6 +86,9 @@ class CodebaseResourceDetector(ResourceDetector):
 
     def __init__(self, config: Config):
         self.config = config
+        # Until they're detected, or if detecting them fails, there's nothing to share
+        # with the xdist workers, so they detect their own
+        self.attributes: Attributes = {}
         ResourceDetector.__init__(self)
 
     def get_codebase_name(self) -> str:
@@ -32,6 +107,16 @@ class CodebaseResourceDetector(ResourceDetector):
 
     @staticmethod
     def get_codebase_version() -> str:
+        # Reading git's files directly is much faster than starting git, which adds
+        # up when every xdist worker needs the version.  Setting GIT_DIR changes
+        # where git looks for the repository, so only git itself can handle that.
+        if 'GIT_DIR' not in os.environ:
+            git_directory = find_git_directory(os.getcwd())
+            if not git_directory:
+                return '[unknown: not a git repository]'
+            if revision := read_git_revision(git_directory):
+                return revision
+
         try:
             response = subprocess.check_output(
                 ['git', 'rev-parse', '--is-inside-work-tree']
@@ -49,9 +134,12 @@ class CodebaseResourceDetector(ResourceDetector):
         return version.decode().strip()
 
     def detect(self) -> Resource:
-        return Resource(
-            {
+        # xdist workers reuse the attributes their controller already detected
+        if shared := getattr(self.config, 'workerinput', {}).get(WORKERINPUT_KEY):
+            self.attributes = dict(shared)
+        else:
+            self.attributes = {
                 ResourceAttributes.SERVICE_NAME: self.get_codebase_name(),
                 ResourceAttributes.SERVICE_VERSION: self.get_codebase_version(),
             }
-        )
+        return Resource(self.attributes)
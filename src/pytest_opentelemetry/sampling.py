@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import pytest
+from _pytest.config import Config
+from _pytest.nodes import Item
+from _pytest.reports import TestReport
+from opentelemetry.context.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+
+from .processors import active_span_processor
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Wraps the span processors of a TracerProvider, holding back all of the spans
+    that end while a test is running until we know whether the test is worth
+    exporting.  Spans that end outside of a test are passed through immediately."""
+
+    def __init__(self, span_processors: Sequence[SpanProcessor]) -> None:
+        self.span_processors = tuple(span_processors)
+        self._lock = threading.Lock()
+        self._held: Optional[List[ReadableSpan]] = None
+        # Called with the spans that are dropped, for the span processors outside of
+        # the sampler that have seen them end
+        self.drop_listeners: List[Callable[[Sequence[ReadableSpan]], None]] = []
+
+    def start_holding(self) -> None:
+        with self._lock:
+            self._held = []
+
+    def stop_holding(self, keep: bool) -> None:
+        with self._lock:
+            held, self._held = self._held or [], None
+
+        if keep:
+            for span in held:
+                self._release(span)
+        else:
+            for listener in self.drop_listeners:
+                listener(held)
+
+    def _release(self, span: ReadableSpan) -> None:
+        for span_processor in self.span_processors:
+            span_processor.on_end(span)
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        for span_processor in self.span_processors:
+            span_processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        with self._lock:
+            if self._held is not None:
+                self._held.append(span)
+                return
+        self._release(span)
+
+    def shutdown(self) -> None:
+        for span_processor in self.span_processors:
+            span_processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return all(
+            span_processor.force_flush(timeout_millis)
+            for span_processor in self.span_processors
+        )
+
+    @classmethod
+    def install(cls) -> Optional['TailSamplingSpanProcessor']:
+        """Puts a new sampler in front of all of the span processors of the global
+        TracerProvider, returning None if the provider isn't from the SDK."""
+        if not (multi := active_span_processor()):
+            return None
+
+        with multi._lock:
+            sampler = cls(multi._span_processors)
+            multi._span_processors = (sampler,)
+        return sampler
+
+    def uninstall(self) -> None:
+        if not (multi := active_span_processor()):  # pragma: no cover
+            return
+        with multi._lock:
+            added_since = tuple(p for p in multi._span_processors if p is not self)
+            multi._span_processors = self.span_processors + added_since
+
+
+class TailSamplingPlugin:
+    """Drops all of the spans of a test, including its phases, fixtures, and any
+    spans made by the code under test, when the test passed in less than the
+    --otel-min-duration.  Failed tests and slow tests are kept in full."""
+
+    def __init__(self, sampler: TailSamplingSpanProcessor, min_duration_ms: float):
+        self.sampler = sampler
+        self.min_duration_ns = int(min_duration_ms * 1_000_000)
+        # On the xdist controller, reports arrive from the workers without any test
+        # running here
+        self.failed = False
+
+    # This must be outside of the test span, so that the test span has ended by the
+    # time we decide whether to keep it
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
+        self.failed = False
+        self.sampler.start_holding()
+        start = time.perf_counter_ns()
+        yield
+        elapsed = time.perf_counter_ns() - start
+        self.sampler.stop_holding(keep=self.failed or elapsed >= self.min_duration_ns)
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        self.failed |= report.failed
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        self.sampler.uninstall()
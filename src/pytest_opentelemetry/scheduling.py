@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional
+
+from _pytest.config import Config
+from xdist.remote import Producer
+from xdist.scheduler import LoadScheduling
+from xdist.workermanage import WorkerController
+
+from .history import estimate
+
+
+class LongestFirstScheduling(LoadScheduling):
+    """xdist's load scheduling, but handing out the tests that took the longest in
+    previous runs first, so that the slowest tests don't start near the end of the
+    run and leave the other workers waiting for them.  Tests without history are
+    treated as average."""
+
+    collection: Optional[List[str]]
+    maxschedchunk: Optional[int]
+
+    def __init__(
+        self,
+        config: Config,
+        log: Optional[Producer],
+        durations: Dict[str, float],
+    ) -> None:
+        super().__init__(config, log)
+        self.durations = durations
+
+    def schedule(self) -> None:
+        # Rescheduling, and collections that differ between the workers, are left to
+        # xdist
+        if self.collection is not None or not self._check_nodes_have_same_collection():
+            super().schedule()
+            return
+
+        collection = self.collection = next(iter(self.node2collection.values()))
+        if not collection:
+            return
+        self.maxschedchunk = self.maxschedchunk or len(collection)
+
+        by_nodeid = estimate(self.durations, collection)
+        estimates = [by_nodeid[nodeid] for nodeid in collection]
+        self.pending[:] = sorted(range(len(collection)), key=lambda i: -estimates[i])
+
+        # Like xdist, send every test when there are only a few of them, or else a
+        # first batch of a quarter of each worker's share
+        if len(self.pending) < 2 * len(self.nodes):
+            initial = len(self.pending)
+        else:
+            items_per_node = len(collection) // len(self.node2pending)
+            chunksize = max(min(items_per_node // 4, self.maxschedchunk), 2)
+            initial = min(chunksize * len(self.nodes), len(self.pending))
+
+        # xdist sends each worker a consecutive chunk of the pending tests, which
+        # would give the longest tests all to the first worker, so each of the first
+        # tests goes to the worker that is expected to finish its tests soonest
+        loads = {node: 0.0 for node in self.nodes}
+        chunks: Dict[WorkerController, List[int]] = {node: [] for node in self.nodes}
+        for index in self.pending[:initial]:
+            node = min(self.nodes, key=lambda node: loads[node])
+            loads[node] += estimates[index]
+            chunks[node].append(index)
+        del self.pending[:initial]
+
+        for node, indices in chunks.items():
+            if indices:
+                self.node2pending[node].extend(indices)
+                node.send_runtest_some(indices)
+
+        # Later, each worker is sent the longest of the remaining tests as it frees up
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()
@@ -0,0 +1,252 @@
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+from _pytest.config import Config
+from _pytest.fixtures import FixtureDef, SubRequest
+from _pytest.main import Session
+from _pytest.pathlib import bestrelpath
+from _pytest.terminal import TerminalReporter
+
+if TYPE_CHECKING:
+    from .instrumentation import PerTestOpenTelemetryPlugin
+
+WORKEROUTPUT_KEY = 'pytest_opentelemetry.scopes'
+
+SCOPES = ('function', 'class', 'module', 'package', 'session')
+
+# The wider scopes that a fixture's setups are estimated for
+WIDER_SCOPES = ('module', 'session')
+
+# How many fixtures are shown in the terminal
+ROWS = 20
+
+# The setups of a fixture that would share one setup under a wider scope: the xdist
+# worker, the module (for the module scope), and the fixture's parameter
+Group = Tuple[str, ...]
+
+
+class FixtureSetups:
+    """The setups of one fixture: how many there were, how long they took, and how
+    they would be grouped under each wider scope"""
+
+    def __init__(
+        self,
+        name: str,
+        location: str,
+        scope: str,
+        widest: str,
+        limited_by: List[str],
+    ) -> None:
+        self.name = name
+        self.location = location
+        self.scope = scope
+        self.widest = widest
+        self.limited_by = limited_by
+        self.groups: Dict[str, Dict[Group, List[float]]] = {
+            scope: {} for scope in WIDER_SCOPES
+        }
+
+    def add(self, scope: str, group: Group, setups: int, seconds: float) -> None:
+        totals = self.groups[scope].setdefault(group, [0, 0.0])
+        totals[0] += setups
+        totals[1] += seconds
+
+    @property
+    def setups(self) -> int:
+        return int(sum(setups for setups, _ in self.groups['session'].values()))
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.groups['session'].values())
+
+    def saving(self, scope: str) -> Optional[float]:
+        """The seconds that would be saved if each group of setups under `scope` only
+        took one setup, of their average duration, or None if the fixture's scope is
+        already at least that wide.  Fixtures that it requests may need to be widened
+        too, which is up to the widest scope they allow."""
+        if SCOPES.index(scope) <= SCOPES.index(self.scope):
+            return None
+        return sum(
+            seconds - seconds / setups
+            for setups, seconds in self.groups[scope].values()
+        )
+
+    def best_saving(self) -> float:
+        return max((self.saving(scope) or 0.0) for scope in WIDER_SCOPES)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'fixture': self.name,
+            'location': self.location,
+            'scope': self.scope,
+            'setups': self.setups,
+            'seconds': self.seconds,
+            'widest_scope': self.widest,
+            'limited_by': self.limited_by,
+            'savings_seconds': {scope: self.saving(scope) for scope in WIDER_SCOPES},
+        }
+
+
+def widest_scope(fixturedef: FixtureDef, request: SubRequest) -> Tuple[str, List[str]]:
+    """The widest scope that a fixture could have, which is the narrowest scope of
+    the fixtures it requests, and the names of those fixtures.  They were all set up
+    just before this one.  Without pytest's private method for looking them up, their
+    scopes are unknown, so nothing is considered to limit it."""
+    widest = 'session'
+    limited_by: List[str] = []
+    get_active_fixturedef = getattr(request, '_get_active_fixturedef', None)
+    if get_active_fixturedef is None:
+        return widest, limited_by
+
+    for argname in fixturedef.argnames:
+        if argname == 'request':
+            continue
+        scope = get_active_fixturedef(argname).scope
+        if SCOPES.index(scope) < SCOPES.index(widest):
+            widest, limited_by = scope, [argname]
+        elif scope == widest and limited_by:
+            limited_by.append(argname)
+    return widest, limited_by
+
+
+class ScopeAnalysisPlugin:
+    """Times the setups of each fixture, counting how many of them would be shared if
+    the fixture had a wider scope, for --otel-scope-report.  Under xdist, the workers
+    send their setups to the controller, and as each worker needs its own setup of
+    even a session-scoped fixture, the setups are also grouped by worker."""
+
+    def __init__(
+        self,
+        config: Config,
+        plugin: 'PerTestOpenTelemetryPlugin',
+        show: bool,
+        path: Optional[str],
+    ) -> None:
+        self.plugin = plugin
+        self.show = show
+        self.path = path
+        self.rootpath = config.rootpath
+        self.is_worker = hasattr(config, 'workerinput')
+        self.worker_id = getattr(config, 'workerinput', {}).get('workerid', '')
+        self.fixtures: Dict[str, FixtureSetups] = {}
+        self.ranked: List[FixtureSetups] = []
+
+    # This must run inside of the other plugins' fixture hookwrappers, like the
+    # FixtureSpansPlugin's, so that only the fixture itself is timed
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: SubRequest
+    ) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+
+        # Session-scoped fixtures can't be any wider, and pytest's own fixtures, like
+        # tmp_path, can't be changed
+        if fixturedef.scope == 'session' or fixturedef.func.__module__.startswith(
+            '_pytest.'
+        ):
+            return
+
+        attributes = self.plugin._attributes_from_fixturedef(fixturedef)
+        filepath = bestrelpath(self.rootpath, Path(str(attributes['code.filepath'])))
+        location = f'{filepath}:{attributes["code.lineno"]}'
+        key = f'{fixturedef.argname} {location}'
+        if not (fixture := self.fixtures.get(key)):
+            fixture = self.fixtures[key] = FixtureSetups(
+                fixturedef.argname,
+                location,
+                fixturedef.scope,
+                *widest_scope(fixturedef, request),
+            )
+
+        param = str(request.param_index)
+        module = request.node.nodeid.split('::')[0]
+        fixture.add('module', (self.worker_id, module, param), 1, seconds)
+        fixture.add('session', (self.worker_id, param), 1, seconds)
+
+    def dump(self) -> List[Dict[str, Any]]:
+        """The setups, in a form that can be sent from an xdist worker"""
+        return [
+            {
+                'key': key,
+                'name': fixture.name,
+                'location': fixture.location,
+                'scope': fixture.scope,
+                'widest': fixture.widest,
+                'limited_by': fixture.limited_by,
+                'groups': {
+                    scope: [[*group, *totals] for group, totals in groups.items()]
+                    for scope, groups in fixture.groups.items()
+                },
+            }
+            for key, fixture in self.fixtures.items()
+        ]
+
+    def merge(self, dumped: List[Dict[str, Any]]) -> None:
+        for record in dumped:
+            if not (fixture := self.fixtures.get(record['key'])):
+                fixture = self.fixtures[record['key']] = FixtureSetups(
+                    record['name'],
+                    record['location'],
+                    record['scope'],
+                    record['widest'],
+                    record['limited_by'],
+                )
+            for scope, groups in record['groups'].items():
+                for *group, setups, seconds in groups:
+                    fixture.add(scope, tuple(group), setups, seconds)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        if dumped := getattr(node, 'workeroutput', {}).get(WORKEROUTPUT_KEY):
+            self.merge(dumped)
+
+    def pytest_sessionfinish(self, session: Session) -> None:
+        if self.is_worker:  # pragma: no cover
+            getattr(session.config, 'workeroutput')[WORKEROUTPUT_KEY] = self.dump()
+            return
+
+        self.ranked = sorted(
+            self.fixtures.values(), key=lambda f: f.best_saving(), reverse=True
+        )
+        if self.path:
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'fixtures': [fixture.report() for fixture in self.ranked]},
+                    file,
+                    indent=2,
+                )
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
+        if self.is_worker or not self.show:
+            return
+
+        write_line = terminalreporter.write_line
+        terminalreporter.write_sep('=', 'fixture setups saved by wider scopes')
+        shown = [f for f in self.ranked[:ROWS] if f.best_saving() > 0]
+        if not shown:
+            write_line('(no fixture was set up more than once)')
+            return
+
+        write_line(
+            f'{"setups":>6}  {"total":>9}  {"module":>9}  {"session":>9}  '
+            f'{"scope":<8}  fixture'
+        )
+        for fixture in shown:
+            savings = [fixture.saving(scope) for scope in WIDER_SCOPES]
+            columns = '  '.join(
+                f'{"-":>9}' if saving is None else f'{saving:8.3f}s'
+                for saving in savings
+            )
+            line = (
+                f'{fixture.setups:>6}  {fixture.seconds:8.3f}s  {columns}  '
+                f'{fixture.scope:<8}  {fixture.name} ({fixture.location})'
+            )
+            if fixture.limited_by:
+                limits = ', '.join(fixture.limited_by)
+                line += f'; {limits} limits it to {fixture.widest}'
+            write_line(line)
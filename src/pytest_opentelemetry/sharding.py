@@ -0,0 +1,186 @@
+"""Plans how to split a test suite into shards of about the same duration, using the
+durations recorded with --otel-history.
+
+    python -m pytest_opentelemetry.sharding .test-durations.db 20
+
+To plan the shards of the tests that pytest actually collects, as --otel-shard does,
+rather than those in the history, pass the output of pytest --collect-only -q:
+
+    pytest --collect-only -q > tests.txt
+    python -m pytest_opentelemetry.sharding .test-durations.db 20 --collected tests.txt
+"""
+
+import argparse
+import heapq
+import os
+import sys
+from typing import IO, Dict, List, Optional, Sequence
+
+import pytest
+from _pytest.config import Config
+from _pytest.nodes import Item
+
+from .history import DurationHistory, estimate
+
+
+def module_of(nodeid: str) -> str:
+    return nodeid.split('::', 1)[0]
+
+
+def module_costs(estimates: Dict[str, float]) -> Dict[str, float]:
+    """Totals the estimated durations of the tests in each module.  The setup of any
+    module-scoped fixtures is part of the duration of the first test that used them,
+    so it's included too."""
+    costs: Dict[str, float] = {}
+    for nodeid, seconds in estimates.items():
+        module = module_of(nodeid)
+        costs[module] = costs.get(module, 0.0) + seconds
+    return costs
+
+
+def plan(costs: Dict[str, float], shards: int) -> List[List[str]]:
+    """Assigns whole modules to shards, keeping their module-scoped fixtures on one
+    machine.  Each module, from the most to the least costly, goes to the shard with
+    the least work so far.  The plan only depends on the costs, so every machine
+    that has the same history and collects the same tests makes the same plan."""
+    loads = [(0.0, shard) for shard in range(shards)]
+    plans: List[List[str]] = [[] for _ in range(shards)]
+    for module in sorted(costs, key=lambda module: (-costs[module], module)):
+        load, shard = heapq.heappop(loads)
+        plans[shard].append(module)
+        heapq.heappush(loads, (load + costs[module], shard))
+    return plans
+
+
+def read_durations(path: Optional[str]) -> Dict[str, float]:
+    if not path:
+        return {}
+    history = DurationHistory(path)
+    try:
+        return history.durations()
+    finally:
+        history.close()
+
+
+class ShardingPlugin:
+    """Runs only the tests of one shard, for --otel-shard"""
+
+    def __init__(self, shard: int, shards: int, history: Optional[str]) -> None:
+        self.shard = shard
+        self.shards = shards
+        self.history = history
+        # When collection fails, there are no items to shard
+        self.modules = 0
+        self.expected = 0.0
+
+    # This must run after the tests have been deselected by -k and -m, so that the
+    # shards are balanced by the tests that will actually run
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config: Config, items: List[Item]) -> None:
+        estimates = estimate(
+            read_durations(self.history), (item.nodeid for item in items)
+        )
+        costs = module_costs(estimates)
+        modules = set(plan(costs, self.shards)[self.shard - 1])
+
+        selected: List[Item] = []
+        deselected: List[Item] = []
+        for item in items:
+            (selected if module_of(item.nodeid) in modules else deselected).append(item)
+
+        self.modules = len(modules)
+        self.expected = sum(costs[module] for module in modules)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_report_collectionfinish(self, config: Config) -> str:
+        return (
+            f'shard {self.shard}/{self.shards}: {self.modules} modules, '
+            f'expected {self.expected:.1f}s'
+        )
+
+
+def collected_nodeids(lines: IO[str]) -> List[str]:
+    """The node IDs listed by pytest --collect-only -q, which ends its list with a
+    blank line and a count of the tests"""
+    nodeids = []
+    for line in lines:
+        if not line.strip():
+            break
+        nodeids.append(line.strip())
+    return nodeids
+
+
+def read_collected(path: str) -> List[str]:
+    if path == '-':
+        return collected_nodeids(sys.stdin)
+    with open(path, encoding='utf-8') as lines:
+        return collected_nodeids(lines)
+
+
+def report(durations: Dict[str, float], shards: int) -> str:
+    costs = module_costs(durations)
+    lines = [f'{"shard":>7}{"modules":>9}{"tests":>7}{"seconds":>10}']
+    tests: Dict[str, int] = {}
+    for nodeid in durations:
+        tests[module_of(nodeid)] = tests.get(module_of(nodeid), 0) + 1
+
+    loads = []
+    for shard, modules in enumerate(plan(costs, shards), start=1):
+        load = sum(costs[module] for module in modules)
+        loads.append(load)
+        count = sum(tests[module] for module in modules)
+        lines.append(
+            f'{f"{shard}/{shards}":>7}{len(modules):>9}{count:>7}{load:>10.1f}'
+        )
+
+    total = sum(loads)
+    lines.append(
+        f'makespan {max(loads):.1f}s, '
+        f'ideal {total / shards:.1f}s, '
+        f'serial {total:.1f}s'
+    )
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m pytest_opentelemetry.sharding',
+        description=(
+            'Prints the expected duration of each shard of pytest --otel-shard=K/N'
+        ),
+    )
+    parser.add_argument('history', help='the database written by --otel-history')
+    parser.add_argument('shards', type=int, help='the number of shards (N)')
+    parser.add_argument(
+        '--collected',
+        metavar='FILE',
+        help=(
+            'the output of pytest --collect-only -q, or - to read it from stdin.  '
+            'The tests are estimated the same way as --otel-shard, with the '
+            'average duration for tests without any history.  By default, the '
+            'tests in the history are planned.'
+        ),
+    )
+    arguments = parser.parse_args(argv)
+    if arguments.shards < 1:
+        parser.error('there must be at least one shard')
+
+    if not os.path.exists(arguments.history):
+        parser.error(f'{arguments.history} does not exist')
+    durations = read_durations(arguments.history)
+    if arguments.collected:
+        if arguments.collected != '-' and not os.path.exists(arguments.collected):
+            parser.error(f'{arguments.collected} does not exist')
+        nodeids = read_collected(arguments.collected)
+        if not nodeids:
+            parser.error(f'{arguments.collected} has no tests')
+        durations = estimate(durations, nodeids)
+    elif not durations:
+        parser.error(f'{arguments.history} has no test durations')
+    print(report(durations, arguments.shards))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,311 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import pytest
+from _pytest.config import Config
+from _pytest.terminal import TerminalReporter
+from opentelemetry.context.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import Event, ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import (
+    Link,
+    SpanContext,
+    SpanKind,
+    Status,
+    StatusCode,
+    TraceFlags,
+)
+
+from .processors import (
+    active_span_processor,
+    add_span_processor,
+    remove_span_processor,
+)
+
+if TYPE_CHECKING:  # xdist.workermanage is slow to import, and only needed for types
+    from xdist.workermanage import WorkerController
+
+    from .instrumentation import PerTestOpenTelemetryPlugin
+
+WORKERINPUT_KEY = 'pytest_opentelemetry.spool'
+
+# Each record is its length, then that many bytes of JSON.  The file is grown with
+# zeros, so a length of zero marks the end of the records.
+LENGTH = struct.Struct('<I')
+
+# The spool starts this big, and doubles whenever it is full
+INITIAL_BYTES = 1024 * 1024
+
+# How often a worker flushes its exporters between tests, so that the spool only
+# needs to hold the spans that finished since then
+CHECKPOINT_SECONDS = 5.0
+
+
+def context_record(context: SpanContext) -> List[Any]:
+    return [context.trace_id, context.span_id, context.is_remote, context.trace_flags]
+
+
+def span_context(record: List[Any]) -> SpanContext:
+    trace_id, span_id, is_remote, trace_flags = record
+    return SpanContext(trace_id, span_id, is_remote, TraceFlags(trace_flags))
+
+
+def span_record(span: ReadableSpan) -> Dict[str, Any]:
+    """Everything needed to rebuild a span, as JSON, including what is known of it so
+    far if it hasn't ended"""
+    assert span.context
+    record: Dict[str, Any] = {
+        'name': span.name,
+        'context': context_record(span.context),
+        'parent': context_record(span.parent) if span.parent else None,
+        'kind': span.kind.value,
+        'scope': span.instrumentation_scope.name if span.instrumentation_scope else '',
+        'start': span.start_time,
+        'attributes': dict(span.attributes or {}),
+    }
+    if span.end_time is not None:
+        record['end'] = span.end_time
+        record['status'] = [span.status.status_code.value, span.status.description]
+        record['events'] = [
+            [event.name, event.timestamp, dict(event.attributes or {})]
+            for event in span.events
+        ]
+        record['links'] = [
+            [context_record(link.context), dict(link.attributes or {})]
+            for link in span.links
+        ]
+    return record
+
+
+def encode(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+class Spool:
+    """An append-only file of records, written through a shared memory map.  Writes
+    to the map land in the operating system's page cache as they happen, so they
+    survive the process being killed or crashing, without any system calls per
+    record.  Each record's length is written after its bytes, so a record that was
+    cut off by a crash is never read."""
+
+    def __init__(self, path: str, size: int = INITIAL_BYTES) -> None:
+        self.path = path
+        with open(path, 'wb+') as file:
+            file.truncate(size)
+            self.map = mmap.mmap(file.fileno(), size)
+        self.offset = 0
+
+    def append(self, payload: bytes) -> None:
+        end = self.offset + LENGTH.size + len(payload)
+        if end + LENGTH.size > len(self.map):
+            self.map.resize(max(2 * len(self.map), end + LENGTH.size))
+        self.map[self.offset + LENGTH.size : end] = payload
+        LENGTH.pack_into(self.map, self.offset, len(payload))
+        self.offset = end
+
+    def close(self) -> None:
+        self.map.close()
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'rb') as file:
+        data = file.read()
+    records = []
+    offset = 0
+    while offset + LENGTH.size <= len(data):
+        (length,) = LENGTH.unpack_from(data, offset)
+        if not length:
+            break
+        offset += LENGTH.size
+        records.append(json.loads(data[offset : offset + length]))
+        offset += length
+    return records
+
+
+class SpoolSpanProcessor(SpanProcessor):
+    """Writes each span to a Spool as it starts and as it ends.  This must come after
+    the span processors that export the spans, so that once they've been flushed, the
+    spool is started over with only the spans that haven't ended yet.  It also comes
+    after the tail sampler, so that the spans of a test that crashes are spooled even
+    while they're held, and the spans that the sampler drops are noted as dropped."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._resource: Optional[bytes] = None
+        self._open: Dict[int, bytes] = {}
+        self.spool = Spool(path)
+
+    def _append(self, span: ReadableSpan, record: bytes) -> None:
+        if self._resource is None:
+            self._resource = encode({'resource': dict(span.resource.attributes)})
+            self.spool.append(self._resource)
+        self.spool.append(record)
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        record = encode(span_record(span))
+        with self._lock:
+            self._open[span.context.span_id] = record
+            self._append(span, record)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        assert span.context
+        record = encode(span_record(span))
+        with self._lock:
+            self._open.pop(span.context.span_id, None)
+            self._append(span, record)
+
+    def drop(self, spans: Sequence[ReadableSpan]) -> None:
+        """Notes spans that ended but won't be exported, so they aren't recovered"""
+        if not spans:
+            return
+        record = encode(
+            {'dropped': [span.context.span_id for span in spans if span.context]}
+        )
+        with self._lock:
+            self.spool.append(record)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Starts the spool over with just the spans that haven't ended, since the
+        ones that have ended were just exported.  The new spool replaces the old one
+        only once it is complete."""
+        with self._lock:
+            spool = Spool(f'{self.path}.new')
+            for record in ([self._resource] if self._resource else []) + list(
+                self._open.values()
+            ):
+                spool.append(record)
+            os.replace(spool.path, self.path)
+            spool.path = self.path
+            self.spool.close()
+            self.spool = spool
+        return True
+
+    def shutdown(self) -> None:
+        self.spool.close()
+        os.remove(self.path)
+
+
+def recover(path: str, description: str) -> List[ReadableSpan]:
+    """Rebuilds the spans of a spool.  Spans that never ended are ended now, with an
+    error status of `description`, and the tests among them are marked as
+    crashed.  Spans that were dropped aren't recovered."""
+    resource = Resource({})
+    records: Dict[int, Dict[str, Any]] = {}
+    for record in read_records(path):
+        if 'resource' in record:
+            resource = Resource(record['resource'])
+        elif 'dropped' in record:
+            for span_id in record['dropped']:
+                records.pop(span_id, None)
+        else:
+            records[record['context'][1]] = record
+
+    now = time.time_ns()
+    spans = []
+    for record in records.values():
+        attributes = record['attributes']
+        if 'end' in record:
+            code, message = record['status']
+            status = Status(StatusCode(code), message)
+        else:
+            status = Status(StatusCode.ERROR, description)
+            if attributes.get('pytest.span_type') == 'test':
+                attributes['pytest.outcome'] = 'crashed'
+
+        spans.append(
+            ReadableSpan(
+                record['name'],
+                context=span_context(record['context']),
+                parent=span_context(record['parent']) if record['parent'] else None,
+                resource=resource,
+                attributes=attributes,
+                events=[
+                    Event(name, attributes, timestamp)
+                    for name, timestamp, attributes in record.get('events', [])
+                ],
+                links=[
+                    Link(span_context(context), attributes)
+                    for context, attributes in record.get('links', [])
+                ],
+                kind=SpanKind(record['kind']),
+                status=status,
+                start_time=record['start'],
+                end_time=record.get('end', max(now, record['start'])),
+                instrumentation_scope=InstrumentationScope(record['scope']),
+            )
+        )
+    return spans
+
+
+def spool_path(directory: str, worker_id: str) -> str:
+    return os.path.join(directory, f'{worker_id}.spool')
+
+
+class ControllerSpoolPlugin:
+    """Gives each xdist worker a spool to write its spans to, and when a worker dies
+    without finishing its session, exports the spans from its spool on its behalf"""
+
+    def __init__(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix='pytest-opentelemetry-')
+        self.recovered: Dict[str, int] = {}
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node: 'WorkerController') -> None:
+        node.workerinput[WORKERINPUT_KEY] = spool_path(self.directory, node.gateway.id)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: 'WorkerController', error: Any) -> None:
+        # Workers that finish their session remove their own spool
+        path = spool_path(self.directory, node.gateway.id)
+        if not error or not os.path.exists(path):
+            return
+
+        spans = recover(path, f'worker {node.gateway.id} crashed')
+        os.remove(path)
+        if not (span_processor := active_span_processor()):  # pragma: no cover
+            return
+
+        for span in spans:
+            span_processor.on_end(span)
+        self.recovered[node.gateway.id] = len(spans)
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
+        for worker_id, count in sorted(self.recovered.items()):
+            terminalreporter.write_line(
+                f'pytest-opentelemetry: recovered {count} spans of crashed worker '
+                f'{worker_id} from its spool'
+            )
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class WorkerSpoolPlugin:  # pragma: no cover
+    """Writes an xdist worker's spans to its spool, flushing the exporters every few
+    seconds between tests to keep the spool short"""
+
+    def __init__(self, plugin: 'PerTestOpenTelemetryPlugin', path: str) -> None:
+        self.plugin = plugin
+        self.span_processor = SpoolSpanProcessor(path)
+        add_span_processor(self.span_processor)
+        if plugin.sampler:
+            plugin.sampler.drop_listeners.append(self.span_processor.drop)
+        self.checkpoint = time.monotonic()
+
+    def pytest_runtest_logfinish(self, nodeid: str, location: Tuple) -> None:
+        if time.monotonic() - self.checkpoint >= CHECKPOINT_SECONDS:
+            self.plugin.try_force_flush()
+            self.checkpoint = time.monotonic()
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        remove_span_processor(self.span_processor)
+        self.span_processor.shutdown()
@@ -0,0 +1,168 @@
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session
+from _pytest.terminal import TerminalReporter
+from opentelemetry.context.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+
+from .processors import add_span_processor, remove_span_processor
+
+WORKEROUTPUT_KEY = 'pytest_opentelemetry.summary'
+
+# The number of setups, the total nanoseconds, and the self nanoseconds of a fixture
+FixtureStats = List[int]
+
+
+def _duration(span: ReadableSpan) -> int:
+    return (span.end_time or 0) - (span.start_time or 0)
+
+
+class SummarySpanProcessor(SpanProcessor):
+    """Aggregates the spans of tests and fixtures as they end, keeping only the
+    slowest calls of tests and a running total for each fixture, so its memory
+    doesn't grow with the number of tests.
+
+    The self time of a fixture excludes the time spent in any spans nested within it,
+    like those of the code it calls.  Only the spans that are currently open need to
+    be tracked to compute it."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._slowest_tests: List[Tuple[int, str]] = []
+        self._fixtures: Dict[Tuple[str, str], FixtureStats] = {}
+        self._nested: Dict[int, int] = {}
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        if (span.attributes or {}).get('pytest.span_type') == 'fixture':
+            with self._lock:
+                self._nested[span.context.span_id] = 0
+
+    def on_end(self, span: ReadableSpan) -> None:
+        attributes = span.attributes or {}
+        span_type = attributes.get('pytest.span_type')
+        duration = _duration(span)
+
+        with self._lock:
+            nested = self._nested.pop(span.context.span_id, 0)
+            if span.parent and span.parent.span_id in self._nested:
+                self._nested[span.parent.span_id] += duration
+
+            if span_type == 'test' and span.name.endswith('::call'):
+                self._add_test(duration, str(attributes['pytest.nodeid']))
+            elif span_type == 'fixture':
+                key = (
+                    str(attributes['code.function']),
+                    str(attributes['pytest.fixture_scope']),
+                )
+                setups = 1 if span.name.endswith(' setup') else 0
+                self._add_fixture(key, setups, duration, duration - nested)
+
+    def _add_test(self, duration: int, nodeid: str) -> None:
+        if len(self._slowest_tests) < self.limit:
+            heapq.heappush(self._slowest_tests, (duration, nodeid))
+        else:
+            heapq.heappushpop(self._slowest_tests, (duration, nodeid))
+
+    def _add_fixture(
+        self, key: Tuple[str, str], setups: int, total: int, self_time: int
+    ) -> None:
+        stats = self._fixtures.setdefault(key, [0, 0, 0])
+        stats[0] += setups
+        stats[1] += total
+        stats[2] += self_time
+
+    def slowest_tests(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            return sorted(self._slowest_tests, reverse=True)
+
+    def fixtures(self) -> Dict[Tuple[str, str], FixtureStats]:
+        with self._lock:
+            return {key: list(stats) for key, stats in self._fixtures.items()}
+
+    def dump(self) -> Dict[str, Any]:
+        """Returns the aggregates in a form that can be sent from an xdist worker"""
+        return {
+            'tests': [list(test) for test in self.slowest_tests()],
+            'fixtures': [[*key, *stats] for key, stats in self.fixtures().items()],
+        }
+
+    def merge(self, dumped: Dict[str, Any]) -> None:
+        with self._lock:
+            for duration, nodeid in dumped['tests']:
+                self._add_test(duration, nodeid)
+            for name, scope, setups, total, self_time in dumped['fixtures']:
+                self._add_fixture((name, scope), setups, total, self_time)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class SummaryPlugin:
+    """Reports the slowest tests and fixtures at the end of the run, for
+    --otel-summary.  Under xdist, each worker sends its aggregates to the controller,
+    which merges them into one report."""
+
+    def __init__(self, config: Config, limit: int) -> None:
+        self.limit = limit
+        self.is_worker = hasattr(config, 'workerinput')
+        self.span_processor = SummarySpanProcessor(limit)
+        add_span_processor(self.span_processor)
+
+    def pytest_sessionfinish(self, session: Session) -> None:
+        if self.is_worker:  # pragma: no cover
+            workeroutput = getattr(session.config, 'workeroutput')
+            workeroutput[WORKEROUTPUT_KEY] = self.span_processor.dump()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        if dumped := getattr(node, 'workeroutput', {}).get(WORKEROUTPUT_KEY):
+            self.span_processor.merge(dumped)
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
+        if self.is_worker:  # pragma: no cover
+            return
+
+        write_sep, write_line = terminalreporter.write_sep, terminalreporter.write_line
+
+        tests = self.span_processor.slowest_tests()
+        write_sep('=', f'slowest {self.limit} test calls (from spans)')
+        if not tests:
+            write_line('(no test call spans; use --otel-detail=phase or fixture)')
+        for duration, nodeid in tests:
+            write_line(f'{duration / 1e9:8.3f}s  {nodeid}')
+
+        fixtures = self.span_processor.fixtures()
+        for title, column in (('total', 1), ('self', 2)):
+            write_sep('=', f'slowest {self.limit} fixtures by {title} time')
+            if not fixtures:
+                write_line('(no fixture spans; use --otel-detail=fixture)')
+                continue
+            write_line(
+                f'{"total":>9}  {"self":>9}  {"setups":>6}  {"scope":<8}  fixture'
+            )
+            ranked = sorted(fixtures.items(), key=lambda f: f[1][column], reverse=True)
+            for (name, scope), (setups, total, self_time) in ranked[: self.limit]:
+                write_line(
+                    f'{total / 1e9:8.3f}s  {self_time / 1e9:8.3f}s  {setups:>6}  '
+                    f'{scope:<8}  {name}'
+                )
+
+        if fixtures:
+            by_scope: Dict[str, int] = {}
+            for (_, scope), (setups, _, _) in fixtures.items():
+                by_scope[scope] = by_scope.get(scope, 0) + setups
+            write_line(
+                'fixture setups by scope: '
+                + ', '.join(f'{scope} {count}' for scope, count in by_scope.items())
+            )
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        remove_span_processor(self.span_processor)
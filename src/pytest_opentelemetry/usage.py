@@ -0,0 +1,85 @@
+import gc
+import os
+import sys
+from typing import Dict, Iterator, NamedTuple, Tuple
+
+import pytest
+from _pytest.fixtures import FixtureDef, FixtureRequest
+from _pytest.nodes import Item
+from opentelemetry import trace
+from opentelemetry.util.types import AttributeValue
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+# ru_maxrss is in kilobytes, except on macOS, where it's in bytes
+MAXRSS_BYTES = 1 if sys.platform == 'darwin' else 1024
+
+
+class Usage(NamedTuple):
+    """The resources this process has used so far"""
+
+    user_seconds: float
+    system_seconds: float
+    max_rss_bytes: int
+    gc_collections: Tuple[int, ...]
+
+
+def sample() -> Usage:
+    """Samples the resource usage of this process with one system call, and without
+    allocating much, so that it can be done around every test and fixture"""
+    collections = tuple(generation['collections'] for generation in gc.get_stats())
+    if resource is None:  # pragma: no cover
+        times = os.times()
+        return Usage(times.user, times.system, 0, collections)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return Usage(
+        usage.ru_utime, usage.ru_stime, usage.ru_maxrss * MAXRSS_BYTES, collections
+    )
+
+
+def usage_attributes(before: Usage, after: Usage) -> Dict[str, AttributeValue]:
+    """The resources used between two samples.  The maximum RSS only grows when the
+    process reaches a new high-water mark, so a test that allocates less than an
+    earlier test did will show no growth, even though it allocated memory."""
+    return {
+        'pytest.usage.cpu_user_seconds': after.user_seconds - before.user_seconds,
+        'pytest.usage.cpu_system_seconds': after.system_seconds - before.system_seconds,
+        'pytest.usage.max_rss_bytes': after.max_rss_bytes,
+        'pytest.usage.max_rss_growth_bytes': after.max_rss_bytes - before.max_rss_bytes,
+        'pytest.usage.gc_collections': [
+            end - start
+            for start, end in zip(before.gc_collections, after.gc_collections)
+        ],
+    }
+
+
+def record_usage_since(before: Usage) -> None:
+    trace.get_current_span().set_attributes(usage_attributes(before, sample()))
+
+
+class CallUsagePlugin:
+    """Records the resources used by the call of each test on its ::call span"""
+
+    # This must run inside of the PhaseSpansPlugin's call span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_runtest_call(self, item: Item) -> Iterator[None]:
+        before = sample()
+        yield
+        record_usage_since(before)
+
+
+class FixtureUsagePlugin:
+    """Records the resources used by the setup of each fixture on its span"""
+
+    # This must run inside of the FixtureSpansPlugin's setup span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_fixture_setup(
+        self, fixturedef: FixtureDef, request: FixtureRequest
+    ) -> Iterator[None]:
+        before = sample()
+        yield
+        record_usage_since(before)
@@ -0,0 +1,142 @@
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import pytest
+from _pytest.main import Session
+from _pytest.terminal import TerminalReporter
+from opentelemetry.util.types import AttributeValue
+
+if TYPE_CHECKING:
+    from .instrumentation import OpenTelemetryPlugin
+
+WORKEROUTPUT_KEY = 'pytest_opentelemetry.utilization'
+
+# What each worker reports: the wall-clock times when its session started and when
+# its last test finished, how many tests it ran, and the seconds spent running tests
+# and waiting between them.
+WorkerTimes = Dict[str, float]
+
+
+def analyze(workers: Dict[str, WorkerTimes]) -> Dict[str, Any]:
+    """Summarizes how evenly the tests were spread over the workers.  Utilization
+    is the fraction of the time from the first worker starting to the last worker
+    finishing that the workers spent running tests."""
+    names = sorted(workers)
+    started = min(workers[name]['started'] for name in names)
+    finished = [workers[name]['finished'] for name in names]
+    wall = max(finished) - started
+    busy = [workers[name]['busy'] for name in names]
+    return {
+        'workers': names,
+        'tests': [int(workers[name]['tests']) for name in names],
+        'busy': busy,
+        'idle': [workers[name]['idle'] for name in names],
+        'finished': [end - started for end in finished],
+        'skew': max(finished) - min(finished),
+        'utilization': sum(busy) / (len(names) * wall) if wall > 0 else 0.0,
+    }
+
+
+def span_attributes(analysis: Dict[str, Any]) -> Dict[str, AttributeValue]:
+    return {
+        'pytest.xdist.workers': analysis['workers'],
+        'pytest.xdist.worker_tests': analysis['tests'],
+        'pytest.xdist.worker_busy_seconds': analysis['busy'],
+        'pytest.xdist.worker_idle_seconds': analysis['idle'],
+        'pytest.xdist.worker_finished_seconds': analysis['finished'],
+        'pytest.xdist.finish_skew_seconds': analysis['skew'],
+        'pytest.xdist.utilization': analysis['utilization'],
+    }
+
+
+class WorkerUtilizationPlugin:
+    """Measures how an xdist worker spent its time, recording it on the worker's
+    session span and sending it to the controller with the workeroutput"""
+
+    def __init__(self, plugin: 'OpenTelemetryPlugin') -> None:
+        self.plugin = plugin
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.test_started = self.started
+        self.tests = 0
+        self.busy = 0.0
+        self.idle = 0.0
+
+    def pytest_runtest_logstart(self, nodeid: str, location: Tuple) -> None:
+        self.test_started = time.time()
+        if self.finished is not None:
+            self.idle += self.test_started - self.finished
+
+    def pytest_runtest_logfinish(self, nodeid: str, location: Tuple) -> None:
+        self.finished = time.time()
+        self.busy += self.finished - self.test_started
+        self.tests += 1
+
+    def times(self) -> WorkerTimes:
+        return {
+            'started': self.started,
+            'finished': self.started if self.finished is None else self.finished,
+            'tests': self.tests,
+            'busy': self.busy,
+            'idle': self.idle,
+        }
+
+    # This must run before the OpenTelemetryPlugin ends the session span
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session: Session) -> None:
+        self.plugin.session_span.set_attributes(
+            {
+                'pytest.xdist.worker_tests': self.tests,
+                'pytest.xdist.worker_busy_seconds': self.busy,
+                'pytest.xdist.worker_idle_seconds': self.idle,
+            }
+        )
+        getattr(session.config, 'workeroutput')[WORKEROUTPUT_KEY] = self.times()
+
+
+class ControllerUtilizationPlugin:
+    """Collects the times of each xdist worker as it goes down, and reports how
+    evenly the tests were spread over them on the session span, and with
+    --otel-xdist-report, in the terminal"""
+
+    def __init__(self, plugin: 'OpenTelemetryPlugin', report: bool) -> None:
+        self.plugin = plugin
+        self.report = report
+        self.workers: Dict[str, WorkerTimes] = {}
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: Any, error: Any) -> None:
+        if times := getattr(node, 'workeroutput', {}).get(WORKEROUTPUT_KEY):
+            self.workers[node.gateway.id] = times
+
+    # This must run before the OpenTelemetryPlugin ends the session span
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session: Session) -> None:
+        if self.workers:
+            self.analysis = analyze(self.workers)
+            self.plugin.session_span.set_attributes(span_attributes(self.analysis))
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter) -> None:
+        if not self.report or not self.workers:
+            return
+
+        analysis = self.analysis
+        first_finished = min(analysis['finished'])
+        write_line = terminalreporter.write_line
+        terminalreporter.write_sep('=', 'xdist worker utilization')
+        write_line(f'{"worker":<8}{"tests":>7}{"busy":>10}{"idle":>10}{"finished":>11}')
+        for name, tests, busy, idle, finished in zip(
+            analysis['workers'],
+            analysis['tests'],
+            analysis['busy'],
+            analysis['idle'],
+            analysis['finished'],
+        ):
+            write_line(
+                f'{name:<8}{tests:>7}{busy:>9.2f}s{idle:>9.2f}s'
+                f'{finished - first_finished:>+10.2f}s'
+            )
+        write_line(
+            f'finish-time skew {analysis["skew"]:.2f}s, '
+            f'utilization {analysis["utilization"]:.0%}'
+        )
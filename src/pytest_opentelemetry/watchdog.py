@@ -0,0 +1,163 @@
+import sys
+import threading
+import time
+import traceback
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional
+
+import pytest
+from _pytest.config import Config
+from _pytest.nodes import Item
+from opentelemetry import trace
+from opentelemetry.trace import Link, Status, StatusCode
+
+from .exceptions import SPAN_BYTES, truncate
+from .instrumentation import tracer
+
+if TYPE_CHECKING:
+    from .instrumentation import PerTestOpenTelemetryPlugin
+    from .sampling import TailSamplingSpanProcessor
+
+MARKER = 'otel_watchdog'
+
+
+class Watched(NamedTuple):
+    item: Item
+    seconds: float
+    deadline: float
+    start_time: int
+    test_span: Optional[trace.SpanContext]
+
+
+def thread_stacks() -> str:
+    """The stacks of all of the threads but this one, starting with the main
+    thread"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    main = threading.main_thread().ident
+    frames = sorted(sys._current_frames().items(), key=lambda item: item[0] != main)
+    return '\n'.join(
+        f'Thread {names.get(ident, ident)}:\n' + ''.join(traceback.format_stack(frame))
+        for ident, frame in frames
+        if ident != threading.get_ident()
+    )
+
+
+class WatchdogPlugin:
+    """Watches each test with a deadline, from --otel-watchdog or its otel_watchdog
+    marker, from a background thread.  When a test runs past its deadline, a partial
+    span of the test is exported right away, with the stacks of all threads, since
+    the test's own span won't be if the process is killed while it hangs."""
+
+    def __init__(
+        self,
+        plugin: 'PerTestOpenTelemetryPlugin',
+        seconds: Optional[float],
+        sampler: Optional['TailSamplingSpanProcessor'] = None,
+    ) -> None:
+        self.plugin = plugin
+        self.seconds = seconds
+        self.sampler = sampler
+        self.deadlines: Dict[Item, float] = {}
+        self._condition = threading.Condition()
+        self._watched: Optional[Watched] = None
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name='pytest-opentelemetry watchdog', daemon=True
+        )
+
+    def start(self, config: Config, items: List[Item]) -> None:
+        """Finds the deadline of each test, and starts watching for them"""
+        for item in items:
+            marker = item.get_closest_marker(MARKER)
+            seconds = float(marker.args[0]) if marker else self.seconds
+            if seconds:
+                self.deadlines[item] = seconds
+
+        # Without any deadlines, there's nothing to watch for
+        if not self.deadlines:
+            config.pluginmanager.unregister(self)
+            return
+
+        self._thread.start()
+
+    # This must run inside of the ItemSpansPlugin's test span
+    @pytest.hookimpl(hookwrapper=True, trylast=True)
+    def pytest_runtest_protocol(self, item: Item) -> Iterator[None]:
+        seconds = self.deadlines.get(item)
+        if seconds is None:
+            yield
+            return
+
+        test_span = trace.get_current_span()
+        self.watch(
+            Watched(
+                item,
+                seconds,
+                deadline=time.monotonic() + seconds,
+                start_time=time.time_ns(),
+                test_span=(
+                    test_span.get_span_context()
+                    if getattr(test_span, 'name', None) == item.nodeid
+                    else None
+                ),
+            )
+        )
+        try:
+            yield
+        finally:
+            self.watch(None)
+
+    def watch(self, watched: Optional[Watched]) -> None:
+        with self._condition:
+            self._watched = watched
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while overdue := self._wait_for_overdue():
+            self.report(overdue)
+
+    def _wait_for_overdue(self) -> Optional[Watched]:
+        """Waits for the test being watched to run past its deadline, returning it
+        once, or None when the watchdog is stopped"""
+        with self._condition:
+            while not self._stopping:
+                if self._watched is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._watched.deadline - time.monotonic()
+                if remaining <= 0:
+                    overdue, self._watched = self._watched, None
+                    return overdue
+                self._condition.wait(remaining)
+            return None
+
+    def report(self, overdue: Watched) -> None:
+        """Exports a partial span of the overdue test, from its start until now"""
+        # A hung test is worth keeping, so --otel-min-duration stops holding back its
+        # spans, including this one
+        if self.sampler:
+            self.sampler.stop_holding(keep=True)
+
+        attributes = {
+            **self.plugin._compute_item_attributes(overdue.item),
+            'pytest.outcome': 'hung',
+            'pytest.watchdog.deadline_seconds': overdue.seconds,
+            'pytest.watchdog.stacks': truncate(thread_stacks(), SPAN_BYTES),
+        }
+        span = tracer.start_span(
+            overdue.item.nodeid,
+            context=self.plugin.item_parent,
+            attributes=attributes,
+            links=[Link(overdue.test_span)] if overdue.test_span else None,
+            start_time=overdue.start_time,
+        )
+        span.set_status(
+            Status(StatusCode.ERROR, f'still running after {overdue.seconds:g}s')
+        )
+        span.end()
+        self.plugin.try_force_flush()
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
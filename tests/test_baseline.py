@@ -0,0 +1,203 @@
+import json
+import math
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.baseline import (
+    FixtureSetupSpanProcessor,
+    Regression,
+    regressions,
+    stddev,
+    updated,
+)
+
+from . import SpanRecorder
+
+TESTS = """
+    import time
+    import pytest
+
+    @pytest.fixture(scope='session')
+    def database():
+        time.sleep(0.1)
+
+    def test_quick():
+        pass
+
+    def test_slow(database):
+        time.sleep(0.1)
+"""
+
+
+def steady(seconds: float, runs: int = 5) -> Dict[str, float]:
+    return {'runs': runs, 'mean': seconds, 'm2': 0.0001 * (runs - 1)}
+
+
+def write_baseline(pytester: Pytester) -> str:
+    path = pytester.path / 'baseline.json'
+    path.write_text(
+        json.dumps(
+            {
+                'tests': {
+                    # Well above what it takes, even on a busy machine
+                    'test_durations.py::test_quick': steady(1.0),
+                    'test_durations.py::test_slow': steady(0.001),
+                },
+                'fixtures': {'database (session)': steady(0.001)},
+            }
+        )
+    )
+    return str(path)
+
+
+def test_welford_updates() -> None:
+    stats = None
+    for value in (1.0, 2.0, 3.0, 4.0):
+        stats = updated(stats, value)
+
+    assert stats == {'runs': 4, 'mean': 2.5, 'm2': 5.0}
+    assert stddev(stats) == pytest.approx(math.sqrt(5.0 / 3))
+    assert stddev(updated(None, 1.0)) == 0.0
+
+
+def test_regressions() -> None:
+    baseline = {
+        'steady': steady(1.0),
+        'noisy': {'runs': 5, 'mean': 1.0, 'm2': 4.0},
+        'new': steady(1.0, runs=2),
+        'tiny': steady(0.001),
+        'constant': {'runs': 5, 'mean': 1.0, 'm2': 0.0},
+    }
+    durations = {
+        'steady': 2.0,
+        'noisy': 2.0,
+        'new': 2.0,
+        'tiny': 0.01,
+        'constant': 1.5,
+        'unknown': 2.0,
+    }
+
+    found = regressions('test', baseline, durations)
+    assert [regression.name for regression in found] == ['constant', 'steady']
+    assert found[0].z_score == math.inf
+    assert found[1].z_score == pytest.approx(100.0)
+
+
+def test_describing_regressions() -> None:
+    regression = Regression('test', 'test_a', 1.5, 1.0, 0.1)
+    assert (
+        regression.describe() == '1.500s vs 1.000s ± 0.100s (+50%, z=5.0)  test test_a'
+    )
+
+
+def test_baseline_regressions(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(test_durations=TESTS)
+    path = write_baseline(pytester)
+    before = Path(path).read_text()
+
+    result = pytester.runpytest(f'--otel-baseline={path}')
+    assert result.ret == pytest.ExitCode.OK
+    result.stdout.fnmatch_lines(
+        [
+            f'*= 2 duration regressions against {path} =*',
+            '*s vs 0.001s ± 0.010s (+*%, z=*)  *',
+            '*s vs 0.001s ± 0.010s (+*%, z=*)  *',
+        ]
+    )
+    result.stdout.fnmatch_lines(['*  test test_durations.py::test_slow'])
+    result.stdout.fnmatch_lines(['*  fixture database (session)'])
+    result.stdout.no_fnmatch_line('*test_quick*')
+
+    # The baseline is only changed with --otel-baseline-save
+    assert Path(path).read_text() == before
+
+    run = span_recorder.spans_by_name()['test run']
+    assert run.attributes
+    assert run.attributes['pytest.baseline.regressions'] == 2
+    assert set(run.attributes['pytest.baseline.regressed']) == {  # type: ignore
+        'test test_durations.py::test_slow',
+        'fixture database (session)',
+    }
+
+    result = pytester.runpytest(f'--otel-baseline={path}', '--otel-baseline-fail')
+    result.assert_outcomes(passed=2)
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+
+
+def test_baseline_regressions_under_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(test_durations=TESTS)
+    path = write_baseline(pytester)
+
+    result = pytester.runpytest('-n', '2', f'--otel-baseline={path}')
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(['*  test test_durations.py*'])
+    result.stdout.fnmatch_lines(['*  fixture database (session)'])
+
+
+def test_no_regressions(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(test_durations=TESTS)
+    path = str(pytester.path / 'baseline.json')
+
+    result = pytester.runpytest(f'--otel-baseline={path}', '--otel-baseline-fail')
+    assert result.ret == pytest.ExitCode.OK
+    result.stdout.no_fnmatch_line('*duration regressions*')
+
+    run = span_recorder.spans_by_name()['test run']
+    assert run.attributes
+    assert run.attributes['pytest.baseline.regressions'] == 0
+    assert 'pytest.baseline.regressed' not in run.attributes
+
+    # There is no session span to annotate when each test has its own trace
+    result = pytester.runpytest(f'--otel-baseline={path}', '--trace-per-test')
+    assert result.ret == pytest.ExitCode.OK
+
+
+def test_saving_the_baseline(pytester: Pytester) -> None:
+    pytester.makepyfile(test_durations=TESTS)
+    path = pytester.path / 'baseline.json'
+
+    for _ in range(2):
+        result = pytester.runpytest(f'--otel-baseline={path}', '--otel-baseline-save')
+        result.assert_outcomes(passed=2)
+
+    baseline = json.loads(path.read_text())
+    assert set(baseline['tests']) == {
+        'test_durations.py::test_quick',
+        'test_durations.py::test_slow',
+    }
+    assert {stats['runs'] for stats in baseline['tests'].values()} == {2}
+    assert baseline['tests']['test_durations.py::test_slow']['mean'] >= 0.2
+    assert baseline['fixtures']['database (session)']['runs'] == 2
+    assert baseline['fixtures']['database (session)']['mean'] >= 0.1
+    assert not (pytester.path / 'baseline.json.tmp').exists()
+
+
+def test_fixtures_are_timed_by_their_setup_spans(pytester: Pytester) -> None:
+    pytester.makepyfile(test_durations=TESTS)
+    path = pytester.path / 'baseline.json'
+
+    result = pytester.runpytest(
+        f'--otel-baseline={path}', '--otel-baseline-save', '--otel-detail=phase'
+    )
+    result.assert_outcomes(passed=2)
+
+    # Without the spans of fixtures, only the tests are in the baseline
+    baseline = json.loads(path.read_text())
+    assert set(baseline['tests']) == {
+        'test_durations.py::test_quick',
+        'test_durations.py::test_slow',
+    }
+    assert baseline['fixtures'] == {}
+
+
+def test_totaling_fixture_setups() -> None:
+    processor = FixtureSetupSpanProcessor()
+    processor.add('database (session)', 1, 0.5)
+    processor.add('database (session)', 2, 0.25)
+    assert processor.fixtures() == {'database (session)': [3, 0.75]}
+
+    assert processor.force_flush()
+    processor.shutdown()
@@ -0,0 +1,27 @@
+import pytest
+
+from benchmarks.overhead import SCENARIOS, report, run
+
+
+@pytest.mark.parametrize('scenario', sorted(SCENARIOS))
+def test_benchmark_scenarios_run(scenario: str) -> None:
+    result = run(scenario, tests=5, repeat=1)
+    assert result.baseline.tests == 5
+    assert result.instrumented.tests == 5
+    assert result.baseline.seconds > 0
+    assert result.instrumented.seconds > 0
+
+    lines = report([result]).splitlines()
+    assert len(lines) == 2
+    assert lines[1].startswith(scenario)
+
+
+def test_benchmarks_with_xdist_workers() -> None:
+    result = run('trivial', tests=4, xdist=2, repeat=1)
+    assert result.instrumented.tests == 4
+    assert result.baseline.workers == 2
+    assert result.instrumented.workers == 2
+
+    lines = report([result]).splitlines()
+    assert lines[0].endswith('workers +KB')
+    assert not lines[1].endswith('-')
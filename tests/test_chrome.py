@@ -0,0 +1,136 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+from _pytest.pytester import Pytester
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, Status, StatusCode
+
+from pytest_opentelemetry.chrome import ChromeTracePlugin, chrome_event, json_array
+from pytest_opentelemetry.files import merge_parts
+
+TESTS = """
+    import pytest
+
+    @pytest.fixture
+    def number():
+        return 1
+
+    def test_one(number):
+        pass
+
+    def test_two(number):
+        assert False
+"""
+
+
+def read_events(path: Path) -> List[Dict[str, Any]]:
+    events = json.loads(path.read_text())
+    assert isinstance(events, list)
+    return events
+
+
+def test_chrome_trace(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = pytester.path / 'trace.json'
+    result = pytester.runpytest(f'--otel-chrome-trace={path}')
+    result.assert_outcomes(passed=1, failed=1)
+
+    assert os.listdir(pytester.path).count('trace.json') == 1
+    assert not [name for name in os.listdir(pytester.path) if name.endswith('.part')]
+
+    events = read_events(path)
+    threads = [event for event in events if event['name'] == 'thread_name']
+    assert [thread['args']['name'] for thread in threads] == ['pytest']
+
+    spans = {event['name']: event for event in events if event['ph'] == 'X'}
+    run = spans['test run']
+    test = spans['test_chrome_trace.py::test_one']
+    call = spans['test_chrome_trace.py::test_one::call']
+    assert run['cat'] == 'run'
+    assert test['cat'] == 'test'
+    assert spans['number setup']['cat'] == 'fixture'
+    assert {event['tid'] for event in spans.values()} == {0}
+
+    # The spans nest on the timeline
+    assert run['ts'] <= test['ts'] <= call['ts']
+    assert call['ts'] + call['dur'] <= test['ts'] + test['dur']
+    assert test['ts'] + test['dur'] <= run['ts'] + run['dur']
+
+    assert call['args']['pytest.nodeid'] == 'test_chrome_trace.py::test_one'
+    assert 'status' not in call['args']
+    assert 'AssertionError' in spans['test_chrome_trace.py::test_two']['args']['status']
+
+
+def test_chrome_trace_with_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = pytester.path / 'trace.json'
+    stale = pytester.path / 'trace.json.gw9.part'
+    stale.write_text('not even json\n')
+
+    result = pytester.runpytest('-n', '2', f'--otel-chrome-trace={path}')
+    result.assert_outcomes(passed=1, failed=1)
+
+    assert not stale.exists()
+    events = read_events(path)
+    threads = {
+        event['tid']: event['args']['name']
+        for event in events
+        if event['name'] == 'thread_name'
+    }
+    assert threads == {0: 'controller', 1: 'gw0', 2: 'gw1'}
+
+    tracks = {event['name']: event['tid'] for event in events if event['ph'] == 'X'}
+    assert tracks['test run'] == 0
+    assert tracks['test worker gw0'] == 1
+    assert tracks['test worker gw1'] == 2
+    assert tracks['test_chrome_trace_with_xdist.py::test_one'] in {1, 2}
+
+
+def test_chrome_events() -> None:
+    span = ReadableSpan(
+        name='failing',
+        context=SpanContext(trace_id=1, span_id=2, is_remote=False),
+        status=Status(StatusCode.ERROR),
+        start_time=3_000_000,
+        end_time=5_500_000,
+    )
+    assert chrome_event(span, 4) == {
+        'name': 'failing',
+        'cat': 'span',
+        'ph': 'X',
+        'ts': 3000.0,
+        'dur': 2500.0,
+        'pid': 1,
+        'tid': 4,
+        'args': {'status': 'ERROR'},
+    }
+
+
+def test_workers_write_parts(tmp_path: Path) -> None:
+    config = Mock()
+    config.workerinput = {'workerid': 'gw3'}
+    path = str(tmp_path / 'trace.json')
+
+    plugin = ChromeTracePlugin(config, path)
+    assert not plugin.merges
+    assert plugin.span_processor.span_exporter.force_flush()  # type: ignore
+    plugin.pytest_unconfigure(config)
+
+    with open(f'{path}.gw3.part', encoding='utf-8') as part:
+        events = [json.loads(line) for line in part]
+    assert events[1] == {
+        'name': 'thread_name',
+        'ph': 'M',
+        'pid': 1,
+        'tid': 4,
+        'args': {'name': 'gw3'},
+    }
+
+
+def test_merging_no_parts(tmp_path: Path) -> None:
+    path = tmp_path / 'trace.json'
+    merge_parts(str(path), json_array)
+    assert read_events(path) == []
@@ -0,0 +1,194 @@
+from typing import Dict
+from unittest.mock import Mock
+
+import pytest
+from _pytest.pytester import Pytester
+from opentelemetry.sdk.trace import ReadableSpan
+
+from pytest_opentelemetry.costs import shared_fixtures
+
+from . import SpanRecorder
+
+TESTS = """
+    import time
+    import pytest
+
+    @pytest.fixture(scope='session')
+    def database():
+        time.sleep(0.3)
+
+    @pytest.fixture(scope='module')
+    def schema(database):
+        time.sleep(0.2)
+
+    def test_first(schema):
+        pass
+
+    def test_second(schema):
+        pass
+
+    def test_third(database):
+        pass
+
+    def test_alone():
+        time.sleep(0.05)
+"""
+
+
+def costs_of(span: ReadableSpan) -> Dict[str, float]:
+    costs = {}
+    for cost in ('own', 'shared', 'amortized'):
+        seconds = (span.attributes or {})[f'pytest.cost.{cost}_seconds']
+        assert isinstance(seconds, float)
+        costs[cost] = seconds
+    return costs
+
+
+def test_amortized_costs(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(test_costs=TESTS)
+    pytester.runpytest('--otel-amortized-costs').assert_outcomes(passed=4)
+
+    spans = span_recorder.spans_by_name()
+    costs = {
+        name: costs_of(spans[f'test_costs.py::test_{name}'])
+        for name in ('first', 'second', 'third', 'alone')
+    }
+
+    # The first test set up both fixtures, but its own cost doesn't include them
+    assert costs['first']['own'] < 0.1
+    assert costs['first']['shared'] == costs['second']['shared']
+    assert costs['first']['shared'] == pytest.approx(0.3 / 3 + 0.2 / 2, rel=0.2)
+    assert costs['third']['shared'] == pytest.approx(0.3 / 3, rel=0.2)
+    assert costs['alone']['own'] >= 0.05
+    assert costs['alone']['shared'] == 0
+    for cost in costs.values():
+        assert cost['amortized'] == cost['own'] + cost['shared']
+
+    # Shared between them, the tests cost as much as the setups
+    assert sum(cost['shared'] for cost in costs.values()) == pytest.approx(0.5, rel=0.2)
+
+    second = spans['test_costs.py::test_second']
+    links = {link.context.span_id: link.attributes for link in second.links}
+    assert links == {
+        spans['database setup'].context.span_id: {'pytest.fixture': 'database'},
+        spans['schema setup'].context.span_id: {'pytest.fixture': 'schema'},
+    }
+    assert not spans['test_costs.py::test_alone'].links
+
+
+def test_amortized_costs_without_fixture_spans(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(test_costs=TESTS)
+    result = pytester.runpytest('--otel-amortized-costs', '--otel-detail=test')
+    result.assert_outcomes(passed=4)
+
+    test = span_recorder.spans_by_name()['test_costs.py::test_first']
+    assert not test.links
+    assert costs_of(test)['shared'] > 0.1
+
+
+def test_amortized_costs_of_nested_setups(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        test_costs="""
+        import time
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def inner():
+            time.sleep(0.2)
+
+        @pytest.fixture(scope='module')
+        def outer(request):
+            request.getfixturevalue('inner')
+            time.sleep(0.1)
+
+        @pytest.fixture
+        def scratch():
+            pass
+
+        @pytest.mark.skip
+        def test_skipped(outer):
+            pass
+
+        def test_one(outer, scratch):
+            pass
+
+        def test_two(outer, scratch):
+            pass
+    """
+    )
+    result = pytester.runpytest('--otel-amortized-costs')
+    result.assert_outcomes(passed=2, skipped=1)
+
+    spans = span_recorder.spans_by_name()
+    assert costs_of(spans['test_costs.py::test_skipped'])['shared'] == 0
+
+    # The inner fixture isn't a declared argument of the tests, so only the outer
+    # fixture's own setup is shared between them
+    one = costs_of(spans['test_costs.py::test_one'])
+    assert one['own'] < 0.1
+    assert one['shared'] == pytest.approx(0.1 / 3, rel=0.3)
+
+
+def test_amortized_costs_under_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(test_costs=TESTS)
+    result = pytester.runpytest('-n', '2', '--otel-amortized-costs')
+    result.stderr.fnmatch_lines(['*--otel-amortized-costs can not be used with*xdist*'])
+
+    # Without any workers, the tests run in this process as usual
+    result = pytester.runpytest('-n', '0', '--otel-amortized-costs')
+    result.assert_outcomes(passed=4)
+
+
+def test_the_setups_that_are_shared(pytester: Pytester) -> None:
+    pytester.makepyfile(
+        __init__='',
+        conftest="""
+        import pytest
+
+        @pytest.fixture(scope='package')
+        def package():
+            pass
+    """,
+    )
+    items = pytester.getitems(
+        """
+        import pytest
+
+        @pytest.fixture(scope='class')
+        def thing():
+            pass
+
+        @pytest.fixture(scope='module', params=[1, 2])
+        def number(request):
+            return request.param
+
+        class TestThings:
+            def test_in_class(self, thing, number, package):
+                pass
+
+        def test_outside(thing, tmp_path):
+            pass
+    """
+    )
+    keys = {
+        item.name: {
+            argname: (fixturedef.argname, nodeid, param)
+            for argname, (fixturedef, nodeid, param) in shared_fixtures(item).items()
+        }
+        for item in items
+    }
+    module = 'test_the_setups_that_are_shared.py'
+    assert keys['test_in_class[1]'] == {
+        'thing': ('thing', f'{module}::TestThings', None),
+        'number': ('number', module, 0),
+        'package': ('package', '.', None),
+    }
+    assert keys['test_in_class[2]']['number'] == ('number', module, 1)
+    assert keys['test_outside']['thing'] == ('thing', f'{module}::test_outside', None)
+    assert keys['test_outside']['tmp_path_factory'] == ('tmp_path_factory', '', None)
+
+    assert shared_fixtures(Mock(spec=[])) == {}
@@ -0,0 +1,279 @@
+from typing import Dict, Set
+from unittest.mock import Mock, patch
+
+import pytest
+from _pytest.pytester import Pytester
+from opentelemetry.sdk.trace import ReadableSpan
+
+from pytest_opentelemetry.deferred import (
+    CALL,
+    SETUP,
+    TEST,
+    DeferredFixtureSpansPlugin,
+    SpanBuffer,
+)
+
+from . import SpanRecorder
+
+TESTS = """
+    import time
+    import pytest
+    from opentelemetry import trace
+
+    @pytest.fixture(scope='module')
+    def database():
+        time.sleep(0.01)
+
+    @pytest.fixture(params=['a', 'b'])
+    def letter(request):
+        return request.param
+
+    def test_one(database, letter):
+        with trace.get_tracer('inside').start_as_current_span('inside'):
+            pass
+
+    def test_failing(database):
+        assert False
+"""
+
+
+def recorded_names(span_recorder: SpanRecorder) -> Set[str]:
+    return {span.name for span in span_recorder.finished_spans()}
+
+
+def by_id(span_recorder: SpanRecorder) -> Dict[int, ReadableSpan]:
+    return {span.context.span_id: span for span in span_recorder.finished_spans()}
+
+
+def test_deferred_spans_are_the_same_spans(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    span_recorder.clear()
+    pytester.runpytest().assert_outcomes(passed=2, failed=1)
+    expected = recorded_names(span_recorder)
+    prefix = 'test_deferred_spans_are_the_same_spans.py'
+    failed = span_recorder.spans_by_name()[f'{prefix}::test_failing'].status
+
+    span_recorder.clear()
+    pytester.runpytest('--otel-deferred').assert_outcomes(passed=2, failed=1)
+    assert recorded_names(span_recorder) == expected
+
+    spans = span_recorder.spans_by_name()
+    ids = by_id(span_recorder)
+
+    test = spans[f'{prefix}::test_one[a]']
+    assert test.parent
+    assert ids[test.parent.span_id].name == 'test run'
+    assert test.status.is_ok
+    assert test.attributes
+    assert test.attributes['pytest.nodeid'] == f'{prefix}::test_one[a]'
+    assert test.attributes['pytest.span_type'] == 'test'
+
+    setup = spans[f'{prefix}::test_one[a]::setup']
+    assert setup.parent
+    assert setup.parent.span_id == test.context.span_id
+    assert test.start_time and setup.start_time and setup.end_time
+    assert test.start_time <= setup.start_time <= setup.end_time
+    assert test.end_time and setup.end_time <= test.end_time
+
+    fixture = spans['database setup']
+    assert fixture.parent
+    assert ids[fixture.parent.span_id].name == f'{prefix}::test_one[a]::setup'
+    assert fixture.attributes
+    assert fixture.attributes['pytest.fixture_scope'] == 'module'
+    assert fixture.end_time and fixture.start_time
+    assert fixture.end_time - fixture.start_time >= 10_000_000
+
+    assert 'letter[a] setup' in spans
+    assert 'letter[b] setup' in spans
+
+    teardown = spans['database teardown']
+    assert teardown.parent
+    assert ids[teardown.parent.span_id].name == f'{prefix}::test_failing::teardown'
+
+    # Spans from the code under test are parented to the test run
+    inside = spans['inside']
+    assert inside.parent
+    assert ids[inside.parent.span_id].name == 'test run'
+
+    failing = spans[f'{prefix}::test_failing']
+    assert not failing.status.is_ok
+    assert failing.status.description == "<class 'AssertionError'>: assert False"
+    assert failing.status.description == failed.description
+    (event,) = failing.events
+    assert event.name == 'exception'
+    assert event.attributes
+    assert event.attributes['exception.type'] == 'AssertionError'
+    assert 'assert False' in str(event.attributes['exception.stacktrace'])
+
+
+def test_deferred_detail_levels(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    span_recorder.clear()
+    pytester.runpytest('--otel-deferred', '--otel-detail=test').assert_outcomes(
+        passed=2, failed=1
+    )
+
+    types = {
+        (span.attributes or {}).get('pytest.span_type')
+        for span in span_recorder.finished_spans()
+        if not span.name.startswith('inside')
+    }
+    assert types == {'run', 'collection', 'collect', 'import', 'test'}
+    assert not any(
+        span.name.endswith('::call') for span in span_recorder.finished_spans()
+    )
+
+
+def test_deferred_spans_are_built_in_batches(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    original = SpanBuffer.flush
+    with patch('pytest_opentelemetry.deferred.BATCH_SIZE', 2):
+        with patch.object(
+            SpanBuffer, 'flush', autospec=True, side_effect=original
+        ) as flush:
+            pytester.runpytest('--otel-deferred').assert_outcomes(passed=2, failed=1)
+
+    # Once after each of the 3 tests, and at the end of the session
+    assert flush.call_count == 4
+    assert 'test_deferred_spans_are_built_in_batches.py::test_failing::call' in (
+        span_recorder.spans_by_name()
+    )
+
+
+def test_deferred_spans_of_fast_tests_are_never_built(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+        from opentelemetry import trace
+
+        tracer = trace.get_tracer('inside')
+
+        def test_fast():
+            with tracer.start_as_current_span('inside fast'):
+                pass
+
+        def test_slow():
+            with tracer.start_as_current_span('inside slow'):
+                time.sleep(0.3)
+
+        def test_failing():
+            assert False
+    """
+    )
+    pytester.runpytest('--otel-deferred', '--otel-min-duration=250').assert_outcomes(
+        passed=2, failed=1
+    )
+
+    spans = span_recorder.spans_by_name()
+    prefix = 'test_deferred_spans_of_fast_tests_are_never_built.py'
+    assert f'{prefix}::test_fast' not in spans
+    assert f'{prefix}::test_fast::call' not in spans
+    assert 'inside fast' not in spans
+    assert f'{prefix}::test_slow::call' in spans
+    assert f'{prefix}::test_failing::call' in spans
+    assert 'inside slow' in spans
+
+
+def test_deferred_spans_under_xdist(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-deferred', '-n', '2')
+    result.assert_outcomes(passed=2, failed=1)
+
+
+def test_deferred_trace_per_test(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile('def test_one(): pass')
+    pytester.runpytest('--otel-deferred', '--trace-per-test').assert_outcomes(passed=1)
+
+    spans = span_recorder.spans_by_name()
+    assert 'test_deferred_trace_per_test.py::test_one' in spans
+    assert 'test run' not in spans
+
+
+def test_deferred_teardowns_after_stopping_early(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    pytester.runpytest('--otel-deferred', '-x').assert_outcomes(passed=2, failed=1)
+    assert 'database teardown' in span_recorder.spans_by_name()
+
+
+def test_deferred_teardowns_after_exiting(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture(scope='session')
+        def database():
+            yield
+
+        def test_exiting(database):
+            pytest.exit('stopping')
+
+        def test_never_run(database):
+            pass
+    """
+    )
+    result = pytester.runpytest('--otel-deferred')
+    assert result.ret == pytest.ExitCode.INTERRUPTED
+
+    spans = span_recorder.spans_by_name()
+    assert 'test_deferred_teardowns_after_exiting.py::test_exiting' in spans
+    teardown = spans['database teardown']
+    assert teardown.parent
+    assert teardown.parent.span_id == spans['test run'].context.span_id
+
+
+def test_deferred_collection_errors(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile('raise ValueError()')
+    pytester.runpytest('--otel-deferred').assert_outcomes(errors=1)
+    assert 'test run' in span_recorder.spans_by_name()
+
+
+@pytest.mark.parametrize(
+    'option', ['--otel-resource-usage', '--otel-profile=1', '--otel-amortized-costs']
+)
+def test_deferred_spans_cant_be_annotated(pytester: Pytester, option: str) -> None:
+    pytester.makepyfile('def test_one(): pass')
+    result = pytester.runpytest('--otel-deferred', option)
+    result.stderr.fnmatch_lines(['*can not be used with --otel-deferred*'])
+
+
+def test_deferred_fixture_teardowns_without_records() -> None:
+    plugin = DeferredFixtureSpansPlugin(Mock(), SpanBuffer())
+    plugin.pytest_fixture_post_finalizer(Mock(), Mock())
+    assert not plugin.teardowns
+
+
+def test_the_buffer_grows(span_recorder: SpanRecorder) -> None:
+    span_recorder.clear()
+    buffer = SpanBuffer(capacity=1)
+    test = buffer.begin(TEST, buffer.node('test', 'test', {'a': 1}))
+    for kind in (SETUP, CALL):
+        buffer.end(buffer.begin(kind, buffer.node('test', 'test', {'a': 1})))
+    buffer.end(test)
+    assert len(buffer.kinds) == 4
+
+    buffer.flush()
+    assert buffer.size == 0
+
+    spans = span_recorder.spans_by_name()
+    assert set(spans) == {'test', 'test::setup', 'test::call'}
+    assert spans['test::call'].parent
+    assert spans['test::call'].parent.span_id == spans['test'].context.span_id
+    assert spans['test'].attributes == {'a': 1}
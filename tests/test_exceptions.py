@@ -0,0 +1,131 @@
+from typing import List
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.exceptions import ExceptionPayloads, fingerprint, truncate
+
+from . import SpanRecorder
+
+
+def raised(message: str = 'woops') -> BaseException:
+    try:
+        raise ValueError(message)
+    except ValueError as error:
+        return error
+
+
+def failed(message: str) -> BaseException:
+    try:
+        pytest.fail(message)
+    except pytest.fail.Exception as error:
+        return error
+    raise AssertionError('unreachable')  # pragma: no cover
+
+
+def test_truncating() -> None:
+    assert truncate('short', 10) == 'short'
+    assert truncate('x' * 100, 20) == 'x' * 8 + '\n[truncated]'
+    assert truncate('é' * 100, 20) == 'é' * 4 + '\n[truncated]'
+    assert truncate('x' * 100, 4) == '\n[truncated]'
+
+
+def test_fingerprints() -> None:
+    assert fingerprint(raised('one')) == fingerprint(raised('two'))
+    assert fingerprint(raised()) != fingerprint(ValueError('never raised'))
+    assert fingerprint(ValueError('a')) == fingerprint(ValueError('b'))
+    assert fingerprint(ValueError('a')) != fingerprint(TypeError('a'))
+
+    # pytest.fail() hides its own frame, so it's the callers that count
+    first, second = failed('one'), failed('two')
+    third = failed('three')
+    assert fingerprint(first) == fingerprint(second) == fingerprint(third)
+    assert fingerprint(first) != fingerprint(raised())
+
+
+def test_stack_traces_are_recorded_once() -> None:
+    payloads = ExceptionPayloads()
+    first = payloads.attributes(raised(), 'the stack trace')
+    second = payloads.attributes(raised(), 'the stack trace')
+
+    assert first == {
+        'exception.type': 'ValueError',
+        'exception.message': 'woops',
+        'exception.escaped': 'False',
+        'exception.stacktrace': 'the stack trace',
+        'pytest.exception.fingerprint': first['pytest.exception.fingerprint'],
+    }
+    assert second['pytest.exception.stacktrace_omitted'] == 'duplicate'
+    assert 'exception.stacktrace' not in second
+    assert (
+        first['pytest.exception.fingerprint'] == second['pytest.exception.fingerprint']
+    )
+    assert payloads.used == len('woops') * 2 + len('the stack trace')
+
+
+def test_payloads_fit_the_span_budget() -> None:
+    payloads = ExceptionPayloads(span_bytes=100)
+    attributes = payloads.attributes(raised('m' * 40), 's' * 1000)
+    assert attributes['exception.message'] == 'm' * 40
+    assert len(attributes['exception.stacktrace']) == 60
+    assert attributes['exception.stacktrace'].endswith('[truncated]')
+
+    attributes = payloads.attributes(TypeError('m' * 1000), 's' * 1000)
+    assert len(attributes['exception.message']) == 50
+    assert len(attributes['exception.stacktrace']) == 50
+
+
+class Unformattable:
+    def __str__(self) -> str:  # pragma: no cover
+        raise AssertionError('the stack trace should not be formatted')
+
+
+def test_payloads_fit_the_run_budget() -> None:
+    payloads = ExceptionPayloads(run_bytes=1000)
+    payloads.attributes(TypeError('m' * 100), 's' * 2000)
+    assert payloads.used == 1000
+
+    attributes = payloads.attributes(ValueError('m' * 1000), Unformattable())
+    assert len(attributes['exception.message']) == 256
+    assert attributes['pytest.exception.stacktrace_omitted'] == 'budget'
+
+
+def test_identical_failures(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(
+        """
+        import pytest
+
+        def check(n):
+            assert n < 0, 'x' * 1000
+
+        @pytest.mark.parametrize('n', range(3))
+        def test_identical(n):
+            check(n)
+
+        def test_different():
+            raise ValueError('woops')
+    """
+    )
+    pytester.runpytest('--otel-exception-span-bytes=4000').assert_outcomes(failed=4)
+
+    events = {
+        span.name.rsplit('::', 1)[-1]: span.events[0]
+        for span in span_recorder.finished_spans()
+        if span.events
+    }
+    stacktraces: List[str] = []
+    for name in ('test_identical[0]', 'test_identical[1]', 'test_identical[2]'):
+        attributes = events[name].attributes
+        assert attributes
+        assert str(attributes['exception.message']).startswith('x' * 1000)
+        if 'exception.stacktrace' in attributes:
+            stacktraces.append(str(attributes['exception.stacktrace']))
+        else:
+            assert attributes['pytest.exception.stacktrace_omitted'] == 'duplicate'
+    assert len(stacktraces) == 1
+    assert 'def check(n):' in stacktraces[0]
+
+    attributes = events['test_different'].attributes
+    assert attributes
+    assert attributes['exception.message'] == 'woops'
+    assert 'raise ValueError' in str(attributes['exception.stacktrace'])
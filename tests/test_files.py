@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest.mock import Mock, patch
+
+import pytest
+from _pytest.pytester import Pytester
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import Link, SpanContext
+
+from pytest_opentelemetry.files import (
+    FileExportPlugin,
+    OTLPJSONLinesSpanExporter,
+    merge_parts,
+    open_for_writing,
+)
+
+TESTS = """
+    def test_one():
+        pass
+
+    def test_two():
+        pass
+"""
+
+
+def spans_from(lines: Iterator[bytes]) -> List[Dict[str, Any]]:
+    return [
+        span
+        for line in lines
+        for resource_spans in json.loads(line)['resourceSpans']
+        for scope_spans in resource_spans['scopeSpans']
+        for span in scope_spans['spans']
+    ]
+
+
+def test_exporting_to_a_file(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'traces.jsonl')
+    pytester.runpytest(f'--export-traces-file={path}').assert_outcomes(passed=2)
+
+    with open(path, 'rb') as file:
+        spans = spans_from(file)
+
+    by_name = {span['name']: span for span in spans}
+    assert 'test run' in by_name
+    assert 'test_exporting_to_a_file.py::test_one::call' in by_name
+
+    run = by_name['test run']
+    test = by_name['test_exporting_to_a_file.py::test_one']
+    assert len(run['traceId']) == 32
+    assert len(run['spanId']) == 16
+    assert test['traceId'] == run['traceId']
+    assert test['parentSpanId'] == run['spanId']
+
+
+def test_exporting_to_a_gzipped_file_with_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'traces.jsonl.gz')
+    result = pytester.runpytest_subprocess('-n', '2', f'--export-traces-file={path}')
+    result.assert_outcomes(passed=2)
+
+    assert not [name for name in os.listdir(pytester.path) if name.endswith('.part')]
+
+    with gzip.open(path, 'rb') as file:
+        names = {span['name'] for span in spans_from(file)}
+
+    assert {'test run', 'test worker gw0', 'test worker gw1'} <= names
+    assert 'test_exporting_to_a_gzipped_file_with_xdist.py::test_one' in names
+    assert 'test_exporting_to_a_gzipped_file_with_xdist.py::test_two' in names
+
+
+def test_zstandard_must_be_installed(tmp_path: Path) -> None:
+    with patch('pytest_opentelemetry.files.zstandard', None):
+        with pytest.raises(pytest.UsageError, match='zstandard'):
+            open_for_writing(str(tmp_path / 'traces'), 'traces.jsonl.zst')
+
+
+def test_exporting_with_xdist_in_process(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = pytester.path / 'traces.jsonl.gz'
+    stale = pytester.path / 'traces.jsonl.gz.gw9.part'
+    stale.write_bytes(b'not even gzip')
+
+    result = pytester.runpytest('-n', '2', f'--export-traces-file={path}')
+    result.assert_outcomes(passed=2)
+
+    assert not stale.exists()
+    with gzip.open(path, 'rb') as file:
+        names = {span['name'] for span in spans_from(file)}
+    assert {'test run', 'test worker gw0', 'test worker gw1'} <= names
+
+
+def test_workers_write_parts(tmp_path: Path) -> None:
+    config = Mock()
+    config.workerinput = {'workerid': 'gw3'}
+    path = str(tmp_path / 'traces.jsonl')
+
+    plugin = FileExportPlugin(config, path)
+    assert not plugin.merges
+    plugin.pytest_unconfigure(config)
+
+    assert os.path.exists(f'{path}.gw3.part')
+
+
+def test_merging_parts(tmp_path: Path) -> None:
+    path = str(tmp_path / 'traces.jsonl.gz')
+    for part, content in (('gw0', b'one\n'), ('gw1', b'two\n')):
+        with open_for_writing(f'{path}.{part}.part', path) as file:
+            file.write(content)
+
+    merge_parts(path)
+
+    assert os.listdir(tmp_path) == ['traces.jsonl.gz']
+    with gzip.open(path, 'rb') as file:
+        assert file.read() == b'one\ntwo\n'
+
+
+def test_otlp_json_encodes_ids_in_hex(tmp_path: Path) -> None:
+    linked = SpanContext(trace_id=0xABC, span_id=0xDEF, is_remote=False)
+    span = ReadableSpan(
+        name='linking',
+        context=SpanContext(trace_id=0x123, span_id=0x456, is_remote=False),
+        links=[Link(linked)],
+        resource=Resource({}),
+    )
+
+    exporter = OTLPJSONLinesSpanExporter(str(tmp_path / 'spans.jsonl'), 'spans.jsonl')
+    exporter.export([span])
+    assert exporter.force_flush()
+    exporter.shutdown()
+
+    with open(tmp_path / 'spans.jsonl', 'rb') as file:
+        [exported] = spans_from(file)
+
+    assert exported['traceId'] == f'{0x123:032x}'
+    assert exported['spanId'] == f'{0x456:016x}'
+    assert 'parentSpanId' not in exported
+    assert exported['links'] == [
+        {'traceId': f'{0xABC:032x}', 'spanId': f'{0xDEF:016x}', 'flags': 256}
+    ]
@@ -0,0 +1,93 @@
+import gc
+from unittest.mock import Mock, patch
+
+from _pytest.pytester import Pytester
+from opentelemetry import trace
+
+from pytest_opentelemetry.garbage import GarbageCollectionPlugin
+
+from . import SpanRecorder
+
+
+def test_garbage_collection_spans(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import gc
+        import pytest
+
+        class Cycle:
+            def __init__(self):
+                self.me = self
+
+        @pytest.fixture
+        def garbage():
+            cycles = [Cycle() for _ in range(10_000)]
+            del cycles
+            gc.collect()
+
+        def test_collecting(garbage):
+            cycles = [Cycle() for _ in range(10_000)]
+            del cycles
+            gc.collect()
+    """
+    )
+    pytester.runpytest('--otel-gc-threshold=0').assert_outcomes(passed=1)
+
+    spans = span_recorder.finished_spans()
+    by_id = {span.context.span_id: span for span in spans}
+    collections = [span for span in spans if span.name == 'gc generation 2']
+    parents = {by_id[span.parent.span_id].name for span in collections if span.parent}
+    assert {
+        'garbage setup',
+        'test_garbage_collection_spans.py::test_collecting::call',
+    } <= parents
+
+    call = next(span for span in spans if span.name.endswith('::call'))
+    collection = next(
+        span
+        for span in collections
+        if span.parent and span.parent.span_id == call.context.span_id
+    )
+    assert collection.attributes
+    assert collection.attributes['pytest.span_type'] == 'gc'
+    assert collection.attributes['pytest.gc.generation'] == 2
+    assert collection.attributes['pytest.gc.collected'] >= 10_000  # type: ignore
+    assert collection.attributes['pytest.gc.uncollectable'] == 0
+
+
+def test_collections_outside_of_spans() -> None:
+    plugin = Mock()
+    plugin.item_parent = None
+    garbage = GarbageCollectionPlugin(plugin, threshold_ms=0)
+    # A real collection would be recorded too, with no threshold
+    gc.disable()
+    try:
+        info = {'generation': 0, 'collected': 1, 'uncollectable': 0}
+        garbage.callback('stop', info)
+        assert not garbage.collections
+
+        with trace.use_span(trace.INVALID_SPAN):
+            garbage.callback('start', info)
+            garbage.callback('stop', info)
+        assert len(garbage.collections) == 1
+
+        with patch('pytest_opentelemetry.garbage.tracer') as tracer:
+            garbage.record()
+        assert tracer.start_span.call_args.kwargs['context'] is None
+        assert not garbage.collections
+    finally:
+        gc.enable()
+        garbage.pytest_unconfigure(Mock())
+
+
+def test_quick_collections_are_ignored() -> None:
+    garbage = GarbageCollectionPlugin(Mock(), threshold_ms=60_000)
+    try:
+        info = {'generation': 0, 'collected': 1, 'uncollectable': 0}
+        garbage.callback('start', info)
+        garbage.callback('stop', info)
+        assert not garbage.collections
+    finally:
+        garbage.pytest_unconfigure(Mock())
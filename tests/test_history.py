@@ -0,0 +1,192 @@
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from unittest.mock import patch
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.history import DurationHistory, estimate
+
+TESTS = """
+    import time
+
+    def test_quick():
+        pass
+
+    def test_slow():
+        time.sleep(0.05)
+
+    def test_medium():
+        time.sleep(0.01)
+"""
+
+
+def test_durations_are_blended_with_history(tmp_path: Path) -> None:
+    history = DurationHistory(str(tmp_path / 'history.db'))
+    history.record([('a', 1.0), ('b', 2.0)])
+    history.record([('a', 2.0)])
+    history.record([('a', 2.0)])
+
+    assert history.durations() == {
+        'a': pytest.approx(1.0 + 0.3 * (2.0 - 1.0) + 0.3 * (2.0 - 1.3)),
+        'b': 2.0,
+    }
+
+    runs = dict(history.connection.execute('SELECT nodeid, runs FROM durations'))
+    assert runs == {'a': 3, 'b': 1}
+    history.close()
+
+
+def test_estimates() -> None:
+    assert estimate({'a': 1.0, 'b': 3.0}, ['a', 'c']) == {'a': 1.0, 'c': 2.0}
+    assert estimate({}, ['a']) == {'a': 1.0}
+
+
+def test_recording_history(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'history.db')
+    pytester.runpytest(f'--otel-history={path}').assert_outcomes(passed=3)
+    pytester.runpytest(f'--otel-history={path}').assert_outcomes(passed=3)
+
+    with sqlite3.connect(path) as connection:
+        rows = {
+            nodeid: (seconds, runs)
+            for nodeid, seconds, runs in connection.execute('SELECT * FROM durations')
+        }
+    assert set(rows) == {
+        'test_recording_history.py::test_quick',
+        'test_recording_history.py::test_slow',
+        'test_recording_history.py::test_medium',
+    }
+    assert rows['test_recording_history.py::test_slow'][0] >= 0.05
+    assert rows['test_recording_history.py::test_quick'][0] < 0.05
+    assert {runs for _, runs in rows.values()} == {2}
+
+
+def test_recording_in_batches(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'history.db')
+    batches: List[int] = []
+
+    def record(self: DurationHistory, durations: Iterable[Tuple[str, float]]):
+        batches.append(len(list(durations)))
+
+    with patch('pytest_opentelemetry.history.BATCH_SIZE', 2):
+        with patch.object(DurationHistory, 'record', record):
+            pytester.runpytest(f'--otel-history={path}').assert_outcomes(passed=3)
+
+    assert batches == [2, 1]
+
+
+def test_scheduling_longest_first(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'history.db')
+    history = DurationHistory(path)
+    history.record(
+        [
+            ('test_scheduling_longest_first.py::test_quick', 0.001),
+            ('test_scheduling_longest_first.py::test_slow', 10.0),
+        ]
+    )
+    history.close()
+
+    result = pytester.runpytest('-n', '1', '-v', f'--otel-history={path}')
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        [
+            '*PASSED test_scheduling_longest_first.py::test_slow*',
+            '*PASSED test_scheduling_longest_first.py::test_medium*',
+            '*PASSED test_scheduling_longest_first.py::test_quick*',
+        ]
+    )
+
+
+def workers_of(stdout: List[str]) -> Dict[str, str]:
+    workers = {}
+    for line in stdout:
+        if match := re.match(r'\[(gw\d+)\] .*PASSED .*::(test_\w+)', line):
+            workers[match.group(2)] = match.group(1)
+    return workers
+
+
+def test_longest_tests_are_spread_across_the_workers(pytester: Pytester) -> None:
+    pytester.makepyfile(
+        '\n'.join(
+            [
+                'def test_long_one(): pass',
+                'def test_long_two(): pass',
+                *(f'def test_short_{i}(): pass' for i in range(10)),
+            ]
+        )
+    )
+    path = str(pytester.path / 'history.db')
+    history = DurationHistory(path)
+    history.record(
+        [
+            (
+                'test_longest_tests_are_spread_across_the_workers.py::test_long_one',
+                10.0,
+            ),
+            (
+                'test_longest_tests_are_spread_across_the_workers.py::test_long_two',
+                10.0,
+            ),
+        ]
+    )
+    history.close()
+
+    # Each worker is first sent a chunk of two tests, and they can't both be long
+    result = pytester.runpytest('-n', '2', '-v', f'--otel-history={path}')
+    result.assert_outcomes(passed=12)
+    workers = workers_of(result.outlines)
+    assert len(workers) == 12
+    assert workers['test_long_one'] != workers['test_long_two']
+
+
+@pytest.mark.parametrize('tests', [0, 1, 3])
+def test_scheduling_only_a_few_tests(pytester: Pytester, tests: int) -> None:
+    pytester.makepyfile(
+        '\n'.join(f'def test_{i}(): pass' for i in range(tests)) or 'import os'
+    )
+    path = str(pytester.path / 'history.db')
+    result = pytester.runpytest('-n', '2', '-v', f'--otel-history={path}')
+    assert result.ret == (0 if tests else 5)
+    assert len(workers_of(result.outlines)) == tests
+
+
+def test_workers_with_different_tests_are_left_to_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(
+        """
+        import os
+        import pytest
+
+        @pytest.mark.parametrize('worker', [os.environ['PYTEST_XDIST_WORKER']])
+        def test_worker(worker):
+            pass
+    """
+    )
+    path = str(pytester.path / 'history.db')
+    result = pytester.runpytest('-n', '2', f'--otel-history={path}')
+    assert 'Different tests were collected between gw' in result.stdout.str()
+
+
+def test_other_dist_modes_are_left_alone(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    path = str(pytester.path / 'history.db')
+    history = DurationHistory(path)
+    history.record([('test_other_dist_modes_are_left_alone.py::test_medium', 10.0)])
+    history.close()
+
+    result = pytester.runpytest(
+        '-n', '1', '-v', '--dist=loadfile', f'--otel-history={path}'
+    )
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        [
+            '*PASSED test_other_dist_modes_are_left_alone.py::test_quick*',
+            '*PASSED test_other_dist_modes_are_left_alone.py::test_slow*',
+            '*PASSED test_other_dist_modes_are_left_alone.py::test_medium*',
+        ]
+    )
@@ -0,0 +1,114 @@
+from typing import Any, Dict, Generator, List, Tuple
+from unittest.mock import patch
+
+import pytest
+from _pytest.pytester import Pytester
+from _pytest.reports import TestReport
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from pytest_opentelemetry.metrics import MetricsPlugin
+
+
+@pytest.fixture
+def metric_reader() -> Generator[InMemoryMetricReader, None, None]:
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(metric_readers=[reader])
+    with patch(
+        'pytest_opentelemetry.metrics.get_meter_provider', return_value=provider
+    ):
+        yield reader
+    provider.shutdown()
+
+
+def histograms(
+    reader: InMemoryMetricReader,
+) -> Dict[str, List[Tuple[Dict[str, Any], Any]]]:
+    data = reader.get_metrics_data()
+    assert data
+    return {
+        metric.name: [
+            (dict(point.attributes or {}), point) for point in metric.data.data_points
+        ]
+        for resource_metrics in data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+def test_durations_are_recorded(
+    pytester: Pytester, metric_reader: InMemoryMetricReader
+) -> None:
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def shared():
+            return 1
+
+        @pytest.fixture
+        def fresh():
+            return 2
+
+        def test_one(shared, fresh):
+            pass
+
+        def test_two(shared, fresh):
+            pass
+
+        def test_three(shared):
+            assert False
+    """
+    )
+    result = pytester.runpytest('--otel-metrics', '--otel-detail=session')
+    result.assert_outcomes(passed=2, failed=1)
+
+    recorded = histograms(metric_reader)
+
+    tests = {
+        (labels['pytest.phase'], labels['pytest.outcome']): point.count
+        for labels, point in recorded['pytest.test.duration']
+    }
+    assert tests == {
+        ('setup', 'passed'): 3,
+        ('call', 'passed'): 2,
+        ('call', 'failed'): 1,
+        ('teardown', 'passed'): 3,
+    }
+    assert {
+        labels['pytest.module'] for labels, _ in recorded['pytest.test.duration']
+    } == {'test_durations_are_recorded.py'}
+
+    fixtures = {
+        (labels['pytest.fixture'], labels['pytest.fixture_scope']): point.count
+        for labels, point in recorded['pytest.fixture.duration']
+    }
+    assert fixtures[('shared', 'module')] == 1
+    assert fixtures[('fresh', 'function')] == 2
+
+
+def test_workers_leave_tests_to_the_controller(
+    pytester: Pytester, metric_reader: InMemoryMetricReader
+) -> None:
+    config = pytester.parseconfig('--otel-metrics')
+    setattr(config, 'workerinput', {'workerid': 'gw0'})
+
+    plugin = MetricsPlugin(config)
+    assert not plugin.records_tests
+
+    report = TestReport(
+        'test_one.py::test_one', ('', 0, ''), {}, 'passed', None, 'call'
+    )
+    plugin.pytest_runtest_logreport(report)
+
+    assert metric_reader.get_metrics_data() is None
+
+
+def test_providers_without_force_flush(pytester: Pytester) -> None:
+    config = pytester.parseconfig('--otel-metrics')
+    plugin = MetricsPlugin(config)
+    with patch(
+        'pytest_opentelemetry.metrics.get_meter_provider', return_value=object()
+    ):
+        plugin.pytest_unconfigure(config)
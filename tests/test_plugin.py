@@ -1,8 +1,14 @@
+from typing import List
+
+import pytest
 from _pytest.config import Config
+from _pytest.pytester import Pytester
 from packaging.version import Version
 
+import pytest_opentelemetry
 import pytest_opentelemetry.plugin
 from pytest_opentelemetry import __version__
+from pytest_opentelemetry.plugin import is_instrumented
 
 
 def test_version_is_sane() -> None:
@@ -15,3 +21,58 @@ def test_plugin_is_loaded(pytestconfig: Config) -> None:
     plugin = pytestconfig.pluginmanager.get_plugin('pytest_opentelemetry')
     assert plugin is pytest_opentelemetry.plugin
     assert plugin
+
+
+def test_unknown_attributes() -> None:
+    with pytest.raises(AttributeError):
+        pytest_opentelemetry.nope  # type: ignore[attr-defined]  # noqa: B018
+
+
+@pytest.mark.parametrize(
+    'args, instrumented',
+    [
+        pytest.param([], True, id='run'),
+        pytest.param(['--help'], False, id='help'),
+        pytest.param(['--fixtures'], False, id='fixtures'),
+        pytest.param(['--fixtures-per-test'], False, id='fixtures-per-test'),
+        pytest.param(['--markers'], False, id='markers'),
+        pytest.param(['--collect-only'], False, id='collect-only'),
+        pytest.param(
+            ['--collect-only', '--export-traces-file=traces.jsonl'],
+            True,
+            id='collect-only-exporting',
+        ),
+        pytest.param(
+            ['--collect-only', '--otel-chrome-trace=trace.json'],
+            True,
+            id='collect-only-chrome-trace',
+        ),
+    ],
+)
+def test_informational_invocations_are_not_instrumented(
+    pytester: Pytester, args: List[str], instrumented: bool
+) -> None:
+    config = pytester.parseconfig(*args)
+    assert is_instrumented(config) is instrumented
+
+
+def test_collect_only_does_not_import_opentelemetry(pytester: Pytester) -> None:
+    pytester.makepyfile(
+        """
+        def test_one():
+            pass
+    """
+    )
+    pytester.makeconftest(
+        """
+        import sys
+
+        def pytest_unconfigure(config):
+            assert 'pytest_opentelemetry.instrumentation' not in sys.modules
+            assert 'opentelemetry_container_distro' not in sys.modules
+    """
+    )
+    result = pytester.runpytest_subprocess('--collect-only', '-q')
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(['*1 test collected*'])
+    assert 'AssertionError' not in result.stderr.str()
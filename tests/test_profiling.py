@@ -0,0 +1,77 @@
+import time
+
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.profiling import StackSampler, collapse
+
+from . import SpanRecorder
+
+
+def test_profiling_slow_tests(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(
+        """
+        import time
+
+        def spin(seconds):
+            end = time.process_time() + seconds
+            while time.process_time() < end:
+                pass
+
+        def test_slow():
+            spin(0.2)
+
+        def test_fast():
+            pass
+    """
+    )
+    pytester.runpytest('--otel-profile=100').assert_outcomes(passed=2)
+
+    spans = span_recorder.spans_by_name()
+    slow = spans['test_profiling_slow_tests.py::test_slow::call'].attributes
+    assert slow
+    samples = slow['pytest.profile.samples']
+    assert isinstance(samples, int) and samples > 10
+    assert slow['pytest.profile.interval_seconds'] == 0.005
+
+    stacks = slow['pytest.profile.collapsed_stacks']
+    assert isinstance(stacks, str)
+    lines = stacks.splitlines()
+    stack, _, count = lines[0].rpartition(' ')
+    assert int(count) > 0
+    frames = stack.split(';')
+    assert frames[0].startswith('pytest_runtest_call (')
+    assert any(frame.startswith('test_slow (') for frame in frames)
+    assert frames[-1].startswith('spin (')
+    assert sum(int(line.rpartition(' ')[2]) for line in lines) == samples
+
+    fast = spans['test_profiling_slow_tests.py::test_fast::call'].attributes
+    assert fast
+    assert 'pytest.profile.samples' not in fast
+
+
+def test_collapsing_stacks() -> None:
+    outer, inner = StackSampler.start.__code__, StackSampler.sample.__code__
+    stacks = {
+        ((outer, 1), (inner, 2)): 3,
+        ((outer, 1),): 5,
+        ((inner, 7),): 1,
+    }
+    filename = outer.co_filename
+    assert collapse(stacks, limit=2).splitlines() == [
+        f'start ({filename}:1) 5',
+        f'start ({filename}:1);sample ({filename}:2) 3',
+    ]
+
+
+def test_sampling_whole_stacks() -> None:
+    sampler = StackSampler()
+    sampler.start()
+    end = time.process_time() + 0.05
+    while time.process_time() < end:
+        pass
+    sampler.stop()
+
+    assert sampler.samples
+    # Without an outermost frame, the stacks go all the way out through pytest
+    names = {code.co_name for stack in sampler.stacks for code, _ in stack}
+    assert {'test_sampling_whole_stacks', 'pytest_runtest_call', '_main'} <= names
@@ -2,13 +2,22 @@ import os
 import re
 import subprocess
 import tempfile
+from contextlib import contextmanager
 from typing import Generator
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
+from _pytest.config import Config
 from opentelemetry.sdk.resources import Resource
 
-from pytest_opentelemetry.resource import CodebaseResourceDetector
+from pytest_opentelemetry.resource import (
+    WORKERINPUT_KEY,
+    CodebaseResourceDetector,
+    find_git_directory,
+    read_git_revision,
+)
+
+from .test_sessions import environment
 
 
 @pytest.fixture
@@ -26,7 +35,7 @@ def bare_codebase() -> Generator[str, None, None]:
 
 @pytest.fixture
 def resource() -> Resource:
-    return CodebaseResourceDetector(Mock()).detect()
+    return CodebaseResourceDetector(Mock(spec=Config)).detect()
 
 
 def test_get_codebase_name() -> None:
@@ -54,25 +63,27 @@ def test_service_version_unknown(bare_codebase: str, resource: Resource) -> None
 
 
 def test_service_version_git_problems() -> None:
-    with patch(
-        'pytest_opentelemetry.resource.subprocess.check_output',
-        side_effect=[
-            b'true',
-            subprocess.CalledProcessError(128, ['git', 'rev-parse', 'HEAD']),
-        ],
-    ):
-        resource = CodebaseResourceDetector(Mock()).detect()
-        assert resource.attributes['service.version'] == (
-            "[unknown: Command '['git', 'rev-parse', 'HEAD']' "
-            "returned non-zero exit status 128.]"
-        )
-    with patch(
-        'pytest_opentelemetry.resource.subprocess.check_output', side_effect=[b'false']
-    ):
-        resource = CodebaseResourceDetector(Mock()).detect()
-        assert resource.attributes['service.version'] == (
-            "[unknown: not a git repository]"
-        )
+    with patch('pytest_opentelemetry.resource.read_git_revision', return_value=None):
+        with patch(
+            'pytest_opentelemetry.resource.subprocess.check_output',
+            side_effect=[
+                b'true',
+                subprocess.CalledProcessError(128, ['git', 'rev-parse', 'HEAD']),
+            ],
+        ):
+            resource = CodebaseResourceDetector(Mock(spec=Config)).detect()
+            assert resource.attributes['service.version'] == (
+                "[unknown: Command '['git', 'rev-parse', 'HEAD']' "
+                "returned non-zero exit status 128.]"
+            )
+        with patch(
+            'pytest_opentelemetry.resource.subprocess.check_output',
+            side_effect=[b'false'],
+        ):
+            resource = CodebaseResourceDetector(Mock(spec=Config)).detect()
+            assert resource.attributes['service.version'] == (
+                "[unknown: not a git repository]"
+            )
 
 
 @pytest.fixture
@@ -97,3 +108,138 @@ def test_service_version_from_git_revision(git_repo: str, resource: Resource) ->
     assert isinstance(version, str)
     assert len(version) == 40
     assert re.match(r'[\da-f]{40}', version)
+
+
+def git_output(*args: str) -> str:
+    return subprocess.check_output(['git', *args]).decode().strip()
+
+
+@contextmanager
+def without_git_subprocesses() -> Generator[None, None, None]:
+    with patch(
+        'pytest_opentelemetry.resource.subprocess.check_output',
+        side_effect=AssertionError('git should not be called'),
+    ):
+        yield
+
+
+def test_service_version_without_running_git(git_repo: str) -> None:
+    expected = git_output('rev-parse', 'HEAD')
+    with without_git_subprocesses():
+        assert CodebaseResourceDetector.get_codebase_version() == expected
+
+
+def test_service_version_from_subdirectory(git_repo: str) -> None:
+    expected = git_output('rev-parse', 'HEAD')
+    os.makedirs('tests/deeper')
+    os.chdir('tests/deeper')
+    with without_git_subprocesses():
+        assert CodebaseResourceDetector.get_codebase_version() == expected
+
+
+def test_service_version_from_packed_refs(git_repo: str) -> None:
+    expected = git_output('rev-parse', 'HEAD')
+    branch = git_output('symbolic-ref', 'HEAD')
+    os.system('git pack-refs --all --prune')
+    assert not os.path.exists(os.path.join('.git', branch))
+    with without_git_subprocesses():
+        assert CodebaseResourceDetector.get_codebase_version() == expected
+
+
+def test_service_version_with_detached_head(git_repo: str) -> None:
+    expected = git_output('rev-parse', 'HEAD')
+    os.system('git checkout --detach')
+    with without_git_subprocesses():
+        assert CodebaseResourceDetector.get_codebase_version() == expected
+
+
+def test_service_version_in_linked_worktree(git_repo: str) -> None:
+    first = git_output('rev-parse', 'HEAD')
+    with open('README.md', 'a', encoding='utf-8') as readme:
+        readme.write('more\n')
+    os.system('git commit --all --message="More"')
+    os.system(f'git worktree add ../worktree -b other {first}')
+    os.chdir('../worktree')
+    assert git_output('rev-parse', 'HEAD') == first
+
+    with without_git_subprocesses():
+        assert CodebaseResourceDetector.get_codebase_version() == first
+
+
+def test_service_version_falls_back_to_git(git_repo: str) -> None:
+    expected = git_output('rev-parse', 'HEAD')
+
+    # Something we don't understand, like the reftable format
+    with open('.git/HEAD', 'w', encoding='utf-8') as head:
+        head.write('ref: refs/heads/.invalid\n')
+    assert read_git_revision('.git') is None
+    with patch(
+        'pytest_opentelemetry.resource.subprocess.check_output',
+        side_effect=[b'true', expected.encode()],
+    ):
+        assert CodebaseResourceDetector.get_codebase_version() == expected
+
+    with environment(GIT_DIR=os.path.abspath('.git')), patch(
+        'pytest_opentelemetry.resource.subprocess.check_output',
+        side_effect=[b'true', b'from git'],
+    ):
+        assert CodebaseResourceDetector.get_codebase_version() == 'from git'
+
+
+def test_service_version_when_git_fails(bare_codebase: str) -> None:
+    with environment(GIT_DIR=os.path.join(bare_codebase, 'nowhere')):
+        assert CodebaseResourceDetector.get_codebase_version() == (
+            '[unknown: not a git repository]'
+        )
+
+
+def test_unreadable_git_directories(bare_codebase: str) -> None:
+    with open('.git', 'w', encoding='utf-8') as dot_git:
+        dot_git.write('not a gitdir pointer')
+    assert find_git_directory('.') is None
+
+    os.remove('.git')
+    os.makedirs('.git/refs/heads')
+    with open('.git/HEAD', 'w', encoding='utf-8') as head:
+        head.write('garbage')
+    assert read_git_revision('.git') is None
+
+    # symbolic refs that loop forever
+    with open('.git/HEAD', 'w', encoding='utf-8') as head:
+        head.write('ref: refs/heads/a')
+    with open('.git/refs/heads/a', 'w', encoding='utf-8') as ref:
+        ref.write('ref: refs/heads/a')
+    assert read_git_revision('.git') is None
+
+    with open('.git/packed-refs', 'w', encoding='utf-8') as packed:
+        packed.write(
+            '# pack-refs with: peeled fully-peeled sorted\n'
+            f'{"0" * 40} refs/heads/a\n'
+            f'{"1" * 40} refs/heads/b\n'
+            f'^{"2" * 40}\n'
+        )
+    with open('.git/HEAD', 'w', encoding='utf-8') as head:
+        head.write('ref: refs/heads/b')
+    assert read_git_revision('.git') == '1' * 40
+
+
+def test_workers_reuse_the_controllers_attributes() -> None:
+    config = Mock(spec=Config)
+    config.workerinput = {
+        WORKERINPUT_KEY: {'service.name': 'shared', 'service.version': 'abc123'}
+    }
+    with without_git_subprocesses():
+        resource = CodebaseResourceDetector(config).detect()
+    assert resource.attributes['service.name'] == 'shared'
+    assert resource.attributes['service.version'] == 'abc123'
+
+
+def test_workers_detect_their_own_attributes_if_the_controller_didnt() -> None:
+    controller = CodebaseResourceDetector(Mock(spec=Config))
+    assert controller.attributes == {}
+
+    config = Mock(spec=Config)
+    config.inicfg = {'junit_suite_name': 'my-project'}
+    config.workerinput = {WORKERINPUT_KEY: controller.attributes}
+    resource = CodebaseResourceDetector(config).detect()
+    assert resource.attributes['service.name'] == 'my-project'
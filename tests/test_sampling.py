@@ -0,0 +1,149 @@
+from unittest.mock import Mock, patch
+
+from _pytest.pytester import Pytester
+from opentelemetry import trace
+
+from pytest_opentelemetry.processors import add_span_processor
+from pytest_opentelemetry.sampling import TailSamplingSpanProcessor
+
+from . import SpanRecorder
+
+
+def test_only_slow_or_failing_tests_are_exported(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+
+        import pytest
+        from opentelemetry import trace
+
+        tracer = trace.get_tracer('inside')
+
+        @pytest.fixture
+        def sleepy():
+            time.sleep(0.1)
+
+        def test_fast():
+            with tracer.start_as_current_span('inside fast'):
+                pass
+
+        def test_slow():
+            with tracer.start_as_current_span('inside slow'):
+                time.sleep(0.1)
+
+        def test_slow_fixture(sleepy):
+            pass
+
+        def test_failing():
+            with tracer.start_as_current_span('inside failing'):
+                assert False
+    """
+    )
+    pytester.runpytest('--otel-min-duration=50').assert_outcomes(passed=3, failed=1)
+
+    spans = span_recorder.spans_by_name()
+    assert 'test run' in spans
+
+    prefix = 'test_only_slow_or_failing_tests_are_exported.py'
+    assert f'{prefix}::test_fast' not in spans
+    assert f'{prefix}::test_fast::call' not in spans
+    assert 'inside fast' not in spans
+
+    for test in ('test_slow', 'test_slow_fixture', 'test_failing'):
+        assert f'{prefix}::{test}' in spans
+        assert f'{prefix}::{test}::setup' in spans
+        assert f'{prefix}::{test}::call' in spans
+        assert f'{prefix}::{test}::teardown' in spans
+
+    assert 'inside slow' in spans
+    assert 'inside failing' in spans
+    assert 'sleepy setup' in spans
+
+
+def test_sampler_is_removed_after_the_run(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    multi = getattr(trace.get_tracer_provider(), '_active_span_processor')
+    before = multi._span_processors
+
+    pytester.makepyfile(
+        """
+        def test_fast():
+            pass
+    """
+    )
+    pytester.runpytest('--otel-min-duration=50').assert_outcomes(passed=1)
+
+    assert multi._span_processors == before
+    assert 'test run' in span_recorder.spans_by_name()
+
+
+def test_sampling_under_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(
+        """
+        def test_fast():
+            pass
+
+        def test_failing():
+            assert False
+    """
+    )
+    result = pytester.runpytest('-n', '2', '--otel-min-duration=5')
+    result.assert_outcomes(passed=1, failed=1)
+    assert 'INTERNALERROR' not in result.stdout.str()
+
+
+def test_sampler_passes_through_to_its_processors() -> None:
+    processor = Mock()
+    sampler = TailSamplingSpanProcessor([processor])
+
+    span = Mock()
+    sampler.on_start(span)
+    processor.on_start.assert_called_once_with(span, parent_context=None)
+
+    sampler.on_end(span)
+    processor.on_end.assert_called_once_with(span)
+
+    listener = Mock()
+    sampler.drop_listeners.append(listener)
+    sampler.start_holding()
+    sampler.on_end(span)
+    sampler.stop_holding(keep=False)
+    assert processor.on_end.call_count == 1
+    listener.assert_called_once_with([span])
+
+    processor.force_flush.return_value = True
+    assert sampler.force_flush() is True
+
+    sampler.shutdown()
+    processor.shutdown.assert_called_once_with()
+
+
+@patch.object(trace, 'get_tracer_provider')
+def test_sampler_requires_an_sdk_provider(mock_get_tracer_provider) -> None:
+    mock_get_tracer_provider.return_value = Mock(spec=trace.ProxyTracerProvider)
+    assert TailSamplingSpanProcessor.install() is None
+
+
+@patch.object(trace, 'get_tracer_provider')
+def test_adding_processors_requires_an_sdk_provider(mock_get_tracer_provider) -> None:
+    mock_get_tracer_provider.return_value = Mock(spec=trace.ProxyTracerProvider)
+    assert add_span_processor(Mock()) is False
+
+
+def test_everything_is_exported_without_an_sdk_provider(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        def test_fast():
+            pass
+    """
+    )
+    with patch.object(TailSamplingSpanProcessor, 'install', return_value=None):
+        pytester.runpytest('--otel-min-duration=50').assert_outcomes(passed=1)
+
+    spans = span_recorder.spans_by_name()
+    assert 'test_everything_is_exported_without_an_sdk_provider.py::test_fast' in spans
@@ -0,0 +1,170 @@
+import json
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.scopes import (
+    FixtureSetups,
+    ScopeAnalysisPlugin,
+    widest_scope,
+)
+
+TESTS = """
+    import time
+    import pytest
+
+    @pytest.fixture
+    def database():
+        time.sleep(0.02)
+
+    @pytest.fixture(scope='module')
+    def schema():
+        time.sleep(0.02)
+
+    @pytest.fixture
+    def scratch(tmp_path, schema, database):
+        time.sleep(0.01)
+
+    @pytest.fixture(params=[1, 2])
+    def number(request):
+        return request.param
+
+    @pytest.fixture(scope='class')
+    def thing():
+        pass
+
+    class TestThings:
+        def test_thing(self, thing, number):
+            pass
+
+    def test_one(database, schema, scratch):
+        pass
+
+    def test_two(database, schema, scratch):
+        pass
+
+    def test_three(database):
+        pass
+"""
+
+
+def read_report(pytester: Pytester, *args: str) -> List[Dict[str, Any]]:
+    path = pytester.path / 'scopes.json'
+    pytester.makepyfile(test_fixtures=TESTS)
+    pytester.makepyfile(test_others='def test_other(schema): pass')
+    pytester.makeconftest(
+        """
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def schema():
+            pass
+    """
+    )
+    result = pytester.runpytest(f'--otel-scope-report-json={path}', *args)
+    result.assert_outcomes(passed=6)
+    return json.loads(path.read_text())['fixtures']
+
+
+def test_scope_report(pytester: Pytester) -> None:
+    report = read_report(pytester)
+    fixtures = {fixture['fixture']: fixture for fixture in report}
+    assert report[0]['fixture'] == 'database'
+    assert 'tmp_path' not in fixtures
+
+    database = fixtures['database']
+    assert database['location'] == 'test_fixtures.py:4'
+    assert database['scope'] == 'function'
+    assert database['setups'] == 3
+    assert database['seconds'] >= 0.06
+    assert database['widest_scope'] == 'session'
+    assert database['limited_by'] == []
+    savings = database['savings_seconds']
+    assert savings['module'] == pytest.approx(database['seconds'] * 2 / 3)
+    assert savings['session'] == savings['module']
+
+    scratch = fixtures['scratch']
+    assert scratch['widest_scope'] == 'function'
+    assert scratch['limited_by'] == ['tmp_path', 'database']
+    assert scratch['savings_seconds']['module'] > 0
+
+    # The module-scoped schema in the test module, and the one in the conftest
+    schemas = {f['location']: f for f in report if f['fixture'] == 'schema'}
+    assert set(schemas) == {'test_fixtures.py:8', 'conftest.py:3'}
+    for schema in schemas.values():
+        assert schema['setups'] == 1
+        assert schema['savings_seconds'] == {'module': None, 'session': 0.0}
+
+    # Each parameter needs its own setup, even with a wider scope
+    number = fixtures['number']
+    assert number['setups'] == 2
+    assert number['savings_seconds'] == {'module': 0.0, 'session': 0.0}
+
+
+def test_scope_report_in_the_terminal(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-scope-report')
+    result.assert_outcomes(passed=5)
+    result.stdout.fnmatch_lines(
+        [
+            '*= fixture setups saved by wider scopes =*',
+            'setups      total     module    session  scope     fixture',
+            '     3 * function  database (test_scope_report_in_the_terminal.py:4)',
+            '     2 * function  scratch (*); tmp_path, database limits it to function',
+        ]
+    )
+    assert 'number' not in result.stdout.str()
+    assert 'tmp_path (' not in result.stdout.str()
+
+
+def test_scope_report_without_repeated_setups(pytester: Pytester) -> None:
+    pytester.makepyfile('def test_one(tmp_path): pass')
+    result = pytester.runpytest('--otel-scope-report')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['(no fixture was set up more than once)'])
+
+
+def test_scope_report_under_xdist(pytester: Pytester) -> None:
+    fixtures = {f['fixture']: f for f in read_report(pytester, '-n', '2')}
+    assert fixtures['database']['setups'] == 3
+    assert fixtures['number']['setups'] == 2
+
+
+def test_savings_of_package_fixtures() -> None:
+    fixture = FixtureSetups('shared', 'conftest.py:1', 'package', 'session', [])
+    fixture.add('module', ('', 'a.py', '0'), 1, 1.0)
+    fixture.add('session', ('', '0'), 1, 1.0)
+    fixture.add('module', ('', 'b.py', '0'), 1, 3.0)
+    fixture.add('session', ('', '0'), 1, 3.0)
+    assert fixture.saving('module') is None
+    assert fixture.saving('session') == 2.0
+    assert fixture.best_saving() == 2.0
+
+
+def test_workers_setups_are_merged() -> None:
+    worker = ScopeAnalysisPlugin(
+        Mock(workerinput={'workerid': 'gw0'}), Mock(), True, None
+    )
+    fixture = worker.fixtures['thing here.py:1'] = FixtureSetups(
+        'thing', 'here.py:1', 'function', 'session', []
+    )
+    fixture.add('module', ('gw0', 'here.py', '0'), 2, 1.0)
+    fixture.add('session', ('gw0', '0'), 2, 1.0)
+
+    controller = ScopeAnalysisPlugin(Mock(spec=['rootpath']), Mock(), True, None)
+    for dumped in (worker.dump(), worker.dump(), None):
+        controller.pytest_testnodedown(
+            Mock(workeroutput={'pytest_opentelemetry.scopes': dumped}), None
+        )
+
+    merged = controller.fixtures['thing here.py:1']
+    assert merged.setups == 4
+    assert merged.groups['module'] == {('gw0', 'here.py', '0'): [4, 2.0]}
+    assert merged.saving('session') == 1.5
+
+
+def test_widest_scope_without_pytest_internals() -> None:
+    fixturedef = Mock(argnames=('request', 'tmp_path'))
+    assert widest_scope(fixturedef, Mock(spec=[])) == ('session', [])
@@ -0,0 +1,181 @@
+import io
+from argparse import ArgumentTypeError
+from pathlib import Path
+from typing import List
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.history import DurationHistory
+from pytest_opentelemetry.plugin import parse_shard
+from pytest_opentelemetry.sharding import main, module_costs, plan
+
+MODULES = {
+    'test_big': """
+        def test_one():
+            pass
+
+        def test_two():
+            pass
+    """,
+    'test_medium': """
+        def test_one():
+            pass
+    """,
+    'test_small': """
+        def test_one():
+            pass
+
+        def test_two():
+            pass
+
+        def test_three():
+            pass
+    """,
+}
+
+HISTORY = [
+    ('test_big.py::test_one', 5.0),
+    ('test_big.py::test_two', 5.0),
+    ('test_medium.py::test_one', 6.0),
+    ('test_small.py::test_one', 1.0),
+    ('test_small.py::test_two', 1.0),
+]
+
+
+def write_history(path: Path) -> str:
+    history = DurationHistory(str(path))
+    history.record(HISTORY)
+    history.close()
+    return str(path)
+
+
+def test_parsing_shards() -> None:
+    assert parse_shard('1/4') == (1, 4)
+    assert parse_shard('4/4') == (4, 4)
+    for invalid in ('1', 'a/b', '0/4', '5/4', '/'):
+        with pytest.raises(ArgumentTypeError):
+            parse_shard(invalid)
+
+
+def test_planning() -> None:
+    costs = module_costs(dict(HISTORY))
+    assert costs == {'test_big.py': 10.0, 'test_medium.py': 6.0, 'test_small.py': 2.0}
+    assert plan(costs, 2) == [['test_big.py'], ['test_medium.py', 'test_small.py']]
+    assert plan(costs, 4) == [
+        ['test_big.py'],
+        ['test_medium.py'],
+        ['test_small.py'],
+        [],
+    ]
+    assert plan({'b': 1.0, 'a': 1.0, 'c': 1.0}, 2) == [['a', 'c'], ['b']]
+
+
+def test_sharding(pytester: Pytester) -> None:
+    pytester.makepyfile(**MODULES)
+    history = write_history(pytester.path / 'history.db')
+
+    first = pytester.runpytest('-v', '--otel-shard=1/2', f'--otel-history={history}')
+    first.assert_outcomes(passed=2, deselected=4)
+    first.stdout.fnmatch_lines(['shard 1/2: 1 modules, expected 10.0s'])
+    first.stdout.fnmatch_lines(['test_big.py::test_one PASSED*'])
+
+    # Each run adds to the history, so start the second shard from the same history
+    history = write_history(pytester.path / 'second.db')
+
+    # test_small.py::test_three has no history, so it's assumed to be average
+    second = pytester.runpytest('-v', '--otel-shard=2/2', f'--otel-history={history}')
+    second.assert_outcomes(passed=4, deselected=2)
+    second.stdout.fnmatch_lines(['shard 2/2: 2 modules, expected 11.6s'])
+
+
+def test_sharding_without_history(pytester: Pytester) -> None:
+    pytester.makepyfile(**MODULES)
+    pytester.runpytest('--otel-shard=1/3').assert_outcomes(passed=3, deselected=3)
+    pytester.runpytest('--otel-shard=2/3').assert_outcomes(passed=2, deselected=4)
+    pytester.runpytest('--otel-shard=3/3').assert_outcomes(passed=1, deselected=5)
+
+
+def test_one_shard_runs_everything(pytester: Pytester) -> None:
+    pytester.makepyfile(**MODULES)
+    pytester.runpytest('--otel-shard=1/1').assert_outcomes(passed=6)
+
+
+@pytest.mark.parametrize(
+    'paths, exit_code',
+    [
+        ([], pytest.ExitCode.NO_TESTS_COLLECTED),
+        (['missing.py'], pytest.ExitCode.USAGE_ERROR),
+    ],
+)
+def test_sharding_nothing(
+    pytester: Pytester, paths: List[str], exit_code: pytest.ExitCode
+) -> None:
+    result = pytester.runpytest('--otel-shard=1/2', *paths)
+    assert result.ret == exit_code
+    result.stdout.fnmatch_lines(['shard 1/2: 0 modules, expected 0.0s'])
+
+
+def test_invalid_shards(pytester: Pytester) -> None:
+    result = pytester.runpytest('--otel-shard=3/2')
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(['*--otel-shard: expected 1 <= K <= N, not *3/2*'])
+
+
+def test_planning_command(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    main([write_history(tmp_path / 'history.db'), '2'])
+    assert capsys.readouterr().out.splitlines() == [
+        '  shard  modules  tests   seconds',
+        '    1/2        1      2      10.0',
+        '    2/2        2      3       8.0',
+        'makespan 10.0s, ideal 9.0s, serial 18.0s',
+    ]
+
+
+def test_planning_command_with_the_collected_tests(
+    pytester: Pytester, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytester.makepyfile(**MODULES)
+    history = write_history(pytester.path / 'history.db')
+    collected = pytester.runpytest('--collect-only', '-q').stdout.str()
+    (pytester.path / 'tests.txt').write_text(collected)
+    capsys.readouterr()
+
+    # test_small.py::test_three isn't in the history, so like --otel-shard, it's
+    # assumed to be average
+    expected = [
+        '  shard  modules  tests   seconds',
+        '    1/2        1      2      10.0',
+        '    2/2        2      4      11.6',
+        'makespan 11.6s, ideal 10.8s, serial 21.6s',
+    ]
+    main([history, '2', '--collected', str(pytester.path / 'tests.txt')])
+    assert capsys.readouterr().out.splitlines() == expected
+
+    # The list of tests alone, without pytest's count of them, works too
+    tests = collected.split('\n\n')[0]
+    monkeypatch.setattr('sys.stdin', io.StringIO(tests))
+    main([history, '2', '--collected', '-'])
+    assert capsys.readouterr().out.splitlines() == expected
+
+
+def test_planning_command_errors(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    history = write_history(tmp_path / 'history.db')
+    empty = tmp_path / 'empty.db'
+    DurationHistory(str(empty)).close()
+    nothing = tmp_path / 'nothing.txt'
+    nothing.write_text('\nno tests collected in 0.01s\n')
+
+    for argv, error in (
+        ([history, '0'], 'there must be at least one shard'),
+        ([str(tmp_path / 'missing.db'), '2'], 'missing.db does not exist'),
+        ([str(empty), '2'], 'empty.db has no test durations'),
+        (
+            [history, '2', '--collected', str(tmp_path / 'missing.txt')],
+            'missing.txt does not exist',
+        ),
+        ([history, '2', '--collected', str(nothing)], 'nothing.txt has no tests'),
+    ):
+        with pytest.raises(SystemExit):
+            main(argv)
+        assert error in capsys.readouterr().err
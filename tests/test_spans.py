@@ -1,10 +1,13 @@
 from collections import Counter
-from typing import List
+from typing import List, Set
+from unittest.mock import Mock
 
 import pytest
 from _pytest.pytester import Pytester
 from opentelemetry.trace import SpanKind
 
+from pytest_opentelemetry.instrumentation import FixtureSpansPlugin
+
 from . import SpanRecorder
 
 
@@ -364,6 +367,119 @@ def test_spans_cover_setup_and_teardown(
     assert spans['returned teardown'].parent.span_id == teardown.context.span_id
 
 
+def test_fixture_teardown_spans_are_precise(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def database():
+            yield
+            time.sleep(0.05)
+
+        @pytest.fixture
+        def connection(database, request):
+            request.addfinalizer(lambda: time.sleep(0.05))
+
+        def test_one(connection):
+            pass
+
+        def test_failing(connection):
+            assert False
+
+        def test_never_run(connection):
+            pass
+    """
+    )
+    pytester.runpytest('-x').assert_outcomes(passed=1, failed=1)
+
+    spans = span_recorder.finished_spans()
+    connections = [span for span in spans if span.name == 'connection teardown']
+    assert len(connections) == 2
+    (database,) = [span for span in spans if span.name == 'database teardown']
+
+    for span in connections + [database]:
+        assert span.start_time and span.end_time
+        assert (span.end_time - span.start_time) / 1e9 >= 0.05
+        assert span.attributes
+        assert span.attributes['pytest.span_type'] == 'fixture'
+
+    # Each teardown ended before the next one started, so none of them covers the
+    # time of another
+    teardowns = connections + [database]
+    for earlier, later in zip(teardowns, teardowns[1:]):
+        assert earlier.end_time and later.start_time
+        assert earlier.end_time <= later.start_time
+
+
+def test_fixture_finalizers_have_their_own_spans(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import pytest
+
+        def close():
+            pass
+
+        def fail():
+            raise RuntimeError('oops')
+
+        @pytest.fixture
+        def connection(request):
+            request.addfinalizer(close)
+            request.addfinalizer(fail)
+            yield
+
+        @pytest.fixture
+        def cursor(connection):
+            pass
+
+        def test_one(cursor):
+            pass
+    """
+    )
+    pytester.runpytest().assert_outcomes(passed=1, errors=1)
+
+    spans = span_recorder.finished_spans()
+    (teardown,) = [span for span in spans if span.name == 'connection teardown']
+    finalizers = [span for span in spans if span.name == 'connection finalizer']
+
+    # They ran last-in, first-out, each in its own span within the fixture's teardown,
+    # and the cursor's teardown isn't one of them
+    assert [(span.attributes or {})['code.function'] for span in finalizers] == [
+        'connection',
+        'fail',
+        'close',
+    ]
+    for span in finalizers:
+        assert span.parent and span.parent.span_id == teardown.context.span_id
+        assert (span.attributes or {})['pytest.span_type'] == 'finalizer'
+    assert [span.status.is_ok for span in finalizers] == [True, False, True]
+    assert not [span for span in spans if span.name == 'cursor finalizer']
+
+
+def test_fixture_finalizers_without_pytest_internals(
+    span_recorder: SpanRecorder,
+) -> None:
+    otel_plugin = Mock()
+    otel_plugin._attributes_from_fixturedef.return_value = {}
+    plugin = FixtureSpansPlugin(otel_plugin)
+    fixturedef = Mock(spec=['addfinalizer'])
+    for _ in plugin.pytest_fixture_setup(fixturedef, Mock()):
+        pass
+    fixturedef.addfinalizer.assert_called_once()
+
+
+def test_fixture_teardowns_without_spans() -> None:
+    plugin = FixtureSpansPlugin(Mock())
+    plugin.pytest_fixture_post_finalizer(Mock(), Mock())
+    assert not plugin._teardowns
+
+
 def test_spans_cover_fixtures_at_different_scopes(
     pytester: Pytester, span_recorder: SpanRecorder
 ) -> None:
@@ -529,3 +645,193 @@ def test_parametrized_fixture_names(
     assert 'unstringable[0] teardown' in spans
     assert 'unstringable[1] setup' in spans
     assert 'unstringable[1] teardown' in spans
+
+
+@pytest.mark.parametrize(
+    'detail, expected',
+    [
+        pytest.param('session', set(), id='session'),
+        pytest.param('test', {'collection', 'test'}, id='test'),
+        pytest.param(
+            'phase', {'collection', 'test', 'setup', 'call', 'teardown'}, id='phase'
+        ),
+        pytest.param(
+            'fixture',
+            {
+                'collection',
+                'test',
+                'setup',
+                'call',
+                'teardown',
+                'fixture setup',
+                'fixture teardown',
+            },
+            id='fixture',
+        ),
+    ],
+)
+def test_detail_levels(
+    pytester: Pytester, span_recorder: SpanRecorder, detail: str, expected: Set[str]
+) -> None:
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture
+        def number() -> int:
+            return 1
+
+        def test_one(number: int):
+            assert number == 1
+
+        def test_two(number: int):
+            assert number == 2
+    """
+    )
+    result = pytester.runpytest(f'--otel-detail={detail}')
+    result.assert_outcomes(passed=1, failed=1)
+
+    spans = span_recorder.spans_by_name()
+    assert not spans['test run'].status.is_ok
+
+    kinds = {
+        'collection': 'collection',
+        'test_detail_levels.py::test_one': 'test',
+        'test_detail_levels.py::test_one::setup': 'setup',
+        'test_detail_levels.py::test_one::call': 'call',
+        'test_detail_levels.py::test_one::teardown': 'teardown',
+        'number setup': 'fixture setup',
+        'number teardown': 'fixture teardown',
+    }
+    assert {kind for name, kind in kinds.items() if name in spans} == expected
+
+    if 'test' in expected:
+        assert not spans['test_detail_levels.py::test_two'].status.is_ok
+
+
+def test_attributes_are_cached_only_while_tests_run(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makeconftest(
+        """
+        import pytest
+        from pytest_opentelemetry.instrumentation import PerTestOpenTelemetryPlugin
+
+        @pytest.fixture
+        def otel(request):
+            return next(
+                plugin
+                for plugin in request.config.pluginmanager.get_plugins()
+                if isinstance(plugin, PerTestOpenTelemetryPlugin)
+            )
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture
+        def number() -> int:
+            return 1
+
+        def test_one(request, otel, number):
+            assert list(otel.item_attributes) == [request.node]
+            names = {fixturedef.argname for fixturedef in otel.fixturedef_attributes}
+            assert names == {"otel", "number"}
+
+        def test_two(request, otel, number):
+            assert list(otel.item_attributes) == [request.node]
+            names = {fixturedef.argname for fixturedef in otel.fixturedef_attributes}
+            assert names == {"otel", "number"}
+    """
+    )
+    pytester.runpytest().assert_outcomes(passed=2)
+
+    spans = span_recorder.spans_by_name()
+    prefix = 'test_attributes_are_cached_only_while_tests_run.py::test_two'
+    test = spans[prefix]
+    for phase in ('setup', 'call', 'teardown'):
+        assert spans[f'{prefix}::{phase}'].attributes == test.attributes
+
+
+def test_collection_spans(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(
+        test_heavy="""
+        import time
+
+        time.sleep(0.05)
+
+        def test_one():
+            pass
+
+        def test_two():
+            pass
+    """,
+        test_broken="""
+        import no_such_module
+    """,
+        test_skipped="""
+        import pytest
+
+        print('running test_skipped.py')
+        pytest.skip('not here', allow_module_level=True)
+    """,
+    )
+    pytester.maketxtfile(
+        test_doctests="""
+        >>> 1 + 1
+        2
+    """
+    )
+    result = pytester.runpytest('--doctest-glob=*.txt', '-s')
+    result.assert_outcomes(errors=1, skipped=1)
+
+    # Each module is only imported once, as it would be without the plugin
+    assert result.stdout.str().count('running test_skipped.py') == 1
+
+    spans = span_recorder.spans_by_name()
+    run = spans['test run']
+    collection = spans['collection']
+    assert collection.parent
+    assert collection.parent.span_id == run.context.span_id
+    assert collection.attributes
+    assert collection.attributes['pytest.span_type'] == 'collection'
+
+    collect = spans['test_heavy.py collect']
+    assert collect.parent
+    assert collect.parent.span_id == collection.context.span_id
+    assert collect.attributes
+    assert collect.attributes['pytest.collected'] == 2
+    assert collect.status.is_ok
+
+    imported = spans['test_heavy.py import']
+    assert imported.parent
+    assert imported.parent.span_id == collect.context.span_id
+    assert imported.end_time and imported.start_time
+    assert imported.end_time - imported.start_time >= 50_000_000
+
+    assert not spans['test_broken.py collect'].status.is_ok
+    assert not spans['test_broken.py import'].status.is_ok
+    assert spans['test_skipped.py import'].status.is_ok
+
+    assert spans['test_doctests.txt collect'].status.is_ok
+    assert 'test_doctests.txt import' not in spans
+
+
+def test_collected_tests_are_counted(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        def test_one():
+            pass
+
+        def test_two():
+            pass
+    """
+    )
+    pytester.runpytest().assert_outcomes(passed=2)
+
+    collection = span_recorder.spans_by_name()['collection']
+    assert collection.attributes
+    assert collection.attributes['pytest.collected'] == 2
@@ -0,0 +1,186 @@
+import os
+from pathlib import Path
+
+from _pytest.pytester import Pytester
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import Link, StatusCode
+
+from pytest_opentelemetry.spool import (
+    LENGTH,
+    Spool,
+    SpoolSpanProcessor,
+    read_records,
+    recover,
+)
+
+from . import SpanRecorder
+
+
+def test_crashed_workers_spans_are_recovered(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import os
+        from opentelemetry import trace
+
+        def test_passing():
+            pass
+
+        def test_crashing():
+            with trace.get_tracer('inside').start_as_current_span('inside'):
+                pass
+            os._exit(1)
+    """
+    )
+    span_recorder.clear()
+    result = pytester.runpytest('--otel-spool', '-n', '2')
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(['*recovered * spans of crashed worker gw*'])
+
+    spans = span_recorder.spans_by_name()
+    assert 'inside' in spans
+    crashed = spans['test_crashed_workers_spans_are_recovered.py::test_crashing']
+    assert crashed.status.status_code is StatusCode.ERROR
+    assert crashed.status.description
+    assert crashed.status.description.endswith('crashed')
+    assert crashed.attributes
+    assert crashed.attributes['pytest.outcome'] == 'crashed'
+    assert crashed.resource.attributes['service.name']
+
+    call = spans['test_crashed_workers_spans_are_recovered.py::test_crashing::call']
+    assert call.status.status_code is StatusCode.ERROR
+    assert call.parent
+    assert call.parent.span_id == crashed.context.span_id
+
+    inside = spans['inside']
+    assert inside.status.status_code is StatusCode.UNSET
+    assert inside.parent
+    assert inside.parent.span_id == call.context.span_id
+    assert inside.end_time and call.end_time and inside.end_time <= call.end_time
+
+
+def test_dropped_spans_of_crashed_workers_arent_recovered(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import os
+        from opentelemetry import trace
+
+        def test_passing():
+            with trace.get_tracer('inside').start_as_current_span('dropped'):
+                pass
+
+        def test_crashing():
+            with trace.get_tracer('inside').start_as_current_span('kept'):
+                pass
+            os._exit(1)
+    """
+    )
+    span_recorder.clear()
+    result = pytester.runpytest('--otel-spool', '--otel-min-duration=10000', '-n', '1')
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(['*recovered * spans of crashed worker gw0*'])
+
+    # The passing test was fast, so the tail sampler dropped its spans, but the
+    # spans of the test that crashed are recovered even though they were held
+    spans = span_recorder.spans_by_name()
+    prefix = 'test_dropped_spans_of_crashed_workers_arent_recovered.py'
+    assert 'dropped' not in spans
+    assert f'{prefix}::test_passing' not in spans
+    assert 'kept' in spans
+    assert spans[f'{prefix}::test_crashing'].status.status_code is StatusCode.ERROR
+
+
+def test_dropped_spans_are_noted_in_the_spool(tmp_path: Path) -> None:
+    path = str(tmp_path / 'worker.spool')
+    span_processor = SpoolSpanProcessor(path)
+    provider = TracerProvider()
+    provider.add_span_processor(span_processor)
+    tracer = provider.get_tracer('spooled')
+
+    with tracer.start_as_current_span('dropped') as dropped:
+        pass
+    with tracer.start_as_current_span('kept'):
+        pass
+    span_processor.drop([dropped])  # type: ignore
+    span_processor.drop([])
+
+    assert [span.name for span in recover(path, 'crashed')] == ['kept']
+    provider.shutdown()
+
+
+def test_the_spool_is_started_over_when_flushed(tmp_path: Path) -> None:
+    path = str(tmp_path / 'worker.spool')
+    span_processor = SpoolSpanProcessor(path)
+    provider = TracerProvider(resource=Resource({'service.name': 'spooled'}))
+    provider.add_span_processor(span_processor)
+    tracer = provider.get_tracer('spooled')
+
+    test = tracer.start_span('test', attributes={'pytest.span_type': 'test'})
+    with tracer.start_as_current_span('before') as before:
+        before.add_event('happened', {'a': 1})
+    provider.force_flush()
+    with tracer.start_as_current_span('after'):
+        pass
+
+    spans = {span.name: span for span in recover(path, 'crashed')}
+    assert set(spans) == {'test', 'after'}
+    assert spans['test'].status.status_code is StatusCode.ERROR
+    assert spans['test'].resource.attributes['service.name'] == 'spooled'
+    assert spans['after'].status.status_code is StatusCode.UNSET
+
+    test.end()
+    provider.shutdown()
+    assert not os.path.exists(path)
+
+
+def test_events_and_links_are_recovered(tmp_path: Path) -> None:
+    path = str(tmp_path / 'worker.spool')
+    span_processor = SpoolSpanProcessor(path)
+    provider = TracerProvider()
+    provider.add_span_processor(span_processor)
+    tracer = provider.get_tracer('spooled')
+
+    with tracer.start_as_current_span('linked') as linked:
+        pass
+    links = [Link(linked.get_span_context())]
+    with tracer.start_as_current_span('span', links=links) as span:
+        span.add_event('happened', {'a': 1})
+        span.set_status(StatusCode.ERROR, 'failed')
+
+    spans = {span.name: span for span in recover(path, 'crashed')}
+    recovered = spans['span']
+    assert recovered.status.description == 'failed'
+    (event,) = recovered.events
+    assert event.name == 'happened'
+    assert event.attributes == {'a': 1}
+    (link,) = recovered.links
+    assert link.context.span_id == linked.get_span_context().span_id
+    provider.shutdown()
+
+
+def test_the_spool_grows(tmp_path: Path) -> None:
+    path = str(tmp_path / 'spool')
+    spool = Spool(path, size=16)
+    for index in range(10):
+        spool.append(b'{"index":%d}' % index)
+    spool.close()
+    assert [record['index'] for record in read_records(path)] == list(range(10))
+
+
+def test_records_cut_off_by_a_crash_are_never_read(tmp_path: Path) -> None:
+    path = str(tmp_path / 'spool')
+    spool = Spool(path, size=64)
+    spool.append(b'{"index":0}')
+    # The crash came after the bytes of the record, but before its length
+    start = spool.offset + LENGTH.size
+    spool.map[start : start + 11] = b'{"index":1}'
+    spool.close()
+    assert read_records(path) == [{'index': 0}]
+
+    with open(path, 'wb') as file:
+        file.write(LENGTH.pack(11) + b'{"index":0}')
+    assert read_records(path) == [{'index': 0}]
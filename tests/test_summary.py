@@ -0,0 +1,121 @@
+from unittest.mock import Mock
+
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.summary import SummaryPlugin, SummarySpanProcessor
+
+TESTS = """
+    import time
+    import pytest
+    from opentelemetry import trace
+
+    @pytest.fixture(scope='session')
+    def database():
+        with trace.get_tracer('tests').start_as_current_span('migrate'):
+            time.sleep(0.1)
+
+    @pytest.fixture
+    def connection(database):
+        time.sleep(0.01)
+
+    @pytest.mark.parametrize('n', range(3))
+    def test_queries(connection, n):
+        time.sleep(0.01 * n)
+
+    def test_slow():
+        time.sleep(0.1)
+"""
+
+
+def test_summary(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-summary=2')
+    result.assert_outcomes(passed=4)
+
+    lines = result.outlines
+    tests = lines.index(next(line for line in lines if 'slowest 2 test calls' in line))
+    assert lines[tests + 1].endswith('test_summary.py::test_slow')
+    assert lines[tests + 2].endswith('test_summary.py::test_queries[2]')
+    assert 'slowest 2 fixtures by total time' in lines[tests + 3]
+
+    result.stdout.fnmatch_lines(
+        [
+            '*slowest 2 fixtures by total time*',
+            '*total*self*setups*scope*fixture',
+            '*s  *s       1  session   database',
+            '*s  *s       3  function  connection',
+            '*slowest 2 fixtures by self time*',
+            '*total*self*setups*scope*fixture',
+            '*s  *s       3  function  connection',
+            'fixture setups by scope: session 1, function 6',
+        ]
+    )
+
+
+def test_summary_of_tests_that_arent_exported(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-summary=2', '--otel-min-duration=10000')
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        [
+            '*s  *s       3  function  connection',
+            'fixture setups by scope: session 1, function 6',
+        ]
+    )
+
+
+def test_summary_without_detailed_spans(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-summary=2', '--otel-detail=test')
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        [
+            '*(no test call spans; use --otel-detail=phase or fixture)',
+            '*(no fixture spans; use --otel-detail=fixture)',
+            '*(no fixture spans; use --otel-detail=fixture)',
+        ]
+    )
+    result.stdout.no_fnmatch_line('fixture setups by scope*')
+
+
+def test_summary_with_xdist(pytester: Pytester) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('-n', '2', '--otel-summary=10')
+    result.assert_outcomes(passed=4)
+
+    result.stdout.fnmatch_lines(
+        [
+            '*slowest 10 test calls*',
+            '*s  test_summary_with_xdist.py::test_slow',
+            '*slowest 10 fixtures by total time*',
+        ]
+    )
+    result.stdout.fnmatch_lines(['*s       3  function  connection'])
+
+
+def test_merging_aggregates() -> None:
+    processor = SummarySpanProcessor(limit=3)
+    processor.merge(
+        {
+            'tests': [[3, 'a'], [1, 'b'], [2, 'c']],
+            'fixtures': [['f', 'function', 1, 10, 4]],
+        }
+    )
+    processor.merge({'tests': [[5, 'd']], 'fixtures': [['f', 'function', 2, 5, 5]]})
+
+    assert processor.dump() == {
+        'tests': [[5, 'd'], [3, 'a'], [2, 'c']],
+        'fixtures': [['f', 'function', 3, 15, 9]],
+    }
+
+    assert processor.force_flush()
+    processor.shutdown()
+
+
+def test_nodes_without_a_summary(pytester: Pytester) -> None:
+    plugin = SummaryPlugin(pytester.parseconfig(), limit=3)
+    try:
+        plugin.pytest_testnodedown(Mock(spec=[]), error='crashed')
+        assert plugin.span_processor.dump() == {'tests': [], 'fixtures': []}
+    finally:
+        plugin.pytest_unconfigure(Mock())
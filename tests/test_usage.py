@@ -0,0 +1,87 @@
+from typing import Sequence
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.usage import Usage, usage_attributes
+
+from . import SpanRecorder
+
+TESTS = """
+    import gc
+    import pytest
+
+    HOARD = []
+
+    @pytest.fixture
+    def busy():
+        return sum(range(1_000_000))
+
+    def test_allocating(busy):
+        HOARD.append(b'x' * 64 * 1024 * 1024)
+        gc.collect()
+"""
+
+
+def test_resource_usage(pytester: Pytester, span_recorder: SpanRecorder) -> None:
+    pytester.makepyfile(TESTS)
+    pytester.runpytest('--otel-resource-usage').assert_outcomes(passed=1)
+
+    spans = span_recorder.spans_by_name()
+
+    call = spans['test_resource_usage.py::test_allocating::call'].attributes
+    assert call
+    # The growth depends on how much memory earlier tests in this process used
+    assert call['pytest.usage.max_rss_growth_bytes'] >= 0  # type: ignore
+    assert call['pytest.usage.max_rss_bytes'] >= 64 * 1024 * 1024  # type: ignore
+    collections = call['pytest.usage.gc_collections']
+    assert isinstance(collections, Sequence)
+    assert collections[-1] >= 1  # type: ignore
+
+    busy = spans['busy setup'].attributes
+    assert busy
+    assert busy['pytest.usage.cpu_user_seconds'] >= 0  # type: ignore
+    assert busy['pytest.usage.cpu_system_seconds'] >= 0  # type: ignore
+
+    test = spans['test_resource_usage.py::test_allocating'].attributes
+    assert test
+    assert 'pytest.usage.cpu_user_seconds' not in test
+
+
+@pytest.mark.parametrize('detail', ['test', 'phase'])
+def test_resource_usage_by_detail(
+    pytester: Pytester, span_recorder: SpanRecorder, detail: str
+) -> None:
+    pytester.makepyfile(TESTS)
+    result = pytester.runpytest('--otel-resource-usage', f'--otel-detail={detail}')
+    result.assert_outcomes(passed=1)
+
+    spans = span_recorder.spans_by_name()
+    for span in spans.values():
+        assert span.attributes is not None
+        if span.name.endswith('::call'):
+            assert 'pytest.usage.cpu_user_seconds' in span.attributes
+        else:
+            assert 'pytest.usage.cpu_user_seconds' not in span.attributes
+
+
+def test_no_resource_usage_by_default(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(TESTS)
+    pytester.runpytest().assert_outcomes(passed=1)
+
+    for span in span_recorder.finished_spans():
+        assert 'pytest.usage.cpu_user_seconds' not in (span.attributes or {})
+
+
+def test_usage_attributes() -> None:
+    before = Usage(1.0, 2.0, 1000, (10, 5, 1))
+    after = Usage(1.5, 2.25, 3000, (12, 5, 2))
+    assert usage_attributes(before, after) == {
+        'pytest.usage.cpu_user_seconds': 0.5,
+        'pytest.usage.cpu_system_seconds': 0.25,
+        'pytest.usage.max_rss_bytes': 3000,
+        'pytest.usage.max_rss_growth_bytes': 2000,
+        'pytest.usage.gc_collections': [2, 0, 1],
+    }
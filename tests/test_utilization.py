@@ -0,0 +1,149 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from _pytest.pytester import Pytester
+
+from pytest_opentelemetry.utilization import (
+    WORKEROUTPUT_KEY,
+    ControllerUtilizationPlugin,
+    WorkerUtilizationPlugin,
+    analyze,
+)
+
+from . import SpanRecorder
+
+
+def test_worker_utilization_is_reported(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+
+        def test_one():
+            time.sleep(0.05)
+
+        def test_two():
+            time.sleep(0.05)
+    """
+    )
+    result = pytester.runpytest('-n', '2', '--otel-xdist-report')
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(
+        [
+            '*xdist worker utilization*',
+            'worker*tests*busy*idle*finished',
+            'gw0*1*s*s*s',
+            'gw1*1*s*s*s',
+            'finish-time skew *s, utilization *%',
+        ]
+    )
+
+    run = span_recorder.spans_by_name()['test run']
+    assert run.attributes
+    assert run.attributes['pytest.xdist.workers'] == ('gw0', 'gw1')
+    assert run.attributes['pytest.xdist.worker_tests'] == (1, 1)
+    busy = run.attributes['pytest.xdist.worker_busy_seconds']
+    assert isinstance(busy, tuple)
+    assert all(seconds >= 0.05 for seconds in busy)
+    assert 0 < run.attributes['pytest.xdist.utilization'] <= 1  # type: ignore
+
+
+def test_worker_utilization_is_not_printed_by_default(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        def test_one():
+            pass
+    """
+    )
+    result = pytester.runpytest('-n', '2')
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line('*xdist worker utilization*')
+
+    run = span_recorder.spans_by_name()['test run']
+    assert run.attributes
+    assert run.attributes['pytest.xdist.worker_tests'] in {(0, 1), (1, 0)}
+
+
+def test_nodes_without_times() -> None:
+    plugin = Mock()
+    controller = ControllerUtilizationPlugin(plugin, report=True)
+    controller.pytest_testnodedown(Mock(spec=[]), error='crashed')
+    controller.pytest_sessionfinish(Mock())
+    controller.pytest_terminal_summary(Mock())
+
+    assert not controller.workers
+    plugin.session_span.set_attributes.assert_not_called()
+
+
+def test_workers_measure_busy_and_idle_time() -> None:
+    plugin = Mock()
+    session = Mock()
+    session.config.workeroutput = {}
+
+    with patch('time.time', side_effect=[100.0, 101.0, 103.0, 104.0, 107.0]):
+        worker = WorkerUtilizationPlugin(plugin)
+        worker.pytest_runtest_logstart('test_one', ('', 0, ''))
+        worker.pytest_runtest_logfinish('test_one', ('', 0, ''))
+        worker.pytest_runtest_logstart('test_two', ('', 0, ''))
+        worker.pytest_runtest_logfinish('test_two', ('', 0, ''))
+
+    worker.pytest_sessionfinish(session)
+
+    assert session.config.workeroutput[WORKEROUTPUT_KEY] == {
+        'started': 100.0,
+        'finished': 107.0,
+        'tests': 2,
+        'busy': 5.0,
+        'idle': 1.0,
+    }
+    plugin.session_span.set_attributes.assert_called_once_with(
+        {
+            'pytest.xdist.worker_tests': 2,
+            'pytest.xdist.worker_busy_seconds': 5.0,
+            'pytest.xdist.worker_idle_seconds': 1.0,
+        }
+    )
+
+
+def test_workers_without_tests() -> None:
+    with patch('time.time', return_value=100.0):
+        worker = WorkerUtilizationPlugin(Mock())
+    assert worker.times()['finished'] == 100.0
+
+
+def test_analysis() -> None:
+    analysis = analyze(
+        {
+            'gw1': {
+                'started': 10.0,
+                'finished': 30.0,
+                'tests': 1,
+                'busy': 18.0,
+                'idle': 0.0,
+            },
+            'gw0': {
+                'started': 11.0,
+                'finished': 20.0,
+                'tests': 3,
+                'busy': 6.0,
+                'idle': 1.0,
+            },
+        }
+    )
+    assert analysis == {
+        'workers': ['gw0', 'gw1'],
+        'tests': [3, 1],
+        'busy': [6.0, 18.0],
+        'idle': [1.0, 0.0],
+        'finished': [10.0, 20.0],
+        'skew': 10.0,
+        'utilization': pytest.approx(0.6),
+    }
+
+
+def test_analysis_of_an_instant_run() -> None:
+    times = {'started': 1.0, 'finished': 1.0, 'tests': 0, 'busy': 0.0, 'idle': 0.0}
+    assert analyze({'gw0': times})['utilization'] == 0.0
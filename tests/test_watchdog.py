@@ -0,0 +1,168 @@
+from typing import List
+
+import pytest
+from _pytest.pytester import Pytester
+from opentelemetry.trace import StatusCode
+
+from . import SpanRecorder
+
+
+def test_hung_tests_are_reported(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+        import pytest
+
+        def wait_a_while():
+            time.sleep(0.5)
+
+        @pytest.mark.otel_watchdog(0.1)
+        def test_hanging():
+            wait_a_while()
+
+        def test_quick():
+            pass
+    """
+    )
+    pytester.runpytest('--otel-watchdog=5').assert_outcomes(passed=2)
+
+    nodeid = 'test_hung_tests_are_reported.py::test_hanging'
+    test, partial = sorted(
+        (span for span in span_recorder.finished_spans() if span.name == nodeid),
+        key=lambda span: span.end_time or 0,
+        reverse=True,
+    )
+    assert partial.status.status_code is StatusCode.ERROR
+    assert partial.status.description == 'still running after 0.1s'
+    assert partial.parent
+    assert test.parent
+    assert partial.parent.span_id == test.parent.span_id
+    (link,) = partial.links
+    assert link.context.span_id == test.context.span_id
+
+    assert partial.attributes
+    assert partial.attributes['pytest.outcome'] == 'hung'
+    assert partial.attributes['pytest.nodeid'] == nodeid
+    assert partial.attributes['pytest.watchdog.deadline_seconds'] == 0.1
+    stacks = partial.attributes['pytest.watchdog.stacks']
+    assert isinstance(stacks, str)
+    assert stacks.startswith('Thread MainThread:\n')
+    assert 'in wait_a_while' in stacks
+    assert 'Thread pytest-opentelemetry watchdog' not in stacks
+
+    assert partial.start_time and test.start_time
+    assert partial.end_time and test.end_time
+    assert test.start_time <= partial.start_time < partial.end_time < test.end_time
+    assert partial.end_time - partial.start_time >= 100_000_000
+
+    assert (
+        sum(
+            span.name == 'test_hung_tests_are_reported.py::test_quick'
+            for span in span_recorder.finished_spans()
+        )
+        == 1
+    )
+
+
+def test_hung_tests_without_test_spans(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+
+        def test_hanging():
+            time.sleep(0.3)
+    """
+    )
+    result = pytester.runpytest('--otel-watchdog=0.1', '--otel-detail=session')
+    result.assert_outcomes(passed=1)
+
+    partial = span_recorder.spans_by_name()[
+        'test_hung_tests_without_test_spans.py::test_hanging'
+    ]
+    assert not partial.links
+    assert partial.parent
+    assert span_recorder.spans_by_name()['test run'].context.span_id == (
+        partial.parent.span_id
+    )
+
+
+def test_tests_can_opt_out_of_the_watchdog(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+        import pytest
+
+        @pytest.mark.otel_watchdog(0)
+        def test_slow():
+            time.sleep(0.2)
+
+        def test_quick():
+            pass
+    """
+    )
+    result = pytester.runpytest('--otel-watchdog=0.1', '--strict-markers')
+    result.assert_outcomes(passed=2)
+
+    assert not any(
+        (span.attributes or {}).get('pytest.outcome') == 'hung'
+        for span in span_recorder.finished_spans()
+    )
+
+
+def test_hung_tests_are_kept_by_tail_sampling(
+    pytester: Pytester, span_recorder: SpanRecorder
+) -> None:
+    pytester.makepyfile(
+        """
+        import time
+
+        def test_hanging():
+            time.sleep(0.3)
+    """
+    )
+    result = pytester.runpytest('--otel-watchdog=0.1', '--otel-min-duration=10000')
+    result.assert_outcomes(passed=1)
+
+    nodeid = 'test_hung_tests_are_kept_by_tail_sampling.py::test_hanging'
+    names = [span.name for span in span_recorder.finished_spans()]
+    assert names.count(nodeid) == 2
+    assert f'{nodeid}::call' in names
+
+
+COUNTING_CONFTEST = """
+    def pytest_terminal_summary(terminalreporter, config):
+        watchdogs = [
+            plugin
+            for plugin in config.pluginmanager.get_plugins()
+            if type(plugin).__name__ == 'WatchdogPlugin'
+        ]
+        terminalreporter.write_line(f'watchdogs: {len(watchdogs)}')
+"""
+
+
+@pytest.mark.parametrize(
+    'test, options, watchdogs',
+    [
+        ('def test_one(): pass', [], 0),
+        ('def test_one(): pass', ['--otel-watchdog=0'], 0),
+        ('def test_one(): pass', ['--otel-watchdog=60'], 1),
+        ('@pytest.mark.otel_watchdog(60)\ndef test_one(): pass', [], 1),
+        ('@pytest.mark.otel_watchdog(0)\ndef test_one(): pass', [], 0),
+        # The xdist controller doesn't run any tests to watch
+        ('def test_one(): pass', ['--otel-watchdog=60', '-n', '2'], 0),
+    ],
+)
+def test_the_watchdog_is_only_started_when_needed(
+    pytester: Pytester, test: str, options: List[str], watchdogs: int
+) -> None:
+    pytester.makeconftest(COUNTING_CONFTEST)
+    pytester.makepyfile(f'import pytest\n\n{test}\n')
+    result = pytester.runpytest(*options)
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([f'watchdogs: {watchdogs}'])